@@ -1,15 +1,46 @@
 
-import React, { useState, useEffect, useRef } from 'react';
-import { Activity, Check, AlertTriangle, Cpu, Zap, RotateCcw, XCircle, CheckCircle2, FileCode, Terminal, ListChecks, Brain, Gauge, Copy, Search, Filter, Wand2, Bug, ChevronDown, ChevronUp, Play } from 'lucide-react';
+import React, { useState, useEffect, useRef, useMemo, useCallback, useDeferredValue } from 'react';
+import { Activity, AlertTriangle, Cpu, Zap, RotateCcw, CheckCircle2, FileCode, Terminal, ListChecks, Brain, Gauge, Copy, Search, Filter, Wand2, Bug, ChevronDown, ChevronUp, Play, Timer, Flag } from 'lucide-react';
 import { CodeEditor } from './components/CodeEditor';
 import { StatusBadge } from './components/StatusBadge';
-import { useDebounce } from './hooks/useDebounce';
-import { generateUnitTest, estimateTokens } from './services/geminiService';
-import { runTests } from './services/executionService';
-import { AgentStatus, TestSimulationResult, GenerationMetrics, SupportedLanguage, TestCaseResult, ModelTier } from './types';
+import { TestResultsList, formatDuration, getLowercaseName } from './components/TestResultsList';
+import { useAdaptiveDebounce } from './hooks/useAdaptiveDebounce';
+import { usePythonLoadState } from './hooks/usePythonLoadState';
+import { streamUnitTest, estimateTokens, getGenerationStats, getGenerationKey, isPlaceholderTest } from './services/geminiService';
+import { getGenerationCacheStats } from './services/generationCache';
+import { routeModelTier, completeRoutingDecision, escalateRoutingDecision, recordTierLatency, getExpectedLatency } from './services/modelRouter';
+import { raceUnitTests, getRaceStats } from './services/speculativeGeneration';
+import { recordPassingTests, getSessionTokenStats } from './services/tokenAccounting';
+import { LanguageDetector } from './services/languageDetection';
+import { runTests, prewarmExecution, getRunLatencyStats } from './services/executionService';
+import { AgentStatus, TestSimulationResult, GenerationMetrics, SupportedLanguage, TestCaseResult, ModelTier, RuntimeLoadStage } from './types';
 
 type Scenario = { name: string; code: string };
 
+// Speculative mode: which tiers race each other, cheapest first
+type RaceMode = 'off' | 'fast' | 'all';
+const RACE_TIERS: Record<RaceMode, ModelTier[]> = {
+  off: [],
+  fast: [ModelTier.LITE, ModelTier.FLASH],
+  all: [ModelTier.LITE, ModelTier.FLASH, ModelTier.PRO]
+};
+const TIER_SHORT_LABELS: Partial<Record<ModelTier, string>> = {
+  [ModelTier.LITE]: 'Lite',
+  [ModelTier.FLASH]: 'Flash',
+  [ModelTier.PRO]: 'Pro'
+};
+
+const countPassing = (results: TestCaseResult[]) => results.filter(r => r.status === 'pass').length;
+
+const LOAD_STAGE_LABELS: Record<RuntimeLoadStage, string> = {
+  idle: 'Queued',
+  fetch: 'Fetching runtime',
+  compile: 'Compiling runtime',
+  packages: 'Loading packages',
+  ready: 'Ready',
+  error: 'Failed to load'
+};
+
 const SCENARIOS: Record<SupportedLanguage, Scenario[]> = {
   [SupportedLanguage.JAVASCRIPT]: [
     {
@@ -248,121 +279,319 @@ const App: React.FC = () => {
   const [simulation, setSimulation] = useState<TestSimulationResult>({ status: null, message: "" });
   const [simulating, setSimulating] = useState(false);
   const [filterTerm, setFilterTerm] = useState("");
-  const [autoDetected, setAutoDetected] = useState(false);
+  // Confidence of the last automatic language switch, null once the user picks a language
+  const [autoDetected, setAutoDetected] = useState<number | null>(null);
   const [expandedErrorId, setExpandedErrorId] = useState<string | null>(null);
   const [isDetailsOpen, setIsDetailsOpen] = useState(true);
-
-  // Debounce source code input by 500ms
-  const debouncedCode = useDebounce<string>(sourceCode, 500);
+  const [sortBySlowest, setSortBySlowest] = useState(false);
+  const [raceMode, setRaceMode] = useState<RaceMode>('off');
+
+  // Debounce source code input; slower generations wait for a more certain pause in typing
+  const expectedLatencyMs = raceMode !== 'off'
+    ? Math.max(...RACE_TIERS[raceMode].map(getExpectedLatency))
+    : getExpectedLatency(modelTier === ModelTier.AUTO ? metrics.routedTier ?? ModelTier.FLASH : modelTier);
+  // Detect the language as the code is emitted, so the generation effect only ever sees the settled language
+  const [languageDetector] = useState(() => new LanguageDetector());
+  const detectLanguage = (code: string) => {
+    const detected = languageDetector.update(code, language);
+    if (detected) {
+      setLanguage(detected.language);
+      setAutoDetected(detected.confidence);
+    }
+  };
+  const {
+    value: debouncedCode,
+    flush: flushDebouncedCode,
+    stats: debounceStats
+  } = useAdaptiveDebounce<string>(sourceCode, expectedLatencyMs, undefined, detectLanguage);
+  // Formatting, whitespace and comment edits keep the key, so they never restart a running generation
+  const genKey = useMemo(
+    () => `${getGenerationKey(debouncedCode, language, modelTier)}|race:${raceMode}`,
+    [debouncedCode, language, modelTier, raceMode]
+  );
   const startTimeRef = useRef<number>(0);
+  const runIdRef = useRef<number>(0);
+  const runControllerRef = useRef<AbortController | null>(null);
+  // Generation key (semantic fingerprint, language, tier, race mode) of the tests currently shown
+  const lastGenerationKeyRef = useRef<string | null>(null);
+  const pythonLoadState = usePythonLoadState();
 
   const handleLanguageChange = (newLang: SupportedLanguage) => {
     setLanguage(newLang);
     setSourceCode(SCENARIOS[newLang][0].code);
     setGeneratedTest("// Waiting for code...");
     setSimulation({ status: null, message: "" });
-    setAutoDetected(false);
+    setAutoDetected(null);
+    languageDetector.reset();
+    lastGenerationKeyRef.current = null;
   };
 
   const handleScenarioChange = (code: string) => {
     setSourceCode(code);
     setGeneratedTest("// Waiting for code...");
     setSimulation({ status: null, message: "" });
+    lastGenerationKeyRef.current = null;
   };
 
-  // Auto-detect language heuristic
-  const detectLanguage = (code: string): SupportedLanguage | null => {
-    if (/def\s+/.test(code) || /import\s+pytest/.test(code) || /class\s+\w+:\s*$/.test(code)) return SupportedLanguage.PYTHON;
-    if (/interface\s+/.test(code) || /type\s+\w+\s*=/.test(code) || /:\s*(string|number|boolean|void|any)(\[\])?/.test(code)) return SupportedLanguage.TYPESCRIPT;
-    return null;
-  };
+  // Warm up the execution runtime for the active language
+  useEffect(() => {
+    prewarmExecution(language);
+  }, [language]);
 
+  // Edits that keep the generation key are regenerations suppressed without restarting the effect below
+  const keyedCodeRef = useRef({ code: debouncedCode, key: genKey });
   useEffect(() => {
-    // Auto-detect language
-    if (sourceCode) {
-      const detected = detectLanguage(sourceCode);
-      if (detected && detected !== language) {
-        setLanguage(detected);
-        setAutoDetected(true);
-      }
+    const previous = keyedCodeRef.current;
+    keyedCodeRef.current = { code: debouncedCode, key: genKey };
+    if (debouncedCode !== previous.code && genKey === previous.key) {
+      setMetrics(prev => ({ ...prev, suppressedRegenerations: (prev.suppressedRegenerations ?? 0) + 1 }));
     }
-  }, [sourceCode, language]);
+  }, [debouncedCode, genKey]);
 
-  // Agent Generation Effect
+  // Agent Generation Effect, keyed on the generation key rather than the raw text
   useEffect(() => {
-    let isMounted = true;
+    // Aborting cancels the in-flight request and any test run it started
+    const controller = new AbortController();
+    const { signal } = controller;
 
     const runAgent = async () => {
       if (!debouncedCode || debouncedCode.trim().length === 0) {
         setGeneratedTest("// Waiting for code...");
         setStatus(AgentStatus.IDLE);
+        lastGenerationKeyRef.current = null;
         return;
       }
 
-      setStatus(AgentStatus.THINKING);
-      setSimulation({ status: null, message: "" });
-      startTimeRef.current = performance.now();
+      // The key is back to the one whose tests are on screen, e.g. an edit undone before its generation finished
+      if (genKey === lastGenerationKeyRef.current) {
+        setMetrics(prev => ({ ...prev, suppressedRegenerations: (prev.suppressedRegenerations ?? 0) + 1 }));
+        return;
+      }
 
-      const result = await generateUnitTest(debouncedCode, language, modelTier);
+      if (raceMode !== 'off') {
+        setStatus(AgentStatus.THINKING);
+        setSimulation({ status: null, message: "" });
+        setGeneratedTest("// Waiting for the first passing candidate...");
+        setMetrics(prev => ({ ...prev, routedTier: undefined }));
+        startTimeRef.current = performance.now();
+
+        const outcome = await raceUnitTests(debouncedCode, language, RACE_TIERS[raceMode], signal);
+        const raceGenerationStats = getGenerationStats();
+        setMetrics(prev => ({
+          ...prev,
+          abortedRequests: raceGenerationStats.aborted,
+          retries: raceGenerationStats.retries,
+          throttled: raceGenerationStats.throttled,
+          coalescedRequests: raceGenerationStats.coalesced,
+          truncatedPrompts: raceGenerationStats.truncatedPrompts,
+          skippedPrompts: raceGenerationStats.skippedPrompts,
+          raceStats: getRaceStats()
+        }));
+        if (!outcome || signal.aborted) return;
+
+        const { winner } = outcome;
+        if (winner.results) recordPassingTests(countPassing(winner.results));
+        setGeneratedTest(winner.text);
+        setMetrics(prev => ({
+          ...prev,
+          latencyMs: winner.latencyMs,
+          timeToFirstTokenMs: undefined,
+          // Several requests raced, so only the session totals are exact
+          tokenEstimate: estimateTokens(winner.text),
+          tokenUsage: undefined,
+          sessionTokens: getSessionTokenStats(),
+          routedTier: winner.tier
+        }));
+        setStatus(AgentStatus.DONE);
+        if (!winner.text.startsWith("// Error")) {
+          lastGenerationKeyRef.current = genKey;
+        }
+        if (winner.results) {
+          setExpandedErrorId(null);
+          setIsDetailsOpen(true);
+          presentResults(winner.results);
+        } else {
+          // Re-run through the normal path so the execution error is shown
+          handleRunTests(debouncedCode, winner.text, signal);
+        }
+        return;
+      }
 
-      if (isMounted) {
+      // Streams one generation into the editor; resolves to null if it was superseded
+      const generate = async (tier: ModelTier) => {
+        setStatus(AgentStatus.THINKING);
+        setSimulation({ status: null, message: "" });
+        startTimeRef.current = performance.now();
+
+        // Fill the test editor progressively as chunks arrive
+        const stream = streamUnitTest(debouncedCode, language, tier, signal);
+        let streamedText = '';
+        let firstTokenMs: number | undefined;
+        let step = await stream.next();
+        while (!step.done) {
+          if (signal.aborted) {
+            await stream.return(undefined);
+            break;
+          }
+          if (firstTokenMs === undefined) {
+            firstTokenMs = Math.round(performance.now() - startTimeRef.current);
+            setMetrics(prev => ({ ...prev, timeToFirstTokenMs: firstTokenMs }));
+          }
+          streamedText += step.value;
+          setGeneratedTest(streamedText);
+          step = await stream.next();
+        }
+
+        if (signal.aborted) {
+          setMetrics(prev => ({ ...prev, abortedRequests: getGenerationStats().aborted }));
+          return null;
+        }
+
+        const generation = step.value;
+        const result = generation.text;
         const endTime = performance.now();
         const latency = Math.round(endTime - startTimeRef.current);
+        const cacheStats = getGenerationCacheStats();
+        const generationStats = getGenerationStats();
         
         setGeneratedTest(result);
-        setMetrics({
+        setMetrics(prev => ({
+          ...prev,
           latencyMs: latency,
-          tokenEstimate: estimateTokens(result)
-        });
+          timeToFirstTokenMs: firstTokenMs,
+          tokenEstimate: generation.usage ? generation.usage.totalTokens : estimateTokens(result),
+          tokenUsage: generation.usage ?? undefined,
+          sessionTokens: getSessionTokenStats(),
+          retries: generationStats.retries,
+          throttled: generationStats.throttled,
+          coalescedRequests: generationStats.coalesced,
+          truncatedPrompts: generationStats.truncatedPrompts,
+          skippedPrompts: generationStats.skippedPrompts,
+          cacheHits: cacheStats.hits,
+          cacheMisses: cacheStats.misses,
+          regeneratedUnits: generation.regeneratedUnits,
+          totalUnits: generation.totalUnits,
+          routedTier: modelTier === ModelTier.AUTO ? tier : undefined
+        }));
         setStatus(AgentStatus.DONE);
+        if (!result.startsWith("// Error")) {
+          lastGenerationKeyRef.current = genKey;
+        }
+        return { result, latency, fromCache: generation.fromCache };
+      };
+
+      let decision = modelTier === ModelTier.AUTO ? routeModelTier(debouncedCode, language) : null;
+      let tier = decision ? decision.tier : modelTier;
+      while (true) {
+        const generation = await generate(tier);
+        if (!generation) return;
+        const { result } = generation;
 
         // Automatically run tests if generation looks successful
-        if (!result.startsWith("// Error") && !result.startsWith("// Waiting")) {
-           handleRunTests(debouncedCode, result);
+        const runnable = !isPlaceholderTest(result);
+        const results = runnable ? await handleRunTests(debouncedCode, result, signal) : null;
+        if (results) {
+          recordPassingTests(countPassing(results));
+          setMetrics(prev => ({ ...prev, sessionTokens: getSessionTokenStats() }));
         }
+        if (!decision && !generation.fromCache) recordTierLatency(tier, generation.latency);
+        if (!decision || signal.aborted) return;
+
+        // A suite that errors out or passes nothing is most likely a bad test file, not a bug in the source
+        const passed = !!results && results.some(r => r.status === 'pass');
+        completeRoutingDecision(decision, { latencyMs: generation.latency, fromCache: generation.fromCache, passed });
+        if (passed || !runnable) return;
+
+        decision = escalateRoutingDecision(decision);
+        if (!decision) return;
+        tier = decision.tier;
+        // Until the escalated generation lands, the failing tests on screen must not suppress a retry
+        lastGenerationKeyRef.current = null;
+        setMetrics(prev => ({ ...prev, escalations: (prev.escalations ?? 0) + 1 }));
       }
     };
 
     runAgent();
 
     return () => {
-      isMounted = false;
+      controller.abort();
     };
-  }, [debouncedCode, language, modelTier]);
+  }, [genKey]);
+
+  const presentResults = (results: TestCaseResult[]) => {
+    const passedCount = results.filter(r => r.status === 'pass').length;
+    const totalCount = results.length;
+    const isSuccess = totalCount > 0 && passedCount === totalCount;
+
+    setSimulation({
+      status: isSuccess ? 'pass' : 'fail',
+      message: isSuccess 
+        ? `All ${totalCount} tests passed successfully`
+        : `${totalCount - passedCount} failed, ${passedCount} passed`,
+      details: results
+    });
+  };
 
   // Real Execution Handler
-  const handleRunTests = async (src: string, tests: string) => {
-    if (!tests || tests.startsWith("//")) return;
+  const handleRunTests = async (src: string, tests: string, signal?: AbortSignal): Promise<TestCaseResult[] | null> => {
+    if (!tests || isPlaceholderTest(tests)) return null;
+    if (signal?.aborted) return null;
+
+    // A newer run supersedes the previous one, which is stopped rather than left to finish
+    runControllerRef.current?.abort();
+    const controller = new AbortController();
+    runControllerRef.current = controller;
+    signal?.addEventListener('abort', () => controller.abort(), { once: true });
 
+    const runId = ++runIdRef.current;
     setSimulating(true);
     setSimulation({ status: null, message: "" });
     setExpandedErrorId(null);
     setIsDetailsOpen(true);
+
+    // Streamed results are buffered and flushed at most once per frame
+    const streamed: TestCaseResult[] = [];
+    let flushScheduled = false;
+    const flushStreamed = () => {
+      flushScheduled = false;
+      if (runId !== runIdRef.current) return;
+      const failedCount = streamed.filter(r => r.status === 'fail').length;
+      setSimulation({
+        status: failedCount > 0 ? 'fail' : 'pass',
+        message: `Running... ${streamed.length} completed, ${failedCount} failed`,
+        details: [...streamed]
+      });
+    };
+    const onResult = (result: TestCaseResult) => {
+      streamed.push(result);
+      if (!flushScheduled) {
+        flushScheduled = true;
+        requestAnimationFrame(flushStreamed);
+      }
+    };
     
     try {
       // Execute safely in worker/pyodide
-      const results = await runTests(language, src, tests);
+      const results = await runTests(language, src, tests, onResult, controller.signal);
+      if (runId !== runIdRef.current) return null;
+      setMetrics(prev => ({ ...prev, ...getRunLatencyStats() }));
       
-      const passedCount = results.filter(r => r.status === 'pass').length;
-      const totalCount = results.length;
-      const isSuccess = totalCount > 0 && passedCount === totalCount;
-
-      setSimulation({
-        status: isSuccess ? 'pass' : 'fail',
-        message: isSuccess 
-          ? `All ${totalCount} tests passed successfully`
-          : `${totalCount - passedCount} failed, ${passedCount} passed`,
-        details: results
-      });
+      presentResults(results);
+      return results;
 
     } catch (error: any) {
+      if (runId !== runIdRef.current || controller.signal.aborted) return null;
       setSimulation({
         status: 'fail',
         message: 'Execution Error: ' + error.message,
-        details: []
+        details: [...streamed]
       });
+      return null;
     } finally {
-      setSimulating(false);
+      if (runId === runIdRef.current) {
+        setSimulating(false);
+        runControllerRef.current = null;
+      }
     }
   };
 
@@ -377,18 +606,35 @@ const App: React.FC = () => {
     return 'text-red-400';
   };
 
+  const getModelLabel = (tier: ModelTier) =>
+    tier === ModelTier.PRO ? 'Gemini 3 Pro (Reasoning)' : tier === ModelTier.LITE ? 'Gemini Flash Lite' : 'Gemini 2.5 Flash';
+
   const getModelIcon = (tier: ModelTier) => {
     switch(tier) {
       case ModelTier.LITE: return <Zap className="w-3 h-3 text-yellow-400" />;
       case ModelTier.PRO: return <Brain className="w-3 h-3 text-purple-400" />;
+      case ModelTier.AUTO: return <Gauge className="w-3 h-3 text-vs-green" />;
       default: return <Cpu className="w-3 h-3 text-vs-blue" />;
     }
   };
 
-  // Filter details
-  const filteredDetails = simulation.details?.filter(
-    t => (t.name || "Unknown").toLowerCase().includes(filterTerm.toLowerCase())
-  );
+  // Footer prefix for modes where the tier is picked per generation
+  const tierMode = raceMode !== 'off' ? 'Race' : modelTier === ModelTier.AUTO ? 'Auto' : null;
+
+  // Filter details; typing in the filter stays responsive while a long list re-filters
+  const deferredFilterTerm = useDeferredValue(filterTerm);
+  const filteredDetails = useMemo(() => {
+    if (!simulation.details) return undefined;
+    const term = deferredFilterTerm.toLowerCase();
+    const matching = term
+      ? simulation.details.filter(t => getLowercaseName(t).includes(term))
+      : simulation.details;
+    return sortBySlowest ? [...matching].sort((a, b) => b.duration - a.duration) : matching;
+  }, [simulation.details, deferredFilterTerm, sortBySlowest]);
+
+  const toggleExpandedError = useCallback((id: string) => {
+    setExpandedErrorId(current => current === id ? null : id);
+  }, []);
 
   return (
     <div className="flex flex-col h-screen bg-vs-bg text-vs-fg font-sans overflow-hidden">
@@ -417,14 +663,29 @@ const App: React.FC = () => {
             <select 
               value={modelTier}
               onChange={(e) => setModelTier(e.target.value as ModelTier)}
-              className="bg-transparent text-sm text-vs-fg outline-none cursor-pointer font-medium w-24 md:w-auto"
+              disabled={raceMode !== 'off'}
+              className="bg-transparent text-sm text-vs-fg outline-none cursor-pointer font-medium w-24 md:w-auto disabled:opacity-40 disabled:cursor-not-allowed"
             >
+              <option value={ModelTier.AUTO}>Auto (Routed)</option>
               <option value={ModelTier.LITE}>Flash Lite (Fast)</option>
               <option value={ModelTier.FLASH}>Flash (Standard)</option>
               <option value={ModelTier.PRO}>Pro (Deep Thinking)</option>
             </select>
           </div>
 
+          <div className="hidden md:flex items-center gap-2 bg-vs-bg border border-vs-border rounded-md px-2 py-1" title="Generate with several models at once and keep the first tests that pass">
+            <Flag className={`w-3 h-3 ${raceMode !== 'off' ? 'text-vs-green' : 'opacity-70'}`} />
+            <select
+              value={raceMode}
+              onChange={(e) => setRaceMode(e.target.value as RaceMode)}
+              className="bg-transparent text-sm text-vs-fg outline-none cursor-pointer font-medium"
+            >
+              <option value="off">Race: Off</option>
+              <option value="fast">Race: Lite + Flash</option>
+              <option value="all">Race: All Tiers</option>
+            </select>
+          </div>
+
           <div className="hidden md:flex items-center gap-2 bg-vs-bg border border-vs-border rounded-md px-2 py-1 relative">
             <span className="text-xs opacity-50 uppercase font-mono">Lang:</span>
             <select 
@@ -436,7 +697,7 @@ const App: React.FC = () => {
               <option value={SupportedLanguage.TYPESCRIPT}>TypeScript</option>
               <option value={SupportedLanguage.PYTHON}>Python</option>
             </select>
-            {autoDetected && (
+            {autoDetected !== null && (
                <div className="absolute -top-2 -right-2 flex h-3 w-3">
                  <span className="animate-ping absolute inline-flex h-full w-full rounded-full bg-vs-blue opacity-75"></span>
                  <span className="relative inline-flex rounded-full h-3 w-3 bg-vs-blue"></span>
@@ -456,13 +717,29 @@ const App: React.FC = () => {
             title={`Source Code (${language === SupportedLanguage.PYTHON ? 'PY' : language === SupportedLanguage.TYPESCRIPT ? 'TS' : 'JS'})`} 
             value={sourceCode} 
             onChange={setSourceCode}
+            onBlur={flushDebouncedCode}
             placeholder="// Type your function here..."
             borderColor={status === AgentStatus.THINKING ? 'border-vs-blue/50' : 'border-vs-border'}
             language={language}
             actions={
               <div className="flex items-center gap-2">
-                 {autoDetected && (
-                   <div className="flex items-center gap-1 text-xs text-vs-blue animate-pulse mr-2">
+                 {language === SupportedLanguage.PYTHON && pythonLoadState.stage !== 'ready' && (
+                   <div
+                     className={`flex items-center gap-1 text-xs mr-2 ${pythonLoadState.stage === 'error' ? 'text-amber-500' : 'text-vs-fg/60'}`}
+                     title={pythonLoadState.error || 'Preparing the Python runtime in the background'}
+                   >
+                     {pythonLoadState.stage === 'error'
+                       ? <AlertTriangle className="w-3 h-3" />
+                       : <Activity className="w-3 h-3 animate-spin" />
+                     }
+                     <span>Python: {LOAD_STAGE_LABELS[pythonLoadState.stage]}</span>
+                   </div>
+                 )}
+                 {autoDetected !== null && (
+                   <div
+                     className="flex items-center gap-1 text-xs text-vs-blue animate-pulse mr-2"
+                     title={`Detected with ${Math.round(autoDetected * 100)}% confidence`}
+                   >
                      <Wand2 className="w-3 h-3" />
                      <span>Auto-Detected</span>
                    </div>
@@ -511,7 +788,7 @@ const App: React.FC = () => {
                 <div className="w-px h-3 bg-vs-border mx-1"></div>
                 <button 
                   onClick={() => handleRunTests(debouncedCode, generatedTest)}
-                  disabled={simulating || !generatedTest || generatedTest.startsWith("//")}
+                  disabled={simulating || !generatedTest || isPlaceholderTest(generatedTest)}
                   title="Run Tests in Sandbox"
                   className="flex items-center gap-1.5 px-3 py-0.5 bg-green-600/20 hover:bg-green-600/30 border border-green-600/50 rounded text-green-400 disabled:opacity-20 transition-colors"
                 >
@@ -522,7 +799,7 @@ const App: React.FC = () => {
             }
           >
             {/* Expanded Simulation Banner with Details */}
-            {simulation.status && !simulating && status !== AgentStatus.THINKING && (
+            {simulation.status && status !== AgentStatus.THINKING && (
               <div className="w-full border-b border-vs-border animate-in fade-in slide-in-from-top-2 duration-300 shadow-2xl z-20 flex flex-col bg-vs-bg">
                 {/* Summary Header & Toggle */}
                 <div 
@@ -542,6 +819,16 @@ const App: React.FC = () => {
                   
                   {/* Filter Input - Only visible when expanded */}
                   <div className="flex items-center gap-2" onClick={(e) => e.stopPropagation()}>
+                    {isDetailsOpen && simulation.details && simulation.details.length > 1 && (
+                      <button
+                        onClick={() => setSortBySlowest(!sortBySlowest)}
+                        title={sortBySlowest ? 'Show tests in run order' : 'Sort slowest tests first'}
+                        className={`flex items-center gap-1 px-1.5 py-0.5 rounded-md border text-[10px] transition-colors ${sortBySlowest ? 'border-vs-blue/50 text-vs-blue bg-vs-blue/10' : 'border-vs-border/20 text-vs-fg/60 hover:text-vs-fg'}`}
+                      >
+                        <Timer className="w-3 h-3" />
+                        <span className="hidden md:inline">Slowest</span>
+                      </button>
+                    )}
                     {isDetailsOpen && simulation.details && simulation.details.length > 0 && (
                       <div className="flex items-center gap-2 bg-vs-bg/40 px-2 py-0.5 rounded-md border border-vs-border/20 animate-in fade-in duration-200">
                         <Search className="w-3 h-3 opacity-50" />
@@ -563,63 +850,21 @@ const App: React.FC = () => {
 
                 {/* Collapsible Test Case Details */}
                 {isDetailsOpen && (
-                  <div className="max-h-[40vh] overflow-y-auto border-t border-vs-border/10 bg-vs-bg/50">
-                    {filteredDetails && filteredDetails.length > 0 ? (
-                       <div className="py-1">
-                        {filteredDetails.map((test) => (
-                          <div key={test.id} className="flex flex-col border-b border-vs-border/10 last:border-0">
-                            <div 
-                              className={`px-4 py-1.5 flex items-center gap-3 hover:bg-vs-border/30 group cursor-pointer ${expandedErrorId === test.id ? 'bg-vs-border/30' : ''}`}
-                              onClick={() => test.status === 'fail' && setExpandedErrorId(expandedErrorId === test.id ? null : test.id)}
-                            >
-                              {test.status === 'pass' 
-                                ? <Check className="w-3.5 h-3.5 text-vs-green shrink-0" /> 
-                                : <XCircle className="w-3.5 h-3.5 text-red-400 shrink-0" />
-                              }
-                              <span className={`text-xs font-mono opacity-80 truncate flex-1 ${test.status === 'fail' ? 'text-red-300' : 'text-vs-fg'}`} title={test.name}>
-                                {test.name || "Unnamed Test"}
-                              </span>
-                              
-                              <div className="flex items-center gap-3">
-                                <span className="text-[10px] text-vs-fg opacity-40 font-mono">{test.duration}ms</span>
-                              </div>
-                            </div>
-
-                            {/* Error Detail View */}
-                            {test.status === 'fail' && expandedErrorId === test.id && test.failureDetails && (
-                              <div className="px-4 py-3 bg-[#252526] border-t border-vs-border/20 text-xs font-mono overflow-x-auto animate-in slide-in-from-top-1 duration-200">
-                                 <div className="text-red-300 mb-2 font-bold">
-                                   ● {test.name || "Unnamed Test"}
-                                 </div>
-                                 <div className="pl-2 border-l-2 border-red-500/50 ml-1">
-                                    <div className="mb-2 whitespace-pre-wrap text-vs-fg/90">
-                                      {test.failureDetails.message}
-                                    </div>
-                                    {test.failureDetails.expected && (
-                                      <div className="grid grid-cols-[80px_1fr] gap-2 mb-3 text-vs-fg/80">
-                                        <span className="text-green-500">Expected:</span>
-                                        <span className="text-green-500">{test.failureDetails.expected}</span>
-                                        <span className="text-red-400">Received:</span>
-                                        <span className="text-red-400">{test.failureDetails.received}</span>
-                                      </div>
-                                    )}
-                                    <div className="text-vs-fg/50 whitespace-pre overflow-x-auto">
-                                      {test.failureDetails.stack}
-                                    </div>
-                                 </div>
-                              </div>
-                            )}
-                          </div>
-                        ))}
-                       </div>
-                    ) : (
-                        simulation.details && simulation.details.length > 0 && (
-                           <div className="p-4 text-center text-xs text-vs-fg opacity-40 italic">
-                             No tests match "{filterTerm}"
-                           </div>
-                        )
-                    )}
-                  </div>
+                  filteredDetails && filteredDetails.length > 0 ? (
+                    <TestResultsList
+                      results={filteredDetails}
+                      expandedId={expandedErrorId}
+                      onToggle={toggleExpandedError}
+                    />
+                  ) : (
+                    simulation.details && simulation.details.length > 0 && (
+                      <div className="border-t border-vs-border/10 bg-vs-bg/50">
+                        <div className="p-4 text-center text-xs text-vs-fg opacity-40 italic">
+                          No tests match "{filterTerm}"
+                        </div>
+                      </div>
+                    )
+                  )
                 )}
               </div>
             )}
@@ -641,14 +886,118 @@ const App: React.FC = () => {
             <Zap className="w-3 h-3 opacity-70" />
             <span>Latency: <span className={`font-bold ${getLatencyColor(metrics.latencyMs)}`}>{metrics.latencyMs}ms</span></span>
           </div>
-          <div className="flex items-center gap-2" title="Estimated tokens used">
+          {metrics.timeToFirstTokenMs !== undefined && (
+            <div className="flex items-center gap-2" title="Time from typing stop to the first streamed chunk">
+              <span className="opacity-70">TTFT:</span>
+              <span className={getLatencyColor(metrics.timeToFirstTokenMs)}>{metrics.timeToFirstTokenMs}ms</span>
+            </div>
+          )}
+          <div
+            className="flex items-center gap-2"
+            title={metrics.tokenUsage
+              ? `Reported by the API: prompt ${metrics.tokenUsage.promptTokens}, output ${metrics.tokenUsage.candidateTokens}, thinking ${metrics.tokenUsage.thinkingTokens}, cached ${metrics.tokenUsage.cachedTokens}`
+              : "Local estimate of the test file size (no request was made)"}
+          >
             <span className="opacity-70">Tokens:</span>
-            <span>{metrics.tokenEstimate}</span>
+            <span>{metrics.tokenUsage ? metrics.tokenEstimate : `~${metrics.tokenEstimate}`}</span>
           </div>
+          {((metrics.truncatedPrompts ?? 0) > 0 || (metrics.skippedPrompts ?? 0) > 0) && (
+            <div className="flex items-center gap-2" title="Prompts over the token budget this session: cut to fit (tests not cached) / not sent">
+              <AlertTriangle className="w-3 h-3 opacity-70" />
+              <span>{metrics.truncatedPrompts ?? 0} truncated / {metrics.skippedPrompts ?? 0} skipped</span>
+            </div>
+          )}
+          {metrics.sessionTokens && metrics.sessionTokens.requests > 0 && (
+            <div
+              className="flex items-center gap-2"
+              title={`Session: ${metrics.sessionTokens.totalTokens} tokens over ${metrics.sessionTokens.requests} requests, ${metrics.sessionTokens.passingTests} passing tests`}
+            >
+              <span className="opacity-70">Session:</span>
+              <span>{metrics.sessionTokens.tokensPerSecond} tok/s</span>
+              {metrics.sessionTokens.passingTests > 0 && <span>{metrics.sessionTokens.tokensPerPassingTest} tok/pass</span>}
+            </div>
+          )}
+          {(metrics.cacheHits !== undefined || metrics.cacheMisses !== undefined) && (
+            <div className="flex items-center gap-2" title="Generation cache hits / misses this session">
+              <span className="opacity-70">Cache:</span>
+              <span>{metrics.cacheHits ?? 0}/{(metrics.cacheHits ?? 0) + (metrics.cacheMisses ?? 0)}</span>
+            </div>
+          )}
+          {metrics.totalUnits !== undefined && metrics.totalUnits > 1 && (
+            <div className="flex items-center gap-2" title="Top-level units whose tests were regenerated / units in the source">
+              <span className="opacity-70">Units:</span>
+              <span>{metrics.regeneratedUnits ?? 0}/{metrics.totalUnits}</span>
+            </div>
+          )}
+          {metrics.suppressedRegenerations !== undefined && metrics.suppressedRegenerations > 0 && (
+            <div className="flex items-center gap-2" title="Edits skipped because they only changed formatting or comments">
+              <span className="opacity-70">Skipped:</span>
+              <span>{metrics.suppressedRegenerations}</span>
+            </div>
+          )}
+          {raceMode !== 'off' && metrics.raceStats && (
+            <div className="flex items-center gap-2" title="Speculative races: passing wins / races, best-of-failing fallbacks and mean time to a validated candidate per tier">
+              <Flag className="w-3 h-3 opacity-70" />
+              {RACE_TIERS[raceMode].filter(tier => metrics.raceStats![tier]).map(tier => {
+                const stats = metrics.raceStats![tier]!;
+                return (
+                  <span key={tier}>
+                    {TIER_SHORT_LABELS[tier]} {stats.wins}/{stats.races}
+                    {stats.fallbacks > 0 && <span className="opacity-60"> +{stats.fallbacks} fallback</span>}
+                    {stats.validated > 0 && <span className="opacity-60"> {formatDuration(stats.meanLatencyMs)}</span>}
+                  </span>
+                );
+              })}
+            </div>
+          )}
+          {((metrics.retries ?? 0) > 0 || (metrics.throttled ?? 0) > 0) && (
+            <div className="flex items-center gap-2" title="Requests retried after rate-limit/server errors, and requests held back by the client-side rate limit">
+              <RotateCcw className="w-3 h-3 opacity-70" />
+              <span>{metrics.retries ?? 0} retries / {metrics.throttled ?? 0} throttled</span>
+            </div>
+          )}
+          {debounceStats.emitted > 0 && (
+            <div
+              className="flex items-center gap-2"
+              title={`Adaptive debounce delay${debounceStats.typingIntervalMs !== undefined ? ` (median keystroke gap ${debounceStats.typingIntervalMs}ms)` : ''}; wasted = generations fired while the user was still typing, flushed = sent early on blur`}
+            >
+              <span className="opacity-70">Debounce:</span>
+              <span>{debounceStats.delayMs}ms · {Math.round(debounceStats.wastedRate * 100)}% wasted ({debounceStats.wasted}/{debounceStats.emitted}){debounceStats.flushed > 0 ? ` · ${debounceStats.flushed} flushed` : ''}</span>
+            </div>
+          )}
+          {(metrics.coalescedRequests ?? 0) > 0 && (
+            <div className="flex items-center gap-2" title="Generations that reused an identical request already in flight instead of sending their own">
+              <span className="opacity-70">Coalesced:</span>
+              <span>{metrics.coalescedRequests}</span>
+            </div>
+          )}
+          {metrics.abortedRequests !== undefined && metrics.abortedRequests > 0 && (
+            <div className="flex items-center gap-2" title="Generation requests cancelled because newer code superseded them">
+              <span className="opacity-70">Aborted:</span>
+              <span>{metrics.abortedRequests}</span>
+            </div>
+          )}
+          {(metrics.coldRunMs !== undefined || metrics.warmRunMs !== undefined) && (
+            <div className="flex items-center gap-2" title="Last test run latency with a cold (booting) vs warm (pre-loaded) sandbox">
+              <span className="opacity-70">Run:</span>
+              <span>cold {metrics.coldRunMs ?? '-'}ms / warm {metrics.warmRunMs ?? '-'}ms</span>
+            </div>
+          )}
+          {language === SupportedLanguage.PYTHON && metrics.sourceImportMs !== undefined && (
+            <div className="flex items-center gap-2" title="Last Python run: time spent importing source and tests vs running tests">
+              <span className="opacity-70">Py:</span>
+              <span>import {formatDuration(metrics.sourceImportMs)} / tests {formatDuration(metrics.testExecutionMs ?? 0)}</span>
+            </div>
+          )}
         </div>
         
         <div className="flex items-center gap-2 opacity-60">
-           <span>{modelTier === ModelTier.PRO ? 'Gemini 3 Pro (Reasoning)' : modelTier === ModelTier.LITE ? 'Gemini Flash Lite' : 'Gemini 2.5 Flash'}</span>
+           {tierMode && <span>{tierMode}{metrics.routedTier ? ' →' : ''}</span>}
+           {(!tierMode || metrics.routedTier) && (
+             <span title={metrics.escalations ? `Escalated ${metrics.escalations} time(s) after failing tests` : undefined}>
+               {getModelLabel(tierMode ? metrics.routedTier! : modelTier)}
+             </span>
+           )}
            <span className="w-1 h-1 rounded-full bg-vs-fg opacity-30"></span>
            <span>Auto-Agent</span>
         </div>
@@ -1,9 +1,11 @@
 import React, { useRef, useEffect } from 'react';
 import { SupportedLanguage } from '../types';
+import { HighlightPatch, LineHighlighter, getPrismLanguage } from '../services/highlightService';
 
 interface CodeEditorProps {
   value: string;
   onChange?: (value: string) => void;
+  onBlur?: () => void;
   readOnly?: boolean;
   placeholder?: string;
   title: string;
@@ -11,6 +13,19 @@ interface CodeEditorProps {
   actions?: React.ReactNode;
   children?: React.ReactNode;
   language?: SupportedLanguage;
+  // Only the visible lines of the highlighted layer are rendered above this many lines
+  virtualizeAboveLines?: number;
+}
+
+// Every line is exactly `leading-6` tall, so line offsets are simple multiplication
+const LINE_HEIGHT_PX = 24;
+const OVERSCAN_LINES = 20;
+const DEFAULT_VIRTUALIZE_ABOVE_LINES = 1000;
+
+// Lines rendered in virtualized mode: spans for [start, start + html.length), with the HTML each holds
+interface LineWindow {
+  start: number;
+  html: string[];
 }
 
 declare global {
@@ -19,50 +34,167 @@ declare global {
   }
 }
 
+const createLine = (html: string) => {
+  const span = document.createElement('span');
+  span.innerHTML = `${html}\n`;
+  return span;
+};
+
+// Each line is an inline span ending in a newline, so only the spans in the patch are touched
+const applyHighlightPatch = (code: HTMLElement, { start, deleteCount, lines }: HighlightPatch) => {
+  let node = code.children[start] ?? null;
+  const shared = Math.min(deleteCount, lines.length);
+  for (let i = 0; i < shared && node; i++) {
+    node.innerHTML = `${lines[i]}\n`;
+    node = node.nextElementSibling;
+  }
+  for (let i = shared; i < deleteCount && node; i++) {
+    const next = node.nextElementSibling;
+    node.remove();
+    node = next;
+  }
+  if (lines.length > shared) {
+    const fragment = document.createDocumentFragment();
+    for (let i = shared; i < lines.length; i++) {
+      fragment.appendChild(createLine(lines[i]));
+    }
+    code.insertBefore(fragment, node);
+  }
+};
+
+/**
+ * Brings the rendered window to `[first, last)`: spans scrolled out are
+ * dropped, spans scrolled in are added at the edges, and a kept span is only
+ * rewritten when its line's HTML changed. The code element keeps the full
+ * height so the pre scrolls exactly like the textarea.
+ */
+const renderLineWindow = (code: HTMLElement, lines: string[], lineWindow: LineWindow, first: number, last: number) => {
+  while (lineWindow.html.length > 0 && (lineWindow.start < first || lineWindow.start >= last)) {
+    code.firstElementChild?.remove();
+    lineWindow.html.shift();
+    lineWindow.start++;
+  }
+  while (lineWindow.html.length > 0 && lineWindow.start + lineWindow.html.length > last) {
+    code.lastElementChild?.remove();
+    lineWindow.html.pop();
+  }
+  if (lineWindow.html.length === 0) lineWindow.start = first;
+  while (lineWindow.start > first) {
+    lineWindow.start--;
+    code.insertBefore(createLine(lines[lineWindow.start]), code.firstElementChild);
+    lineWindow.html.unshift(lines[lineWindow.start]);
+  }
+  while (lineWindow.start + lineWindow.html.length < last) {
+    const html = lines[lineWindow.start + lineWindow.html.length];
+    code.appendChild(createLine(html));
+    lineWindow.html.push(html);
+  }
+  let node = code.firstElementChild;
+  for (let i = 0; i < lineWindow.html.length && node; i++, node = node.nextElementSibling) {
+    const html = lines[lineWindow.start + i];
+    if (lineWindow.html[i] !== html) {
+      node.innerHTML = `${html}\n`;
+      lineWindow.html[i] = html;
+    }
+  }
+  code.style.paddingTop = `${lineWindow.start * LINE_HEIGHT_PX}px`;
+  code.style.height = `${lines.length * LINE_HEIGHT_PX}px`;
+};
+
 export const CodeEditor: React.FC<CodeEditorProps> = ({ 
   value, 
   onChange, 
+  onBlur,
   readOnly = false, 
   placeholder,
   title,
   borderColor = 'border-vs-border',
   actions,
   children,
-  language = SupportedLanguage.JAVASCRIPT
+  language = SupportedLanguage.JAVASCRIPT,
+  virtualizeAboveLines = DEFAULT_VIRTUALIZE_ABOVE_LINES
 }) => {
   const textareaRef = useRef<HTMLTextAreaElement>(null);
   const preRef = useRef<HTMLPreElement>(null);
   const codeRef = useRef<HTMLElement>(null);
+  const highlighterRef = useRef<LineHighlighter | null>(null);
+  // Highlighted HTML of every line; the DOM holds all of them or, when virtualized, a window
+  const htmlLinesRef = useRef<string[]>([]);
+  const windowRef = useRef<LineWindow | null>(null);
+  const virtualizeAboveRef = useRef(virtualizeAboveLines);
+  virtualizeAboveRef.current = virtualizeAboveLines;
 
-  // Map supported language enum to Prism language strings
-  const getPrismLang = (lang: SupportedLanguage) => {
-    switch(lang) {
-      case SupportedLanguage.PYTHON: return 'python';
-      case SupportedLanguage.TYPESCRIPT: return 'typescript';
-      case SupportedLanguage.JAVASCRIPT: default: return 'javascript';
-    }
+  const renderVisibleLines = () => {
+    const code = codeRef.current;
+    const textarea = textareaRef.current;
+    if (!code || !textarea || !windowRef.current) return;
+    const lines = htmlLinesRef.current;
+    const first = Math.max(0, Math.floor(textarea.scrollTop / LINE_HEIGHT_PX) - OVERSCAN_LINES);
+    const visible = Math.ceil(textarea.clientHeight / LINE_HEIGHT_PX);
+    const last = Math.min(lines.length, first + visible + 2 * OVERSCAN_LINES);
+    renderLineWindow(code, lines, windowRef.current, first, last);
+    // The longest line may be outside the window; keep horizontal scrolling in step anyway
+    code.style.minWidth = `${textarea.scrollWidth}px`;
   };
 
   // Sync scrolling between textarea and pre block
   const handleScroll = () => {
     if (textareaRef.current && preRef.current) {
+      renderVisibleLines();
       preRef.current.scrollTop = textareaRef.current.scrollTop;
       preRef.current.scrollLeft = textareaRef.current.scrollLeft;
     }
   };
 
+  // Switches between rendering every line and a scroll window when the line count crosses the threshold
+  const syncRenderMode = () => {
+    const code = codeRef.current;
+    if (!code) return;
+    const virtualize = htmlLinesRef.current.length > virtualizeAboveRef.current;
+    if (virtualize === (windowRef.current !== null)) return;
+    code.replaceChildren();
+    code.style.paddingTop = code.style.height = code.style.minWidth = '';
+    if (virtualize) {
+      windowRef.current = { start: 0, html: [] };
+    } else {
+      windowRef.current = null;
+      htmlLinesRef.current.forEach(html => code.appendChild(createLine(html)));
+    }
+  };
+
+  // Highlighting runs in a worker; patches are applied to the line spans outside React's render
+  useEffect(() => {
+    const highlighter = new LineHighlighter(patch => {
+      if (!codeRef.current) return;
+      htmlLinesRef.current.splice(patch.start, patch.deleteCount, ...patch.lines);
+      if (!windowRef.current) applyHighlightPatch(codeRef.current, patch);
+      syncRenderMode();
+      handleScroll();
+    });
+    highlighterRef.current = highlighter;
+
+    // The window depends on the editor height
+    const resizeObserver = new ResizeObserver(() => renderVisibleLines());
+    if (textareaRef.current) resizeObserver.observe(textareaRef.current);
+
+    return () => {
+      resizeObserver.disconnect();
+      highlighter.dispose();
+      highlighterRef.current = null;
+      htmlLinesRef.current = [];
+      windowRef.current = null;
+      codeRef.current?.replaceChildren();
+    };
+  }, []);
+
+  useEffect(() => {
+    syncRenderMode();
+    handleScroll();
+  }, [virtualizeAboveLines]);
+
   // Trigger Highlight on value change
   useEffect(() => {
-    if (codeRef.current && window.Prism) {
-      // Update text content manually to avoid React re-render flicker with Prism
-      codeRef.current.textContent = value || placeholder || ''; 
-      
-      // If empty and has placeholder, don't highlight comments if it's just placeholder text logic, 
-      // but here we just highlight whatever is in the block.
-      
-      codeRef.current.className = `language-${getPrismLang(language)}`;
-      window.Prism.highlightElement(codeRef.current);
-    }
+    highlighterRef.current?.update(value || placeholder || '', language);
   }, [value, language, placeholder]);
 
   return (
@@ -97,6 +229,7 @@ export const CodeEditor: React.FC<CodeEditorProps> = ({
             value={value}
             onChange={(e) => onChange && onChange(e.target.value)}
             onScroll={handleScroll}
+            onBlur={onBlur}
             readOnly={readOnly}
             placeholder={placeholder}
           />
@@ -107,8 +240,8 @@ export const CodeEditor: React.FC<CodeEditorProps> = ({
             aria-hidden="true"
             className="absolute inset-0 w-full h-full m-0 p-4 font-mono text-sm leading-6 pointer-events-none overflow-hidden whitespace-pre !bg-transparent"
           >
-            <code ref={codeRef} className={`language-${getPrismLang(language)}`}>
-              {/* Content injected via useEffect */}
+            <code ref={codeRef} className={`language-${getPrismLanguage(language)} block box-border`}>
+              {/* Line spans patched by the highlighter */}
             </code>
           </pre>
 
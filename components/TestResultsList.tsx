@@ -0,0 +1,159 @@
+import React, { memo, useLayoutEffect, useMemo, useRef, useState } from 'react';
+import { Check, XCircle } from 'lucide-react';
+import { TestCaseResult } from '../types';
+
+interface TestResultsListProps {
+  results: TestCaseResult[];
+  expandedId: string | null;
+  onToggle: (id: string) => void;
+}
+
+interface TestResultRowProps {
+  test: TestCaseResult;
+  expanded: boolean;
+  onToggle: (id: string) => void;
+}
+
+// Tests at or above this duration are highlighted in the results panel
+const SLOW_TEST_MS = 100;
+
+// Collapsed rows are an h-7 header plus a 1px bottom border
+const ROW_HEIGHT_PX = 29;
+const OVERSCAN_ROWS = 10;
+
+export const formatDuration = (ms: number) => {
+  if (Number.isInteger(ms) || ms >= 10) return `${Math.round(ms)}ms`;
+  return `${ms.toFixed(2)}ms`;
+};
+
+const formatPhases = (test: TestCaseResult) => test.phases
+  ? `setup ${formatDuration(test.phases.setup)} · call ${formatDuration(test.phases.call)} · teardown ${formatDuration(test.phases.teardown)}`
+  : formatDuration(test.duration);
+
+// Result objects are never mutated once reported, so their lowercased names can be cached by identity
+const lowercaseNames = new WeakMap<TestCaseResult, string>();
+
+export const getLowercaseName = (test: TestCaseResult): string => {
+  let name = lowercaseNames.get(test);
+  if (name === undefined) {
+    name = (test.name || "Unknown").toLowerCase();
+    lowercaseNames.set(test, name);
+  }
+  return name;
+};
+
+const TestResultRow = memo<TestResultRowProps>(({ test, expanded, onToggle }) => (
+  <div className="flex flex-col border-b border-vs-border/10">
+    <div
+      className={`px-4 h-7 flex items-center gap-3 hover:bg-vs-border/30 group cursor-pointer ${expanded ? 'bg-vs-border/30' : ''}`}
+      onClick={() => test.status === 'fail' && onToggle(test.id)}
+    >
+      {test.status === 'pass'
+        ? <Check className="w-3.5 h-3.5 text-vs-green shrink-0" />
+        : <XCircle className="w-3.5 h-3.5 text-red-400 shrink-0" />
+      }
+      <span className={`text-xs font-mono opacity-80 truncate flex-1 ${test.status === 'fail' ? 'text-red-300' : 'text-vs-fg'}`} title={test.name}>
+        {test.name || "Unnamed Test"}
+      </span>
+
+      <div className="flex items-center gap-3">
+        <span
+          className={`text-[10px] font-mono ${test.duration >= SLOW_TEST_MS ? 'text-amber-400 opacity-90' : 'text-vs-fg opacity-40'}`}
+          title={formatPhases(test)}
+        >
+          {formatDuration(test.duration)}
+        </span>
+      </div>
+    </div>
+
+    {/* Error Detail View */}
+    {test.status === 'fail' && expanded && test.failureDetails && (
+      <div data-expanded-detail className="px-4 py-3 bg-[#252526] border-t border-vs-border/20 text-xs font-mono overflow-x-auto animate-in slide-in-from-top-1 duration-200">
+         <div className="text-red-300 mb-2 font-bold">
+           ● {test.name || "Unnamed Test"}
+         </div>
+         <div className="pl-2 border-l-2 border-red-500/50 ml-1">
+            <div className="mb-2 whitespace-pre-wrap text-vs-fg/90">
+              {test.failureDetails.message}
+            </div>
+            {test.failureDetails.expected && (
+              <div className="grid grid-cols-[80px_1fr] gap-2 mb-3 text-vs-fg/80">
+                <span className="text-green-500">Expected:</span>
+                <span className="text-green-500">{test.failureDetails.expected}</span>
+                <span className="text-red-400">Received:</span>
+                <span className="text-red-400">{test.failureDetails.received}</span>
+              </div>
+            )}
+            <div className="text-vs-fg/50 whitespace-pre overflow-x-auto">
+              {test.failureDetails.stack}
+            </div>
+         </div>
+      </div>
+    )}
+  </div>
+));
+
+/**
+ * Scrollable results list that only mounts the rows in view plus overscan.
+ * Rows have a fixed height except the expanded one, whose detail panel is
+ * measured, so the visible range is found with constant-time offset math.
+ */
+export const TestResultsList: React.FC<TestResultsListProps> = ({ results, expandedId, onToggle }) => {
+  const containerRef = useRef<HTMLDivElement>(null);
+  const [scrollTop, setScrollTop] = useState(0);
+  const [viewportHeight, setViewportHeight] = useState(0);
+  const [detailHeight, setDetailHeight] = useState(0);
+
+  useLayoutEffect(() => {
+    const container = containerRef.current;
+    if (!container) return;
+    setViewportHeight(container.clientHeight);
+    const observer = new ResizeObserver(() => setViewportHeight(container.clientHeight));
+    observer.observe(container);
+    return () => observer.disconnect();
+  }, []);
+
+  const expandedIndex = useMemo(
+    () => expandedId === null ? -1 : results.findIndex(test => test.id === expandedId),
+    [results, expandedId]
+  );
+  const extra = expandedIndex >= 0 ? detailHeight : 0;
+
+  const offsetOf = (index: number) => index * ROW_HEIGHT_PX + (expandedIndex >= 0 && index > expandedIndex ? extra : 0);
+  const indexAt = (y: number) => {
+    const index = Math.floor(y / ROW_HEIGHT_PX);
+    if (expandedIndex < 0 || index <= expandedIndex) return index;
+    return Math.max(expandedIndex, Math.floor((y - extra) / ROW_HEIGHT_PX));
+  };
+
+  const first = Math.max(0, indexAt(scrollTop) - OVERSCAN_ROWS);
+  const last = Math.min(results.length, indexAt(scrollTop + viewportHeight) + 1 + OVERSCAN_ROWS);
+
+  // The expanded row's details vary in height; measure them after each render
+  useLayoutEffect(() => {
+    const detail = containerRef.current?.querySelector<HTMLElement>('[data-expanded-detail]');
+    const height = detail ? detail.offsetHeight : 0;
+    if (detail && height !== detailHeight) setDetailHeight(height);
+  });
+
+  return (
+    <div
+      ref={containerRef}
+      className="max-h-[40vh] overflow-y-auto border-t border-vs-border/10 bg-vs-bg/50"
+      onScroll={(e) => setScrollTop(e.currentTarget.scrollTop)}
+    >
+      <div style={{ height: results.length * ROW_HEIGHT_PX + extra }}>
+        <div style={{ transform: `translateY(${offsetOf(first)}px)` }}>
+          {results.slice(first, last).map(test => (
+            <TestResultRow
+              key={test.id}
+              test={test}
+              expanded={test.id === expandedId}
+              onToggle={onToggle}
+            />
+          ))}
+        </div>
+      </div>
+    </div>
+  );
+};
@@ -0,0 +1,158 @@
+import { useState, useEffect, useRef, useCallback } from 'react';
+import { DebounceStats } from '../types';
+
+export interface AdaptiveDebounceOptions {
+  minDelayMs: number;
+  maxDelayMs: number;
+  // Delay used until enough keystrokes have been observed
+  initialDelayMs: number;
+  // How long a scheduled emission may wait for the browser to go idle
+  idleTimeoutMs: number;
+}
+
+const DEFAULT_OPTIONS: AdaptiveDebounceOptions = {
+  minDelayMs: 150,
+  maxDelayMs: 2000,
+  initialDelayMs: 500,
+  idleTimeoutMs: 100
+};
+
+// Gaps longer than this are pauses between thoughts, not typing cadence
+const MAX_TYPING_INTERVAL_MS = 2000;
+const MAX_INTERVAL_SAMPLES = 50;
+const MIN_INTERVAL_SAMPLES = 5;
+// Margin over the chosen keystroke-interval quantile
+const PAUSE_MARGIN = 1.2;
+
+const quantile = (sorted: number[], q: number) =>
+  sorted[Math.min(sorted.length - 1, Math.floor(q * sorted.length))];
+
+/**
+ * A request is wasted when the user types again while it is still running.
+ * The more a request costs, the longer the pause has to be before sending it:
+ * the delay is the keystroke-interval quantile `q`, rising from 0.5 for
+ * instant generations towards 0.95 for very slow ones. The delay is never
+ * longer than the generation itself, since a fast tier is cheaper to re-run
+ * than to wait for.
+ */
+export const chooseDebounceDelay = (
+  intervals: number[],
+  expectedLatencyMs: number,
+  options: AdaptiveDebounceOptions = DEFAULT_OPTIONS
+): number => {
+  const ceiling = Math.min(options.maxDelayMs, Math.max(options.minDelayMs, expectedLatencyMs));
+  if (intervals.length < MIN_INTERVAL_SAMPLES) {
+    return Math.min(ceiling, options.initialDelayMs);
+  }
+  const q = 0.5 + 0.45 * expectedLatencyMs / (expectedLatencyMs + 3000);
+  const pause = quantile([...intervals].sort((a, b) => a - b), q) * PAUSE_MARGIN;
+  return Math.round(Math.min(ceiling, Math.max(options.minDelayMs, pause)));
+};
+
+const requestIdle = (callback: () => void, timeout: number): (() => void) => {
+  if (typeof window.requestIdleCallback === 'function') {
+    const handle = window.requestIdleCallback(callback, { timeout });
+    return () => window.cancelIdleCallback(handle);
+  }
+  const handle = setTimeout(callback, 0);
+  return () => clearTimeout(handle);
+};
+
+/**
+ * Debounces `value` with a delay learned from the user's typing cadence and
+ * the expected latency of the generation it triggers. Once the delay expires
+ * the value is emitted in browser idle time, so the emission does not land in
+ * the middle of a keystroke's frame. `flush` emits a pending value right away,
+ * e.g. when the editor loses focus. `onEmit` runs outside render just before
+ * each emission, so state it sets lands in the same render as the new value.
+ *
+ * An emission counts as wasted when the value changes again within the
+ * expected latency, i.e. while the generation it started is most likely still
+ * running and about to be superseded.
+ */
+export function useAdaptiveDebounce<T>(
+  value: T,
+  expectedLatencyMs: number,
+  overrides: Partial<AdaptiveDebounceOptions> = {},
+  onEmit?: (value: T) => void
+): { value: T; flush: () => void; stats: DebounceStats } {
+  const options = { ...DEFAULT_OPTIONS, ...overrides };
+  const [debouncedValue, setDebouncedValue] = useState<T>(value);
+
+  const previousValueRef = useRef(value);
+  const intervalsRef = useRef<number[]>([]);
+  const lastChangeRef = useRef<number | null>(null);
+  const lastEmitRef = useRef<{ at: number; latencyMs: number; superseded: boolean } | null>(null);
+  const pendingRef = useRef<{ value: T } | null>(null);
+  const statsRef = useRef({ emitted: 0, wasted: 0, flushed: 0 });
+  const delay = chooseDebounceDelay(intervalsRef.current, expectedLatencyMs, options);
+  const latencyRef = useRef(expectedLatencyMs);
+  latencyRef.current = expectedLatencyMs;
+  const onEmitRef = useRef(onEmit);
+  onEmitRef.current = onEmit;
+
+  const emit = useCallback(() => {
+    const pending = pendingRef.current;
+    if (!pending) return;
+    pendingRef.current = null;
+    statsRef.current.emitted++;
+    lastEmitRef.current = { at: performance.now(), latencyMs: latencyRef.current, superseded: false };
+    onEmitRef.current?.(pending.value);
+    setDebouncedValue(pending.value);
+  }, []);
+
+  // Learn the typing cadence and spot emissions that this change supersedes
+  useEffect(() => {
+    if (Object.is(value, previousValueRef.current)) return;
+    previousValueRef.current = value;
+    const now = performance.now();
+    if (lastChangeRef.current !== null) {
+      const interval = now - lastChangeRef.current;
+      if (interval < MAX_TYPING_INTERVAL_MS) {
+        intervalsRef.current.push(interval);
+        if (intervalsRef.current.length > MAX_INTERVAL_SAMPLES) intervalsRef.current.shift();
+      }
+    }
+    lastChangeRef.current = now;
+
+    const lastEmit = lastEmitRef.current;
+    if (lastEmit && !lastEmit.superseded && now - lastEmit.at < lastEmit.latencyMs) {
+      lastEmit.superseded = true;
+      statsRef.current.wasted++;
+    }
+    pendingRef.current = { value };
+  }, [value]);
+
+  useEffect(() => {
+    if (!pendingRef.current) return;
+    let cancelIdle: (() => void) | null = null;
+    const timer = setTimeout(() => {
+      cancelIdle = requestIdle(emit, options.idleTimeoutMs);
+    }, delay);
+    return () => {
+      clearTimeout(timer);
+      cancelIdle?.();
+    };
+  }, [value, delay, emit, options.idleTimeoutMs]);
+
+  const flush = useCallback(() => {
+    if (!pendingRef.current) return;
+    statsRef.current.flushed++;
+    emit();
+  }, [emit]);
+
+  const { emitted, wasted, flushed } = statsRef.current;
+  const sorted = [...intervalsRef.current].sort((a, b) => a - b);
+  return {
+    value: debouncedValue,
+    flush,
+    stats: {
+      delayMs: delay,
+      typingIntervalMs: sorted.length > 0 ? Math.round(quantile(sorted, 0.5)) : undefined,
+      emitted,
+      wasted,
+      flushed,
+      wastedRate: emitted > 0 ? wasted / emitted : 0
+    }
+  };
+}
@@ -0,0 +1,7 @@
+import { useSyncExternalStore } from 'react';
+import { getPythonLoadState, subscribePythonLoadState } from '../services/pyodideRuntime';
+import { RuntimeLoadState } from '../types';
+
+export function usePythonLoadState(): RuntimeLoadState {
+  return useSyncExternalStore(subscribePythonLoadState, getPythonLoadState);
+}
@@ -0,0 +1,109 @@
+// Local stand-in for the Gemini streaming endpoint, used to exercise client-side
+// throttling and retries. Point the app at it with GEMINI_BASE_URL=http://localhost:8787
+// (and any non-empty GEMINI_API_KEY) in .env.local.
+//
+//   node scripts/gemini-stub.mjs [--port=8787] [--fail-rate=0.5] [--fail-status=429] [--latency=300]
+import http from 'node:http';
+
+const args = Object.fromEntries(
+  process.argv.slice(2).map(arg => arg.replace(/^--/, '').split('='))
+);
+const port = Number(args.port ?? 8787);
+const failRate = Number(args['fail-rate'] ?? 0.5);
+const failStatus = Number(args['fail-status'] ?? 429);
+const latencyMs = Number(args.latency ?? 300);
+
+const STATUS_NAMES = { 429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL', 503: 'UNAVAILABLE' };
+
+let requestCount = 0;
+let lastRequestAt = 0;
+
+const cors = {
+  'Access-Control-Allow-Origin': '*',
+  'Access-Control-Allow-Headers': '*',
+  'Access-Control-Allow-Methods': 'POST, OPTIONS'
+};
+
+const readBody = (req) => new Promise((resolve) => {
+  let body = '';
+  req.on('data', chunk => { body += chunk; });
+  req.on('end', () => resolve(body));
+});
+
+const unitNames = (instruction) => {
+  const match = /Only write tests for these top-level definitions: ([^.]+)\./.exec(instruction);
+  return match ? match[1].split(',').map(name => name.trim()) : [];
+};
+
+// Minimal passing suite in the requested language, one section per requested unit
+const buildTests = (instruction) => {
+  const python = instruction.includes('pytest');
+  const names = unitNames(instruction);
+  const sections = (names.length > 0 ? names : ['stub']).map(name => python
+    ? `${names.length ? `# rora:unit ${name}\n` : ''}def test_${name}_stub():\n    assert True\n`
+    : `${names.length ? `// rora:unit ${name}\n` : ''}describe('${name}', () => {\n  it('passes', () => {\n    expect(true).toBe(true);\n  });\n});\n`);
+  return sections.join('\n');
+};
+
+const server = http.createServer(async (req, res) => {
+  if (req.method === 'OPTIONS') {
+    res.writeHead(204, cors);
+    res.end();
+    return;
+  }
+
+  const body = await readBody(req);
+  const now = Date.now();
+  const gap = lastRequestAt ? `${now - lastRequestAt}ms since previous` : 'first request';
+  lastRequestAt = now;
+  requestCount++;
+
+  if (Math.random() < failRate) {
+    console.log(`#${requestCount} ${req.url} -> ${failStatus} (${gap})`);
+    res.writeHead(failStatus, { ...cors, 'Content-Type': 'application/json' });
+    res.end(JSON.stringify({
+      error: {
+        code: failStatus,
+        message: 'Injected failure from the local stub.',
+        status: STATUS_NAMES[failStatus] ?? 'UNKNOWN',
+        details: [{ '@type': 'type.googleapis.com/google.rpc.RetryInfo', retryDelay: '1s' }]
+      }
+    }));
+    return;
+  }
+
+  let instruction = '';
+  try {
+    const request = JSON.parse(body);
+    instruction = (request.systemInstruction?.parts ?? []).map(p => p.text).join('\n');
+  } catch {
+    // Malformed bodies still get a default suite
+  }
+  console.log(`#${requestCount} ${req.url} -> 200 (${gap})`);
+
+  const text = buildTests(instruction);
+  const half = Math.ceil(text.length / 2);
+  res.writeHead(200, { ...cors, 'Content-Type': 'text/event-stream' });
+  const send = (chunk) => res.write(`data: ${JSON.stringify(chunk)}\r\n\r\n`);
+  const candidate = (part) => ({ candidates: [{ index: 0, content: { role: 'model', parts: [{ text: part }] } }] });
+
+  setTimeout(() => {
+    send(candidate(text.slice(0, half)));
+    setTimeout(() => {
+      const outputTokens = Math.ceil(text.length / 4);
+      send({
+        ...candidate(text.slice(half)),
+        usageMetadata: {
+          promptTokenCount: Math.ceil(body.length / 4),
+          candidatesTokenCount: outputTokens,
+          totalTokenCount: Math.ceil(body.length / 4) + outputTokens
+        }
+      });
+      res.end();
+    }, latencyMs / 2);
+  }, latencyMs / 2);
+});
+
+server.listen(port, () => {
+  console.log(`Gemini stub listening on http://localhost:${port} (fail rate ${failRate}, status ${failStatus})`);
+});
@@ -0,0 +1,4 @@
+export const createAbortError = () => new DOMException('The operation was aborted.', 'AbortError');
+
+export const isAbortError = (error: unknown): boolean =>
+  error instanceof DOMException && error.name === 'AbortError';
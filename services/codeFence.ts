@@ -0,0 +1,52 @@
+// A suffix that may still turn out to be the closing fence ("\n```", optionally followed by whitespace)
+const PENDING_CLOSE = /\n(?:`{0,2}|```\s*)$/;
+const OPENING_FENCE = /^```[a-z]*$/i;
+
+/**
+ * Strips a leading ```lang line and a trailing ``` fence from streamed model
+ * output without waiting for the full response. Only the undecided opening
+ * line and a short tail are ever buffered.
+ */
+export class CodeFenceStripper {
+  private head = '';
+  private started = false;
+  private tail = '';
+
+  push(chunk: string): string {
+    let text = chunk;
+    if (!this.started) {
+      this.head += chunk;
+      const newline = this.head.indexOf('\n');
+      if (newline === -1) {
+        // Still could be an opening fence; wait for the rest of the line
+        if ('```'.startsWith(this.head) || this.head.startsWith('```')) return '';
+        text = this.head;
+      } else {
+        const firstLine = this.head.slice(0, newline);
+        text = OPENING_FENCE.test(firstLine) ? this.head.slice(newline + 1) : this.head;
+      }
+      this.started = true;
+      this.head = '';
+    }
+
+    const combined = this.tail + text;
+    const pending = PENDING_CLOSE.exec(combined);
+    const cut = pending ? pending.index : combined.length;
+    this.tail = combined.slice(cut);
+    return combined.slice(0, cut);
+  }
+
+  /**
+   * Flushes whatever was held back once the stream has ended.
+   */
+  end(): string {
+    if (!this.started) {
+      const head = this.head;
+      this.head = '';
+      return OPENING_FENCE.test(head) ? '' : head;
+    }
+    const tail = this.tail;
+    this.tail = '';
+    return /^\n```\s*$/.test(tail) ? '' : tail;
+  }
+}
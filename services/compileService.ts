@@ -0,0 +1,151 @@
+import { hashString } from './contentHash';
+import { LruCache } from './lruCache';
+
+export type TranspileTarget = 'modern' | 'legacy';
+
+export interface TranspileOptions {
+  target: TranspileTarget;
+}
+
+const BABEL_URL = 'https://unpkg.com/@babel/standalone/babel.min.js';
+const CACHE_CAPACITY = 64;
+
+const DEFAULT_TRANSPILE_OPTIONS: TranspileOptions = { target: 'modern' };
+
+const buildBabelConfig = (options: TranspileOptions) => ({
+  presets: [
+    ['env', {
+      // Workers run in evergreen browsers; only lower syntax when explicitly asked
+      targets: options.target === 'legacy' ? { ie: '11' } : { esmodules: true },
+      modules: 'commonjs'
+    }],
+    'typescript'
+  ],
+  filename: 'file.ts',
+});
+
+/**
+ * Dedicated compile worker. Babel is loaded once inside the worker so large
+ * transforms never block typing on the main thread.
+ */
+const COMPILE_WORKER_SCRIPT = `
+  importScripts(${JSON.stringify(BABEL_URL)});
+
+  self.onmessage = (event) => {
+    const { id, code, config } = event.data;
+    try {
+      const result = Babel.transform(code, config);
+      self.postMessage({ id, code: result.code || code });
+    } catch (e) {
+      self.postMessage({ id, error: String(e) });
+    }
+  };
+`;
+
+interface PendingCompile {
+  resolve: (code: string) => void;
+  reject: (error: Error) => void;
+}
+
+const cache = new LruCache<string, string>(CACHE_CAPACITY);
+const inFlight = new Map<string, Promise<string>>();
+const pending = new Map<number, PendingCompile>();
+let compileWorker: Worker | null = null;
+let compileWorkerUrl: string | null = null;
+let workerUnavailable = false;
+let nextCompileId = 0;
+
+const failPending = (message: string) => {
+  pending.forEach(p => p.reject(new Error(message)));
+  pending.clear();
+};
+
+const getCompileWorker = (): Worker | null => {
+  if (compileWorker || workerUnavailable) return compileWorker;
+  try {
+    const blob = new Blob([COMPILE_WORKER_SCRIPT], { type: 'application/javascript' });
+    compileWorkerUrl = URL.createObjectURL(blob);
+    compileWorker = new Worker(compileWorkerUrl);
+
+    compileWorker.onmessage = (e) => {
+      const entry = pending.get(e.data.id);
+      if (!entry) return;
+      pending.delete(e.data.id);
+      if (e.data.error) {
+        entry.reject(new Error(e.data.error));
+      } else {
+        entry.resolve(e.data.code);
+      }
+    };
+
+    compileWorker.onerror = (e) => {
+      // Babel failed to load inside the worker (offline, CSP); fall back to the main thread
+      e.preventDefault();
+      console.error("Compile worker error:", e.message);
+      compileWorker?.terminate();
+      compileWorker = null;
+      if (compileWorkerUrl) URL.revokeObjectURL(compileWorkerUrl);
+      compileWorkerUrl = null;
+      workerUnavailable = true;
+      failPending(`Compile worker failed: ${e.message}`);
+    };
+  } catch (e) {
+    console.error("Failed to start compile worker", e);
+    workerUnavailable = true;
+    compileWorker = null;
+  }
+  return compileWorker;
+};
+
+const transformOnMainThread = (code: string, config: object): string => {
+  if (!window.Babel) return code;
+  const result = window.Babel.transform(code, config);
+  return result.code || code;
+};
+
+const transformInWorker = (code: string, config: object): Promise<string> => {
+  const worker = getCompileWorker();
+  if (!worker) {
+    return Promise.resolve(transformOnMainThread(code, config));
+  }
+  return new Promise<string>((resolve, reject) => {
+    const id = ++nextCompileId;
+    pending.set(id, { resolve, reject });
+    worker.postMessage({ id, code, config });
+  }).catch((error: Error) => {
+    if (workerUnavailable) return transformOnMainThread(code, config);
+    throw error;
+  });
+};
+
+/**
+ * Transpiles TypeScript/modern JS to CommonJS for the execution worker.
+ * Results are cached by a hash of the code and options, so unchanged source is
+ * never recompiled when only the tests change.
+ */
+export const transpile = (code: string, options: Partial<TranspileOptions> = {}): Promise<string> => {
+  const resolved = { ...DEFAULT_TRANSPILE_OPTIONS, ...options };
+  const key = hashString(code, resolved.target === 'legacy' ? 1 : 0);
+
+  const cached = cache.get(key);
+  if (cached !== undefined) return Promise.resolve(cached);
+
+  const existing = inFlight.get(key);
+  if (existing) return existing;
+
+  const promise = transformInWorker(code, buildBabelConfig(resolved))
+    .then(output => {
+      cache.set(key, output);
+      return output;
+    })
+    .finally(() => inFlight.delete(key));
+  inFlight.set(key, promise);
+  return promise;
+};
+
+/**
+ * Starts the compile worker so Babel is loaded before the first run.
+ */
+export const prewarmCompiler = () => {
+  getCompileWorker();
+};
@@ -1,279 +1,104 @@
 
-import { SupportedLanguage, TestCaseResult } from '../types';
-import { JEST_POLYFILLS } from './runtimePolyfills';
+import { SupportedLanguage, TestCaseResult, GenerationMetrics } from '../types';
+import { runInWorkerPool, prewarmWorkerPool, TestResultListener } from './workerPool';
+import { transpile, prewarmCompiler } from './compileService';
+import { runPythonTests, preloadPython } from './pyodideRuntime';
 
 declare global {
   interface Window {
     Babel: any;
-    loadPyodide: any;
   }
 }
 
-let pyodideInstance: any = null;
+// Most recent run latency: JS split by whether a pre-warmed worker was available,
+// Python split into source import and test execution wall-clock
+const runLatencyStats: Pick<GenerationMetrics, 'coldRunMs' | 'warmRunMs' | 'sourceImportMs' | 'testExecutionMs'> = {};
+
+export const getRunLatencyStats = () => ({ ...runLatencyStats });
 
 /**
- * Transforms TypeScript/ES6 to ES5 for the browser using Babel Standalone.
+ * Transforms TypeScript/ES6 for the browser off the main thread, reusing cached output.
  */
-const transpileCode = (code: string): string => {
-  if (!window.Babel) return code;
+const transpileCode = async (code: string): Promise<string> => {
   try {
-    const result = window.Babel.transform(code, {
-      presets: [
-        ['env', { 
-          targets: { ie: '11' }, 
-          modules: 'commonjs' 
-        }], 
-        'typescript'
-      ],
-      filename: 'file.ts',
-    });
-    return result.code || code;
+    return await transpile(code);
   } catch (e) {
     console.error("Babel transform error:", e);
-    throw new Error(`Syntax Error in Source Code: ${e}`);
+    throw new Error(`Syntax Error in Source Code: ${e instanceof Error ? e.message : e}`);
   }
 };
 
 /**
- * Executes JavaScript or TypeScript tests in a Web Worker.
+ * Executes JavaScript or TypeScript tests in a pooled, pre-warmed Web Worker.
+ * Each result is passed to `onResult` as soon as its test settles.
  */
-const executeJS = async (sourceCode: string, testCode: string): Promise<TestCaseResult[]> => {
-  return new Promise((resolve, reject) => {
-    try {
-      const transpiledSource = transpileCode(sourceCode);
-      const transpiledTest = transpileCode(testCode);
-
-      const workerScript = `
-        ${JEST_POLYFILLS}
-        
-        var exports = {};
-        var module = { exports: exports };
-        self.exports = exports; 
-
-        (async () => {
-          try {
-            const sourceText = ${JSON.stringify(transpiledSource)};
-            const testText = ${JSON.stringify(transpiledTest)};
-            
-            try {
-                eval(sourceText);
-            } catch(e) {
-                throw new Error("Source Code execution failed: " + e.message);
-            }
-            
-            for (var key in exports) {
-               if (exports.hasOwnProperty(key)) {
-                  self[key] = exports[key];
-               }
-            }
-
-            try {
-                eval(testText);
-            } catch(e) {
-                throw new Error("Test Script execution failed: " + e.message);
-            }
-            
-            setTimeout(() => {
-                self.postMessage({ type: 'result', results: self.__test_results__ || [] });
-            }, 100);
-            
-          } catch (e) {
-            self.postMessage({ type: 'error', error: e.message + "\\n" + (e.stack || '') });
-          }
-        })();
-      `;
-
-      const blob = new Blob([workerScript], { type: 'application/javascript' });
-      const worker = new Worker(URL.createObjectURL(blob));
-
-      const timeoutId = setTimeout(() => {
-        worker.terminate();
-        reject(new Error("Execution timed out (Infinite loop?)"));
-      }, 5000);
-
-      worker.onmessage = (e) => {
-        clearTimeout(timeoutId);
-        if (e.data.type === 'result') {
-          resolve(e.data.results);
-        } else if (e.data.type === 'error') {
-          resolve([{
-              id: 'global_error',
-              name: 'Runtime Error',
-              status: 'fail',
-              duration: 0,
-              failureDetails: {
-                  message: e.data.error,
-                  stack: ''
-              }
-          }]);
-        }
-        worker.terminate();
-      };
-
-      worker.onerror = (e) => {
-        clearTimeout(timeoutId);
-        worker.terminate();
-        reject(new Error(`Worker Error: ${e.message}`));
-      };
+const executeJS = async (
+  sourceCode: string,
+  testCode: string,
+  onResult?: TestResultListener,
+  signal?: AbortSignal
+): Promise<TestCaseResult[]> => {
+  const [transpiledSource, transpiledTest] = await Promise.all([
+    transpileCode(sourceCode),
+    transpileCode(testCode)
+  ]);
+
+  const outcome = await runInWorkerPool(transpiledSource, transpiledTest, onResult, signal);
+  if (outcome.warm) {
+    runLatencyStats.warmRunMs = outcome.durationMs;
+  } else {
+    runLatencyStats.coldRunMs = outcome.durationMs;
+  }
 
-    } catch (error: any) {
-      reject(error);
-    }
-  });
+  if (outcome.message.type === 'result') {
+    return outcome.message.results;
+  }
+  return [{
+      id: 'global_error',
+      name: 'Runtime Error',
+      status: 'fail',
+      duration: 0,
+      failureDetails: {
+          message: outcome.message.error,
+          stack: ''
+      }
+  }];
 };
 
 /**
- * Executes Python tests using Pyodide.
+ * Executes Python tests using Pyodide in a dedicated worker.
  */
-const executePython = async (sourceCode: string, testCode: string): Promise<TestCaseResult[]> => {
-  if (!pyodideInstance) {
-      if (!window.loadPyodide) {
-          throw new Error("Pyodide script not loaded. Check internet connection.");
-      }
-      pyodideInstance = await window.loadPyodide();
-      // Load micropip just in case, though we mock most things
-      await pyodideInstance.loadPackage("micropip");
-  }
-
-  // Set code as globals to avoid syntax errors during string injection
-  pyodideInstance.globals.set("USER_SOURCE_CODE", sourceCode);
-  pyodideInstance.globals.set("USER_TEST_CODE", testCode);
-
-  const pythonRunner = `
-import sys
-import traceback
-from unittest.mock import MagicMock
-
-# 1. Mock External Libraries
-# This prevents 'ModuleNotFoundError' for common libs
-sys.modules['requests'] = MagicMock()
-sys.modules['numpy'] = MagicMock()
-sys.modules['pandas'] = MagicMock()
-
-# 2. Simple Pytest Shim
-# This allows 'import pytest' to work and provides a basic 'raises' context manager
-# so that 'with pytest.raises(...):' doesn't crash immediately.
-class PytestShim:
-    def raises(self, exc):
-        class RaisesContext:
-            def __enter__(self): return None
-            def __exit__(self, exc_type, exc_val, exc_tb):
-                if exc_type and issubclass(exc_type, exc):
-                    return True # Suppress expected exception
-                return False # Propagate others
-        return RaisesContext()
-    
-    @property
-    def mark(self):
-        return MagicMock()
-    
-    def fixture(self, func):
-        return func
-
-sys.modules['pytest'] = PytestShim()
-
-results = []
-
-try:
-    # 3. Execute Source and Test Code
-    exec(USER_SOURCE_CODE, globals())
-    exec(USER_TEST_CODE, globals())
-
-    # 4. Discover Test Functions
-    test_functions = [name for name in list(globals().keys()) if name.startswith('test_') and callable(globals()[name])]
-    
-    if not test_functions:
-        results.append({
-            "name": "Discovery", 
-            "status": "fail", 
-            "duration": 0, 
-            "error": {"message": "No functions starting with 'test_' found.", "stack": ""}
-        })
-
-    # 5. Run Tests
-    for test_name in test_functions:
-        try:
-            func = globals()[test_name]
-            func()
-            results.append({"name": test_name, "status": "pass", "duration": 1, "error": None})
-        except AssertionError as ae:
-            results.append({
-                "name": test_name, 
-                "status": "fail", 
-                "duration": 1,
-                "error": {
-                    "message": str(ae) if str(ae) else "Assertion failed", 
-                    "stack": traceback.format_exc()
-                }
-            })
-        except Exception as e:
-            results.append({
-                "name": test_name, 
-                "status": "fail", 
-                "duration": 1,
-                "error": {
-                    "message": f"{type(e).__name__}: {str(e)}", 
-                    "stack": traceback.format_exc()
-                }
-            })
-
-except Exception as e:
-    results.append({
-        "name": "Runtime Error",
-        "status": "fail",
-        "duration": 0,
-        "error": {
-            "message": str(e),
-            "stack": traceback.format_exc()
-        }
-    })
-
-results
-`;
-
-  try {
-      const pyResults = await pyodideInstance.runPythonAsync(pythonRunner);
-      
-      // Use proper conversion to handle Pyodide Proxies
-      const jsResults = pyResults.toJs({
-          dict_converter: Object.fromEntries,
-          create_proxies: false
-      });
-      
-      return jsResults.map((r: any) => ({
-          id: r.name,
-          name: r.name || "Unknown Python Test",
-          status: r.status,
-          duration: r.duration || 0,
-          failureDetails: r.error ? {
-              message: r.error.message,
-              stack: r.error.stack,
-          } : undefined
-      }));
-
-  } catch (e: any) {
-      console.error("Pyodide Error", e);
-      return [{
-          id: 'py_error',
-          name: 'Python Runtime Error',
-          status: 'fail',
-          duration: 0,
-          failureDetails: {
-              message: e.message,
-              stack: e.stack || ''
-          }
-      }];
+const executePython = async (sourceCode: string, testCode: string, signal?: AbortSignal): Promise<TestCaseResult[]> => {
+  const { results, timing } = await runPythonTests(sourceCode, testCode, signal);
+  if (timing) {
+    runLatencyStats.sourceImportMs = timing.importMs;
+    runLatencyStats.testExecutionMs = timing.executionMs;
   }
+  return results;
 };
 
 export const runTests = async (
   language: SupportedLanguage, 
   sourceCode: string, 
-  testCode: string
+  testCode: string,
+  onResult?: TestResultListener,
+  signal?: AbortSignal
 ): Promise<TestCaseResult[]> => {
   if (language === SupportedLanguage.PYTHON) {
-      return executePython(sourceCode, testCode);
+      return executePython(sourceCode, testCode, signal);
+  } else {
+      return executeJS(sourceCode, testCode, onResult, signal);
+  }
+};
+
+/**
+ * Boots execution runtimes ahead of the first run so it does not pay startup cost.
+ */
+export const prewarmExecution = (language: SupportedLanguage) => {
+  if (language === SupportedLanguage.PYTHON) {
+    preloadPython();
   } else {
-      return executeJS(sourceCode, testCode);
+    prewarmCompiler();
+    prewarmWorkerPool();
   }
 };
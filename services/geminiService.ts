@@ -1,5 +1,17 @@
 import { GoogleGenAI } from "@google/genai";
-import { SupportedLanguage, ModelTier } from "../types";
+import { SupportedLanguage, ModelTier, TokenUsage } from "../types";
+import { getCachedGeneration, setCachedGeneration } from "./generationCache";
+import { CodeFenceStripper } from "./codeFence";
+import { splitSourceUnits, SourceUnit, SourceOutline } from "./sourceUnits";
+import { semanticFingerprint } from "./semanticFingerprint";
+import { countTokens, preflightPrompt, usageFromMetadata, recordRequestUsage } from "./tokenAccounting";
+import { acquireRequestSlot } from "./rateLimiter";
+import { withRetry } from "./retry";
+import { StreamSingleFlight } from "./singleFlight";
+import { parseTestBlocks, assignTestBlocks, assembleTestFile, formatUnitMarker } from "./testBlocks";
+
+// Bump whenever getSystemInstruction or the generation config changes so cached tests are not reused
+export const SYSTEM_INSTRUCTION_VERSION = 1;
 
 const getSystemInstruction = (language: SupportedLanguage) => {
   const basePrompt = `You are a precise Unit Test Generator.
@@ -47,63 +59,367 @@ const getSystemInstruction = (language: SupportedLanguage) => {
 
 let aiClient: GoogleGenAI | null = null;
 
+/**
+ * Outcome of one generation. Calls that coalesce onto the same request share its result.
+ */
+export interface GenerationResult {
+  // Final text to display: the test file or a "// Error" / "// Waiting" / "// Cancelled" placeholder
+  text: string;
+  // Units sent to the model vs units in the source
+  regeneratedUnits: number;
+  totalUnits: number;
+  // Whether the generation was served entirely from the cache
+  fromCache: boolean;
+  // API-reported usage of the model request, null when nothing was sent
+  usage: TokenUsage | null;
+  // The prompt was cut to fit the token budget, so the tests may miss part of the source
+  truncated: boolean;
+}
+
+interface Completion {
+  text: string;
+  usage: TokenUsage | null;
+  truncated: boolean;
+}
+
+export interface GenerationStats {
+  aborted: number;
+  // Prompts cut or skipped by the pre-flight token budget
+  truncatedPrompts: number;
+  skippedPrompts: number;
+  // Requests retried after a 429/5xx, and requests delayed by the client-side rate limit
+  retries: number;
+  throttled: number;
+  // Calls that shared an identical in-flight generation instead of starting their own
+  coalesced: number;
+}
+
+const generationStats: GenerationStats = {
+  aborted: 0,
+  truncatedPrompts: 0,
+  skippedPrompts: 0,
+  retries: 0,
+  throttled: 0,
+  coalesced: 0
+};
+
+const placeholderResult = (text: string): GenerationResult =>
+  ({ text, regeneratedUnits: 0, totalUnits: 0, fromCache: false, usage: null, truncated: false });
+
+// Identical concurrent generations (StrictMode double effects, quick toggles) share one request
+const inFlight = new StreamSingleFlight<string, GenerationResult>(
+  placeholderResult("// Cancelled"),
+  () => { generationStats.coalesced++; }
+);
+
+export const getGenerationStats = (): GenerationStats => ({ ...generationStats });
+
+/**
+ * Placeholder outputs ("// Error ...", "// Waiting ...", "// Cancelled") are shown
+ * in the editor but are not test files. Real files may also start with a comment.
+ */
+export const isPlaceholderTest = (text: string) => /^\/\/ (?:Error|Waiting|Cancelled)\b/.test(text);
+
+export const getGenerationKey = (sourceCode: string, language: SupportedLanguage, modelTier: ModelTier) =>
+  [semanticFingerprint(sourceCode, language), language, modelTier, `v${SYSTEM_INSTRUCTION_VERSION}`].join('|');
+
+// A unit's tests may depend on shared context (imports, module constants), so it is part of the key
+const getUnitGenerationKey = (unit: SourceUnit, outline: SourceOutline, language: SupportedLanguage, modelTier: ModelTier) =>
+  [unit.fingerprint, outline.contextFingerprint, language, modelTier, 'unit', `v${SYSTEM_INSTRUCTION_VERSION}`].join('|');
+
 // Initialize client strictly with process.env.API_KEY as per system instructions
 try {
   if (process.env.API_KEY) {
-    aiClient = new GoogleGenAI({ apiKey: process.env.API_KEY });
+    // GEMINI_BASE_URL points the client at a local stub server (see scripts/gemini-stub.mjs)
+    aiClient = new GoogleGenAI({
+      apiKey: process.env.API_KEY,
+      httpOptions: process.env.GEMINI_BASE_URL ? { baseUrl: process.env.GEMINI_BASE_URL } : undefined
+    });
   }
 } catch (error) {
   console.error("Failed to initialize GoogleGenAI client", error);
 }
 
-export const generateUnitTest = async (sourceCode: string, language: SupportedLanguage = SupportedLanguage.JAVASCRIPT, modelTier: ModelTier = ModelTier.FLASH): Promise<string> => {
+const buildConfig = (language: SupportedLanguage, modelTier: ModelTier) => {
+  const isThinking = modelTier === ModelTier.PRO;
+  
+  const config: any = {
+    systemInstruction: getSystemInstruction(language),
+  };
+
+  if (isThinking) {
+    // Thinking model configuration: High budget, no maxOutputTokens
+    config.thinkingConfig = { thinkingBudget: 32768 };
+  } else {
+    // Standard/Lite model configuration
+    config.temperature = 0.2;
+    config.maxOutputTokens = 8192; // Increased to support comprehensive mocking scenarios
+  }
+  return config;
+};
+
+const getUnitInstruction = (language: SupportedLanguage, units: SourceUnit[]) => {
+  const isPython = language === SupportedLanguage.PYTHON;
+  const shared = new Set(units.map(u => u.name)).size < units.length;
+  return `
+  Only write tests for these top-level definitions: ${units.map(u => u.name).join(', ')}. Any other definitions are listed for context and already have tests.
+  - Start the tests for each definition with a line containing exactly "${formatUnitMarker('<name>', language)}", using the definition's name.${shared ? `
+  - Some definitions share a name: write one section for each of them, in source order, each starting with the same marker.` : ''}
+  - Keep each section self-contained: ${isPython ? 'repeat the imports it needs and prefix its test function names with the definition name' : 'declare the mocks and helpers it needs inside it'}.`;
+};
+
+/**
+ * Sends only the stale units, with the shared context and the signatures of
+ * the unchanged units so the model knows what else the module defines.
+ */
+const buildUnitPrompt = (outline: SourceOutline, stale: SourceUnit[], language: SupportedLanguage) => {
+  const comment = language === SupportedLanguage.PYTHON ? '#' : '//';
+  const others = outline.units
+    .filter(u => !stale.includes(u))
+    .map(u => `${comment} ${u.signature}`);
+  return [
+    outline.context,
+    others.length > 0 ? `${comment} Also defined in this module:\n${others.join('\n')}` : '',
+    ...stale.map(u => u.text)
+  ].filter(Boolean).join('\n\n');
+};
+
+/**
+ * Streams one model response with markdown fences stripped, returning the full
+ * text and the usage the API reported. The prompt is checked against the token
+ * budget first. Usage is recorded even when the stream is aborted part way,
+ * since the tokens it reported are billed. Opening the stream goes through the
+ * client-side rate limit and is retried on 429/5xx; once chunks have been
+ * yielded a failure is final.
+ */
+async function* streamCompletion(
+  contents: string,
+  config: any,
+  modelTier: ModelTier,
+  signal?: AbortSignal
+): AsyncGenerator<string, Completion> {
+  const preflight = preflightPrompt(contents);
+  if (preflight.skipped) {
+    generationStats.skippedPrompts++;
+    return { text: `// Error: Source is too large to send (~${preflight.tokens} tokens).`, usage: null, truncated: false };
+  }
+  if (preflight.truncated) generationStats.truncatedPrompts++;
+
+  let startedAt = performance.now();
+  const stream = await withRetry(async () => {
+    if (await acquireRequestSlot(signal)) generationStats.throttled++;
+    startedAt = performance.now();
+    return aiClient!.models.generateContentStream({
+      model: modelTier,
+      contents: preflight.text,
+      config: { ...config, abortSignal: signal }
+    });
+  }, signal, () => { generationStats.retries++; });
+
+  // Strip markdown code blocks if the model accidentally includes them despite instructions
+  const stripper = new CodeFenceStripper();
+  let cleanText = '';
+  let usageMetadata;
+  let usage: TokenUsage | null = null;
+  let completed = false;
+  try {
+    for await (const chunk of stream) {
+      // Usage is cumulative, so the last chunk that carries it is the total
+      if (chunk.usageMetadata) usageMetadata = chunk.usageMetadata;
+      const delta = stripper.push(chunk.text || '');
+      if (delta) {
+        cleanText += delta;
+        yield delta;
+      }
+    }
+    const rest = stripper.end();
+    if (rest) {
+      cleanText += rest;
+      yield rest;
+    }
+    completed = true;
+  } finally {
+    // Also reached when an aborted request (e.g. a losing race candidate) stops the stream
+    if (completed || usageMetadata) {
+      usage = usageFromMetadata(usageMetadata);
+      recordRequestUsage(modelTier, usage, Math.round(performance.now() - startedAt));
+    }
+  }
+  return { text: cleanText, usage, truncated: preflight.truncated };
+}
+
+/**
+ * Regenerates tests only for units whose fingerprint has no cached test block
+ * and splices the new blocks between the cached ones in source order. Cached
+ * blocks are yielded first; the returned file is in final order.
+ */
+async function* streamUnitTestsIncrementally(
+  outline: SourceOutline,
+  language: SupportedLanguage,
+  modelTier: ModelTier,
+  signal?: AbortSignal
+): AsyncGenerator<string, GenerationResult> {
+  const blocks = new Map<string, string>();
+  const stale: SourceUnit[] = [];
+  for (const unit of outline.units) {
+    const block = await getCachedGeneration(getUnitGenerationKey(unit, outline, language, modelTier), 'unit');
+    if (block === undefined) {
+      stale.push(unit);
+    } else {
+      blocks.set(unit.id, block);
+    }
+  }
+  const stats = { regeneratedUnits: stale.length, totalUnits: outline.units.length, fromCache: stale.length === 0 };
+
+  const assemble = () => assembleTestFile(
+    outline.units.filter(u => blocks.has(u.id)).map(u => ({ name: u.name, body: blocks.get(u.id)! })),
+    language
+  );
+  const retained = assemble();
+  if (stale.length === 0) {
+    yield retained;
+    return { text: retained, usage: null, truncated: false, ...stats };
+  }
+  if (retained) yield `${retained}\n\n`;
+
+  const config = buildConfig(language, modelTier);
+  config.systemInstruction += getUnitInstruction(language, stale);
+  const { text: output, usage, truncated } = yield* streamCompletion(
+    buildUnitPrompt(outline, stale, language), config, modelTier, signal
+  );
+  if (!output || isPlaceholderTest(output)) {
+    return { text: output, usage, truncated, ...stats };
+  }
+
+  const sections = parseTestBlocks(output);
+  if (!sections) {
+    // The model ignored the markers, so the new tests cannot be attributed to units
+    return { text: [retained, output].filter(Boolean).join('\n\n'), usage, truncated, ...stats };
+  }
+  const { bodies, unmatched } = assignTestBlocks(sections, stale);
+  for (const unit of stale) {
+    const body = bodies.get(unit.id);
+    if (body === undefined) continue;
+    blocks.set(unit.id, body);
+    // Tests written from a cut prompt would outlive the cut, so only complete prompts are cached
+    if (!truncated) setCachedGeneration(getUnitGenerationKey(unit, outline, language, modelTier), body);
+  }
+  const extra = unmatched.map(block => assembleTestFile([block], language));
+  return { text: [assemble(), ...extra].filter(Boolean).join('\n\n'), usage, truncated, ...stats };
+}
+
+/**
+ * Streams generated test code as it arrives. Each yielded value is a cleaned
+ * delta to append; the generator's return value describes this call's
+ * generation, including the final text to display, which is either the full
+ * test file or a "// Error" / "// Waiting" placeholder.
+ * Sources with several top-level units are generated unit by unit so an edit
+ * only regenerates the tests of the units it touched.
+ * `modelTier` must be a concrete tier: callers resolve `ModelTier.AUTO` with
+ * `routeModelTier` once, so each routing decision is recorded exactly once.
+ * Concurrent calls for the same generation key share one request; aborting
+ * `signal` detaches this caller and cancels the HTTP request once no caller is left.
+ */
+export async function* streamUnitTest(
+  sourceCode: string,
+  language: SupportedLanguage = SupportedLanguage.JAVASCRIPT,
+  modelTier: ModelTier = ModelTier.FLASH,
+  signal?: AbortSignal
+): AsyncGenerator<string, GenerationResult> {
   if (!aiClient) {
-    return "// Error: API Key not configured in environment.";
+    return placeholderResult("// Error: API Key not configured in environment.");
   }
 
   // Loosen the restriction slightly to allow user to delete code and see "Waiting..."
   if (!sourceCode || sourceCode.trim().length < 3) {
-    return "// Waiting for valid code...";
+    return placeholderResult("// Waiting for valid code...");
   }
 
-  try {
-    const isThinking = modelTier === ModelTier.PRO;
-    
-    const config: any = {
-      systemInstruction: getSystemInstruction(language),
+  return yield* inFlight.join(
+    getGenerationKey(sourceCode, language, modelTier),
+    flightSignal => generateTests(sourceCode, language, modelTier, flightSignal),
+    signal
+  );
+}
+
+/**
+ * Serves a generation from the cache or the model. Only ever runs inside a single flight.
+ */
+async function* generateTests(
+  sourceCode: string,
+  language: SupportedLanguage,
+  modelTier: ModelTier,
+  signal: AbortSignal
+): AsyncGenerator<string, GenerationResult> {
+  const outline = splitSourceUnits(sourceCode, language);
+  const cacheKey = getGenerationKey(sourceCode, language, modelTier);
+  const cached = await getCachedGeneration(cacheKey);
+  if (cached !== undefined) {
+    yield cached;
+    return {
+      text: cached,
+      regeneratedUnits: 0,
+      totalUnits: outline.units.length,
+      fromCache: true,
+      usage: null,
+      truncated: false
     };
+  }
+  if (signal?.aborted) {
+    return placeholderResult("// Cancelled");
+  }
 
-    if (isThinking) {
-      // Thinking model configuration: High budget, no maxOutputTokens
-      config.thinkingConfig = { thinkingBudget: 32768 };
+  let completed = false;
+  try {
+    let generation: GenerationResult;
+    if (outline.units.length > 1) {
+      generation = yield* streamUnitTestsIncrementally(outline, language, modelTier, signal);
     } else {
-      // Standard/Lite model configuration
-      config.temperature = 0.2;
-      config.maxOutputTokens = 8192; // Increased to support comprehensive mocking scenarios
+      const completion = yield* streamCompletion(sourceCode, buildConfig(language, modelTier), modelTier, signal);
+      generation = {
+        ...completion,
+        regeneratedUnits: outline.units.length,
+        totalUnits: outline.units.length,
+        fromCache: false
+      };
     }
 
-    const response = await aiClient.models.generateContent({
-      model: modelTier,
-      contents: sourceCode,
-      config: config
-    });
+    completed = true;
+    if (!generation.text) {
+        return { ...generation, text: "// Error: No output from model." };
+    }
 
-    const text = response.text;
-    if (!text) {
-        return "// Error: No output from model.";
+    // Only real test files are worth reusing; placeholders depend on transient state,
+    // and tests written from a truncated prompt do not cover the whole source
+    if (!isPlaceholderTest(generation.text) && !generation.truncated) {
+      setCachedGeneration(cacheKey, generation.text);
     }
     
-    // Strip markdown code blocks if the model accidentally includes them despite instructions
-    const cleanText = text.replace(/^```[a-z]*\n/i, '').replace(/\n```$/, '');
-    
-    return cleanText;
+    return generation;
   } catch (error) {
+    if (signal?.aborted) {
+      return placeholderResult("// Cancelled");
+    }
     console.error("Gemini API Error:", error);
-    return `// Error generating tests: ${error instanceof Error ? error.message : "Unknown error"}`;
+    return placeholderResult(`// Error generating tests: ${error instanceof Error ? error.message : "Unknown error"}`);
+  } finally {
+    // Also reached when the consumer stops iterating after aborting
+    if (!completed && signal?.aborted) {
+      generationStats.aborted++;
+    }
+  }
+}
+
+export const generateUnitTest = async (sourceCode: string, language: SupportedLanguage = SupportedLanguage.JAVASCRIPT, modelTier: ModelTier = ModelTier.FLASH, signal?: AbortSignal): Promise<string> => {
+  const stream = streamUnitTest(sourceCode, language, modelTier, signal);
+  let step = await stream.next();
+  while (!step.done) {
+    step = await stream.next();
   }
+  return step.value.text;
 };
 
-export const estimateTokens = (text: string): number => {
-  // Rough estimation: 1 token ~= 4 characters
-  return Math.ceil(text.length / 4);
-}
\ No newline at end of file
+/**
+ * Local token count for text that never went through the API, such as cached tests.
+ */
+export const estimateTokens = (text: string): number => countTokens(text);
\ No newline at end of file
@@ -0,0 +1,165 @@
+import { LruCache } from './lruCache';
+
+export interface GenerationCacheStats {
+  // Whole-file lookups, one per generation
+  hits: number;
+  misses: number;
+  // Per-unit test block lookups made while regenerating a file unit by unit
+  unitHits: number;
+  unitMisses: number;
+}
+
+export type CacheLookupScope = 'file' | 'unit';
+
+const DB_NAME = 'rora-cache';
+const STORE_NAME = 'generations';
+// Strings are UTF-16, so two bytes per code unit
+const MEMORY_CAPACITY_BYTES = 2 * 1024 * 1024;
+const PERSISTED_CAPACITY_BYTES = 8 * 1024 * 1024;
+
+interface PersistedEntry {
+  key: string;
+  text: string;
+  size: number;
+  lastAccess: number;
+}
+
+const sizeOf = (text: string) => text.length * 2;
+
+const memory = new LruCache<string, string>(MEMORY_CAPACITY_BYTES, sizeOf);
+const stats: GenerationCacheStats = { hits: 0, misses: 0, unitHits: 0, unitMisses: 0 };
+let dbPromise: Promise<IDBDatabase | null> | null = null;
+// Size of the persisted tier, summed on the first write of a session and kept up to date afterwards
+let persistedBytes: number | null = null;
+
+const requestToPromise = <T>(request: IDBRequest<T>): Promise<T> => new Promise((resolve, reject) => {
+  request.onsuccess = () => resolve(request.result);
+  request.onerror = () => reject(request.error);
+});
+
+/**
+ * Opens the persistent tier. Resolves to null when IndexedDB is unavailable
+ * (private browsing, blocked storage) so the cache degrades to memory only.
+ */
+const openDb = (): Promise<IDBDatabase | null> => {
+  if (dbPromise) return dbPromise;
+  dbPromise = new Promise<IDBDatabase | null>((resolve) => {
+    if (typeof indexedDB === 'undefined') {
+      resolve(null);
+      return;
+    }
+    const request = indexedDB.open(DB_NAME, 1);
+    request.onupgradeneeded = () => {
+      const store = request.result.createObjectStore(STORE_NAME, { keyPath: 'key' });
+      store.createIndex('lastAccess', 'lastAccess');
+    };
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => {
+      console.error("Generation cache unavailable", request.error);
+      resolve(null);
+    };
+  });
+  return dbPromise;
+};
+
+const sumPersisted = (store: IDBObjectStore): Promise<number> => new Promise((resolve, reject) => {
+  let total = 0;
+  const request = store.openCursor();
+  request.onsuccess = () => {
+    const cursor = request.result;
+    if (!cursor) {
+      resolve(total);
+      return;
+    }
+    total += (cursor.value as PersistedEntry).size;
+    cursor.continue();
+  };
+  request.onerror = () => reject(request.error);
+});
+
+/**
+ * Deletes least recently used entries until `total` fits the budget and
+ * resolves to the new total. Walks the lastAccess index oldest first and stops
+ * as soon as it fits, so a write only touches the entries it evicts.
+ */
+const evictPersisted = (store: IDBObjectStore, total: number): Promise<number> => new Promise((resolve, reject) => {
+  if (total <= PERSISTED_CAPACITY_BYTES) {
+    resolve(total);
+    return;
+  }
+  const request = store.index('lastAccess').openCursor();
+  request.onsuccess = () => {
+    const cursor = request.result;
+    if (!cursor || total <= PERSISTED_CAPACITY_BYTES) {
+      resolve(total);
+      return;
+    }
+    total -= (cursor.value as PersistedEntry).size;
+    cursor.delete();
+    cursor.continue();
+  };
+  request.onerror = () => reject(request.error);
+});
+
+const readPersisted = async (key: string): Promise<string | undefined> => {
+  const db = await openDb();
+  if (!db) return undefined;
+  try {
+    const tx = db.transaction(STORE_NAME, 'readwrite');
+    const store = tx.objectStore(STORE_NAME);
+    const entry = await requestToPromise(store.get(key)) as PersistedEntry | undefined;
+    if (!entry) return undefined;
+    store.put({ ...entry, lastAccess: Date.now() });
+    return entry.text;
+  } catch (e) {
+    console.error("Generation cache read failed", e);
+    return undefined;
+  }
+};
+
+const writePersisted = async (key: string, text: string) => {
+  const db = await openDb();
+  if (!db) return;
+  try {
+    const tx = db.transaction(STORE_NAME, 'readwrite');
+    const store = tx.objectStore(STORE_NAME);
+    const previous = await requestToPromise(store.get(key)) as PersistedEntry | undefined;
+    // Read once this transaction runs: writes to the store are serialized, so earlier ones have settled the total
+    const total = persistedBytes ?? await sumPersisted(store);
+    const entry: PersistedEntry = { key, text, size: sizeOf(text), lastAccess: Date.now() };
+    await requestToPromise(store.put(entry));
+    persistedBytes = await evictPersisted(store, total + entry.size - (previous?.size ?? 0));
+  } catch (e) {
+    console.error("Generation cache write failed", e);
+  }
+};
+
+/**
+ * Looks up a generated test file, checking memory first and then IndexedDB.
+ * Persisted hits are promoted into the memory tier. Unit block lookups are
+ * counted apart from whole-file lookups, so one multi-unit edit is one miss.
+ */
+export const getCachedGeneration = async (key: string, scope: CacheLookupScope = 'file'): Promise<string | undefined> => {
+  let text = memory.get(key);
+  if (text === undefined) {
+    text = await readPersisted(key);
+    if (text !== undefined) memory.set(key, text);
+  }
+  if (scope === 'unit') {
+    if (text === undefined) stats.unitMisses++;
+    else stats.unitHits++;
+  } else if (text === undefined) {
+    stats.misses++;
+  } else {
+    stats.hits++;
+  }
+  return text;
+};
+
+export const setCachedGeneration = (key: string, text: string) => {
+  memory.set(key, text);
+  // Persisting is best-effort and must not delay the caller
+  writePersisted(key, text);
+};
+
+export const getGenerationCacheStats = (): GenerationCacheStats => ({ ...stats });
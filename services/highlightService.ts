@@ -0,0 +1,299 @@
+import { SupportedLanguage } from '../types';
+
+const PRISM_BASE_URL = 'https://cdnjs.cloudflare.com/ajax/libs/prism/1.29.0';
+const PRISM_SCRIPTS = [
+  `${PRISM_BASE_URL}/prism.min.js`,
+  `${PRISM_BASE_URL}/components/prism-python.min.js`,
+  `${PRISM_BASE_URL}/components/prism-typescript.min.js`
+];
+
+/**
+ * Replace the rendered lines `[start, start + deleteCount)` with `lines`,
+ * each an HTML string of Prism tokens without the trailing newline.
+ */
+export interface HighlightPatch {
+  start: number;
+  deleteCount: number;
+  lines: string[];
+}
+
+export type HighlightPatchListener = (patch: HighlightPatch) => void;
+
+/**
+ * Highlight worker. Prism grammars are not line-oriented, so each document
+ * keeps per line its rendered HTML and the lexer state it was rendered with:
+ * code, or inside a construct that spans lines (block comment, template
+ * literal, triple-quoted string). An edit re-renders from the first changed
+ * line until a line is reached whose incoming state is unchanged.
+ */
+const HIGHLIGHT_WORKER_SCRIPT = `
+  self.Prism = { disableWorkerMessageHandler: true };
+  importScripts(${PRISM_SCRIPTS.map(url => JSON.stringify(url)).join(', ')});
+
+  const CODE = 0, BLOCK_COMMENT = 1, TEMPLATE = 2, TRIPLE_DOUBLE = 3, TRIPLE_SINGLE = 4;
+  const CLOSERS = { 1: '*/', 2: '\`', 3: '"""', 4: "'''" };
+  const STATE_CLASS = { 1: 'comment', 2: 'string', 3: 'string', 4: 'string' };
+  // Characters after which a slash starts a regex literal rather than a division
+  const REGEX_PRECEDERS = '(,=:[!&|?{};+-*%<>~^';
+
+  const docs = new Map();
+
+  // Offset just past the closer of a multi-line construct, or -1 if it stays open
+  const closeIndex = (line, state, i) => {
+    const closer = CLOSERS[state];
+    while (i < line.length) {
+      if (state !== BLOCK_COMMENT && line[i] === '\\\\') { i += 2; continue; }
+      if (line.startsWith(closer, i)) return i + closer.length;
+      i++;
+    }
+    return -1;
+  };
+
+  // Splits a line into the tail of a construct carried in from the previous
+  // line, plain code, and the head of a construct left open for the next line
+  const scanLine = (line, state, python) => {
+    let i = 0;
+    if (state !== CODE) {
+      i = closeIndex(line, state, 0);
+      if (i < 0) return { resume: line.length, open: line.length, state };
+    }
+    const resume = i;
+    let prev = '';
+    while (i < line.length) {
+      const c = line[i];
+      if (python) {
+        if (c === '#') break;
+        if (line.startsWith('"""', i) || line.startsWith("'''", i)) {
+          const triple = c === '"' ? TRIPLE_DOUBLE : TRIPLE_SINGLE;
+          const end = closeIndex(line, triple, i + 3);
+          if (end < 0) return { resume, open: i, state: triple };
+          i = end;
+          prev = c;
+          continue;
+        }
+      } else {
+        if (line.startsWith('//', i)) break;
+        if (line.startsWith('/*', i)) {
+          const end = closeIndex(line, BLOCK_COMMENT, i + 2);
+          if (end < 0) return { resume, open: i, state: BLOCK_COMMENT };
+          i = end;
+          continue;
+        }
+        if (c === '\`') {
+          const end = closeIndex(line, TEMPLATE, i + 1);
+          if (end < 0) return { resume, open: i, state: TEMPLATE };
+          i = end;
+          prev = c;
+          continue;
+        }
+        if (c === '/' && (prev === '' || REGEX_PRECEDERS.includes(prev))) {
+          let j = i + 1, inClass = false;
+          while (j < line.length) {
+            const d = line[j];
+            if (d === '\\\\') { j += 2; continue; }
+            if (d === '[') inClass = true;
+            else if (d === ']') inClass = false;
+            else if (d === '/' && !inClass) break;
+            j++;
+          }
+          i = j + 1;
+          prev = '/';
+          continue;
+        }
+      }
+      if (c === '"' || c === "'") {
+        let j = i + 1;
+        while (j < line.length && line[j] !== c) j += line[j] === '\\\\' ? 2 : 1;
+        i = j + 1;
+        prev = c;
+        continue;
+      }
+      if (c !== ' ' && c !== '\\t') prev = c;
+      i++;
+    }
+    return { resume, open: line.length, state: CODE };
+  };
+
+  const escapeHtml = (text) => text.replace(/&/g, '&amp;').replace(/</g, '&lt;');
+  const wrap = (text, state) => text ? '<span class="token ' + STATE_CLASS[state] + '">' + escapeHtml(text) + '</span>' : '';
+
+  const renderLine = (doc, index) => {
+    const line = doc.lines[index];
+    const state = doc.states[index];
+    const scan = scanLine(line, state, doc.language === 'python');
+    let html = state === CODE ? '' : wrap(line.slice(0, scan.resume), state);
+    if (scan.resume < scan.open) {
+      html += Prism.highlight(line.slice(scan.resume, scan.open), doc.grammar, doc.language);
+    }
+    if (scan.open < line.length) html += wrap(line.slice(scan.open), scan.state);
+    doc.html[index] = html;
+    doc.rendered[index] = state;
+    doc.states[index + 1] = scan.state;
+  };
+
+  // states[i] is the lexer state entering line i; rendered[i] the state line i was last rendered with
+  const edit = (doc, start, deleteCount, insert) => {
+    const fresh = insert.map(() => -1);
+    doc.lines.splice(start, deleteCount, ...insert);
+    doc.html.splice(start, deleteCount, ...insert.map(() => ''));
+    doc.rendered.splice(start, deleteCount, ...fresh);
+    doc.states.splice(start + 1, deleteCount, ...fresh);
+
+    const end = start + insert.length;
+    let i = start;
+    while (i < doc.lines.length && (i < end || doc.rendered[i] !== doc.states[i])) {
+      renderLine(doc, i++);
+    }
+    const extra = Math.max(0, i - end);
+    return { start, deleteCount: deleteCount + extra, lines: doc.html.slice(start, i) };
+  };
+
+  self.onmessage = (event) => {
+    const message = event.data;
+    if (message.type === 'dispose') {
+      docs.delete(message.doc);
+      return;
+    }
+    let doc = docs.get(message.doc);
+    if (message.type === 'reset') {
+      const previous = doc ? doc.lines.length : 0;
+      const language = Prism.languages[message.language] ? message.language : 'javascript';
+      doc = { language, grammar: Prism.languages[language], lines: [], html: [], rendered: [], states: [CODE] };
+      docs.set(message.doc, doc);
+      const patch = edit(doc, 0, 0, message.lines);
+      self.postMessage({ doc: message.doc, patch: { ...patch, deleteCount: previous } });
+      return;
+    }
+    if (!doc) return;
+    self.postMessage({ doc: message.doc, patch: edit(doc, message.start, message.deleteCount, message.insert) });
+  };
+`;
+
+// Map supported language enum to Prism language strings
+export const getPrismLanguage = (language: SupportedLanguage) => {
+  switch (language) {
+    case SupportedLanguage.PYTHON: return 'python';
+    case SupportedLanguage.TYPESCRIPT: return 'typescript';
+    case SupportedLanguage.JAVASCRIPT: default: return 'javascript';
+  }
+};
+
+const escapeHtml = (text: string) => text.replace(/&/g, '&amp;').replace(/</g, '&lt;');
+
+const listeners = new Map<number, LineHighlighter>();
+let highlightWorker: Worker | null = null;
+let highlightWorkerUrl: string | null = null;
+let workerUnavailable = false;
+let nextDocId = 0;
+
+const getHighlightWorker = (): Worker | null => {
+  if (highlightWorker || workerUnavailable) return highlightWorker;
+  try {
+    const blob = new Blob([HIGHLIGHT_WORKER_SCRIPT], { type: 'application/javascript' });
+    highlightWorkerUrl = URL.createObjectURL(blob);
+    highlightWorker = new Worker(highlightWorkerUrl);
+
+    highlightWorker.onmessage = (e) => {
+      listeners.get(e.data.doc)?.receive(e.data.patch);
+    };
+
+    highlightWorker.onerror = (e) => {
+      // Prism failed to load inside the worker (offline, CSP); highlight on the main thread instead
+      e.preventDefault();
+      console.error("Highlight worker error:", e.message);
+      highlightWorker?.terminate();
+      highlightWorker = null;
+      if (highlightWorkerUrl) URL.revokeObjectURL(highlightWorkerUrl);
+      highlightWorkerUrl = null;
+      workerUnavailable = true;
+      listeners.forEach(highlighter => highlighter.rerenderOnMainThread());
+    };
+  } catch (e) {
+    console.error("Failed to start highlight worker", e);
+    workerUnavailable = true;
+    highlightWorker = null;
+  }
+  return highlightWorker;
+};
+
+/**
+ * Incrementally highlights one editor buffer. `update` diffs the new text
+ * against the previous one by lines and only the changed range is sent to the
+ * worker; the listener receives patches in order and must apply every one.
+ */
+export class LineHighlighter {
+  private doc = ++nextDocId;
+  private lines: string[] = [];
+  private language: string | null = null;
+  private renderedLines = 0;
+  private onPatch: HighlightPatchListener;
+
+  constructor(onPatch: HighlightPatchListener) {
+    this.onPatch = onPatch;
+    listeners.set(this.doc, this);
+  }
+
+  update(text: string, language: SupportedLanguage) {
+    const lines = text.split('\n');
+    const prismLanguage = getPrismLanguage(language);
+    const worker = getHighlightWorker();
+
+    if (prismLanguage !== this.language) {
+      this.lines = lines;
+      this.language = prismLanguage;
+      if (worker) {
+        worker.postMessage({ type: 'reset', doc: this.doc, language: prismLanguage, lines });
+      } else {
+        this.rerenderOnMainThread();
+      }
+      return;
+    }
+
+    const previous = this.lines;
+    let prefix = 0;
+    const shortest = Math.min(previous.length, lines.length);
+    while (prefix < shortest && previous[prefix] === lines[prefix]) prefix++;
+    let suffix = 0;
+    while (
+      suffix < shortest - prefix &&
+      previous[previous.length - 1 - suffix] === lines[lines.length - 1 - suffix]
+    ) suffix++;
+    if (prefix === previous.length && prefix === lines.length) return;
+
+    const deleteCount = previous.length - prefix - suffix;
+    const insert = lines.slice(prefix, lines.length - suffix);
+    this.lines = lines;
+    if (worker) {
+      worker.postMessage({ type: 'edit', doc: this.doc, start: prefix, deleteCount, insert });
+    } else {
+      this.receive({ start: prefix, deleteCount, lines: insert.map(line => this.highlightOnMainThread(line)) });
+    }
+  }
+
+  receive(patch: HighlightPatch) {
+    this.renderedLines += patch.lines.length - patch.deleteCount;
+    this.onPatch(patch);
+  }
+
+  /**
+   * Stateless fallback: lines are highlighted one by one, so constructs that
+   * span lines are only coloured on their first line.
+   */
+  rerenderOnMainThread() {
+    this.receive({
+      start: 0,
+      deleteCount: this.renderedLines,
+      lines: this.lines.map(line => this.highlightOnMainThread(line))
+    });
+  }
+
+  dispose() {
+    listeners.delete(this.doc);
+    highlightWorker?.postMessage({ type: 'dispose', doc: this.doc });
+  }
+
+  private highlightOnMainThread(line: string): string {
+    const grammar = this.language ? window.Prism?.languages[this.language] : undefined;
+    return grammar ? window.Prism.highlight(line, grammar, this.language) : escapeHtml(line);
+  }
+}
@@ -0,0 +1,185 @@
+import { SupportedLanguage } from '../types';
+
+export interface LanguageDetectorOptions {
+  // Always inspected: imports and the first definitions usually sit at the top
+  prefixChars: number;
+  // Lines around the edited range that are inspected with it
+  contextLines: number;
+  // Upper bound on the inspected edited range
+  maxRegionChars: number;
+  // Confidence needed before a switch is considered at all
+  switchConfidence: number;
+  // Consecutive updates that must agree before switching at `switchConfidence`
+  confirmations: number;
+  // Confidence at which a single update switches, e.g. after pasting a whole file
+  immediateConfidence: number;
+}
+
+export interface LanguageGuess {
+  language: SupportedLanguage;
+  // 0..1, how strongly the evidence favours `language` over the alternative
+  confidence: number;
+}
+
+type Signal = [RegExp, number];
+
+const DEFAULT_OPTIONS: LanguageDetectorOptions = {
+  prefixChars: 1500,
+  contextLines: 3,
+  maxRegionChars: 4000,
+  switchConfidence: 0.75,
+  confirmations: 2,
+  immediateConfidence: 0.85
+};
+
+// Pseudo-counts of evidence for the alternative, so a lone match is never conclusive
+const PRIOR = 1;
+
+const PYTHON_SIGNALS: Signal[] = [
+  [/^[ \t]*(?:async[ \t]+)?def[ \t]+\w+[ \t]*\(.*\)[ \t]*(?:->.*)?:[ \t]*$/gm, 3],
+  [/^[ \t]*class[ \t]+\w+[ \t]*(?:\(.*\))?[ \t]*:[ \t]*$/gm, 3],
+  [/^[ \t]*import[ \t]+pytest\b/gm, 3],
+  [/^[ \t]*(?:if|elif|else|for|while|try|except|finally|with)\b.*:[ \t]*$/gm, 1],
+  [/^[ \t]*from[ \t]+[\w.]+[ \t]+import[ \t]+\w/gm, 2],
+  [/\b(?:elif|None|True|False|self|lambda)\b/g, 1],
+  [/^[ \t]*#/gm, 1]
+];
+
+const JS_SIGNALS: Signal[] = [
+  [/\b(?:function|const|let|var)\b/g, 1],
+  [/=>/g, 1],
+  [/===|!==/g, 1],
+  [/[;{][ \t]*$/gm, 1],
+  [/^[ \t]*\/\//gm, 1],
+  [/^[ \t]*(?:import|export)\b.*\bfrom[ \t]+['"]/gm, 2]
+];
+
+// Only TypeScript has these; plain JavaScript is the absence of them
+const TYPESCRIPT_SIGNALS: Signal[] = [
+  [/\binterface[ \t]+\w+(?:<[^>]*>)?[ \t]*(?:extends[^{]*)?\{/g, 3],
+  [/\btype[ \t]+\w+(?:<[^>]*>)?[ \t]*=/g, 3],
+  [/\benum[ \t]+\w+[ \t]*\{/g, 2],
+  [/[\w)?][ \t]*:[ \t]*(?:string|number|boolean|void|any|unknown|never)\b(?:\[\])?/g, 2],
+  [/\b(?:public|private|protected|readonly)[ \t]+\w/g, 1],
+  [/\bas[ \t]+(?:const|string|number|unknown|any)\b/g, 1]
+];
+
+const score = (text: string, signals: Signal[]) =>
+  signals.reduce((total, [pattern, weight]) => total + (text.match(pattern) || []).length * weight, 0);
+
+/**
+ * Scores one piece of code. Python is weighed against the JavaScript family;
+ * within that family TypeScript needs positive evidence, since missing type
+ * annotations in a fragment say nothing about the rest of the file.
+ */
+export const guessLanguage = (text: string): LanguageGuess | null => {
+  const python = score(text, PYTHON_SIGNALS);
+  const typescript = score(text, TYPESCRIPT_SIGNALS);
+  const javascript = score(text, JS_SIGNALS) + typescript;
+  if (python === 0 && javascript === 0) return null;
+
+  if (python > javascript) {
+    return { language: SupportedLanguage.PYTHON, confidence: python / (python + javascript + PRIOR) };
+  }
+  if (typescript > 0) {
+    return { language: SupportedLanguage.TYPESCRIPT, confidence: typescript / (typescript + python + PRIOR) };
+  }
+  return { language: SupportedLanguage.JAVASCRIPT, confidence: javascript / (javascript + python + PRIOR) };
+};
+
+const lineStart = (text: string, index: number, extraLines: number) => {
+  let start = index;
+  for (let line = 0; line <= extraLines && start > 0; line++) {
+    start = text.lastIndexOf('\n', start - 1);
+    if (start < 0) return 0;
+  }
+  return start === index ? start : start + 1;
+};
+
+const lineEnd = (text: string, index: number, extraLines: number) => {
+  let end = index;
+  for (let line = 0; line <= extraLines; line++) {
+    end = text.indexOf('\n', end + 1);
+    if (end < 0) return text.length;
+  }
+  return end;
+};
+
+/**
+ * Detects the source language from successive versions of the editor buffer.
+ * Each update inspects only the edited range with a few lines of context plus
+ * a bounded prefix. A switch needs a confident guess on several updates in a
+ * row, or one very confident guess, so a single ambiguous token cannot flip
+ * the language and abort an in-flight generation.
+ */
+export class LanguageDetector {
+  private options: LanguageDetectorOptions;
+  private previous = '';
+  private lastResult: LanguageGuess | null = null;
+  private candidate: SupportedLanguage | null = null;
+  private streak = 0;
+
+  constructor(options: Partial<LanguageDetectorOptions> = {}) {
+    this.options = { ...DEFAULT_OPTIONS, ...options };
+  }
+
+  /**
+   * Returns the language to switch to, or null to keep `current`. Calling it
+   * again with the same text has no further effect.
+   */
+  update(text: string, current: SupportedLanguage): LanguageGuess | null {
+    if (text === this.previous) return this.lastResult;
+    const region = this.changedRegion(text);
+    this.previous = text;
+    this.lastResult = null;
+
+    const guess = guessLanguage(region);
+    if (!guess || guess.language === current || guess.confidence < this.options.switchConfidence) {
+      this.candidate = null;
+      this.streak = 0;
+      return null;
+    }
+    // Absent type annotations in an edit are no reason to leave TypeScript
+    if (current === SupportedLanguage.TYPESCRIPT && guess.language === SupportedLanguage.JAVASCRIPT) {
+      return null;
+    }
+
+    this.streak = guess.language === this.candidate ? this.streak + 1 : 1;
+    this.candidate = guess.language;
+    if (this.streak < this.options.confirmations && guess.confidence < this.options.immediateConfidence) {
+      return null;
+    }
+    this.candidate = null;
+    this.streak = 0;
+    this.lastResult = guess;
+    return guess;
+  }
+
+  /**
+   * Forgets pending evidence, e.g. after the user picked a language explicitly.
+   */
+  reset(text = '') {
+    this.previous = text;
+    this.lastResult = null;
+    this.candidate = null;
+    this.streak = 0;
+  }
+
+  private changedRegion(text: string): string {
+    const { prefixChars, contextLines, maxRegionChars } = this.options;
+    const previous = this.previous;
+    const shortest = Math.min(previous.length, text.length);
+    let prefix = 0;
+    while (prefix < shortest && previous.charCodeAt(prefix) === text.charCodeAt(prefix)) prefix++;
+    let suffix = 0;
+    while (
+      suffix < shortest - prefix &&
+      previous.charCodeAt(previous.length - 1 - suffix) === text.charCodeAt(text.length - 1 - suffix)
+    ) suffix++;
+
+    const start = lineStart(text, prefix, contextLines);
+    const end = Math.min(lineEnd(text, text.length - suffix, contextLines), start + maxRegionChars);
+    if (start <= prefixChars) return text.slice(0, Math.max(prefixChars, end));
+    return `${text.slice(0, prefixChars)}\n${text.slice(start, end)}`;
+  }
+}
@@ -0,0 +1,49 @@
+/**
+ * Minimal LRU cache built on Map insertion order. Capacity is measured with
+ * `sizeOf`, which counts entries by default and can weigh them (e.g. by bytes).
+ */
+export class LruCache<K, V> {
+  private entries = new Map<K, V>();
+  private totalSize = 0;
+
+  constructor(private capacity: number, private sizeOf: (value: V) => number = () => 1) {}
+
+  get(key: K): V | undefined {
+    const value = this.entries.get(key);
+    if (value === undefined) return undefined;
+    // Re-insert to mark as most recently used
+    this.entries.delete(key);
+    this.entries.set(key, value);
+    return value;
+  }
+
+  set(key: K, value: V) {
+    this.delete(key);
+    this.entries.set(key, value);
+    this.totalSize += this.sizeOf(value);
+    while (this.totalSize > this.capacity && this.entries.size > 1) {
+      const oldest = this.entries.keys().next().value as K;
+      this.delete(oldest);
+    }
+  }
+
+  has(key: K): boolean {
+    return this.entries.has(key);
+  }
+
+  delete(key: K) {
+    const value = this.entries.get(key);
+    if (value === undefined) return;
+    this.entries.delete(key);
+    this.totalSize -= this.sizeOf(value);
+  }
+
+  clear() {
+    this.entries.clear();
+    this.totalSize = 0;
+  }
+
+  get size(): number {
+    return this.entries.size;
+  }
+}
@@ -0,0 +1,159 @@
+import { ModelTier, SupportedLanguage } from '../types';
+import { normalizeSemantics } from './semanticFingerprint';
+
+export interface RouterOptions {
+  // Generation latency the router tries to stay under when picking a tier
+  latencyBudgetMs: number;
+}
+
+export interface ComplexityFeatures {
+  lines: number;
+  branches: number;
+  async: boolean;
+  externalCalls: number;
+  classes: number;
+}
+
+export interface ComplexityScore {
+  score: number;
+  features: ComplexityFeatures;
+}
+
+export interface RoutingDecision {
+  tier: ModelTier;
+  score: number;
+  reason: string;
+  escalatedFrom?: ModelTier;
+  // Filled in once the generation and its test run have finished
+  latencyMs?: number;
+  fromCache?: boolean;
+  passed?: boolean;
+  timestamp: number;
+}
+
+// Concrete tiers from cheapest to most capable
+const TIER_LADDER = [ModelTier.LITE, ModelTier.FLASH, ModelTier.PRO];
+
+// Lowest complexity score at which each tier is preferred, most capable first
+const TIER_THRESHOLDS: [ModelTier, number][] = [
+  [ModelTier.PRO, 16],
+  [ModelTier.FLASH, 6],
+  [ModelTier.LITE, 0]
+];
+
+// Starting latency estimates, replaced by observed latencies as generations complete
+const DEFAULT_LATENCY_MS: Record<string, number> = {
+  [ModelTier.LITE]: 1500,
+  [ModelTier.FLASH]: 3500,
+  [ModelTier.PRO]: 20000
+};
+
+const LATENCY_SMOOTHING = 0.3;
+const MAX_DECISIONS = 50;
+
+const DEFAULT_OPTIONS: RouterOptions = {
+  latencyBudgetMs: 8000
+};
+
+const BRANCH_PATTERN = /\b(?:if|elif|for|while|case|catch|except)\b|\?\.?|&&|\|\||\band\b|\bor\b/g;
+const ASYNC_PATTERN = /\b(?:async|await)\b|\.then\(|\bPromise\b|\basyncio\b/;
+const EXTERNAL_CALL_PATTERN = /\b(?:fetch|axios|requests|httpx|urllib|aiohttp|XMLHttpRequest|WebSocket|localStorage|open)\s*[.(]|\b(?:fs|db|redis|session)\.\w+\(/g;
+const CLASS_PATTERN = /\bclass\s+[\w$]/g;
+
+let options: RouterOptions = { ...DEFAULT_OPTIONS };
+const expectedLatency: Record<string, number> = { ...DEFAULT_LATENCY_MS };
+const decisions: RoutingDecision[] = [];
+
+const count = (text: string, pattern: RegExp) => (text.match(pattern) || []).length;
+
+/**
+ * Cheap static estimate of how hard the source is to test. Comments are
+ * stripped first so documentation does not count as branching.
+ */
+export const scoreComplexity = (sourceCode: string, language: SupportedLanguage): ComplexityScore => {
+  const code = normalizeSemantics(sourceCode, language);
+  const features: ComplexityFeatures = {
+    lines: sourceCode.split('\n').filter(line => line.trim() !== '').length,
+    branches: count(code, BRANCH_PATTERN),
+    async: ASYNC_PATTERN.test(code),
+    externalCalls: count(code, EXTERNAL_CALL_PATTERN),
+    classes: count(code, CLASS_PATTERN)
+  };
+  const score = features.lines / 15
+    + features.branches
+    + (features.async ? 3 : 0)
+    + Math.min(features.externalCalls, 4) * 2
+    + features.classes * 3;
+  return { score: Math.round(score * 10) / 10, features };
+};
+
+const record = (decision: RoutingDecision) => {
+  decisions.push(decision);
+  if (decisions.length > MAX_DECISIONS) decisions.shift();
+  return decision;
+};
+
+/**
+ * Picks the cheapest tier expected to handle the source. If that tier's
+ * observed latency exceeds the budget, the fastest tier that fits is used instead.
+ */
+export const routeModelTier = (sourceCode: string, language: SupportedLanguage): RoutingDecision => {
+  const { score } = scoreComplexity(sourceCode, language);
+  const preferred = TIER_THRESHOLDS.find(([, threshold]) => score >= threshold)![0];
+
+  let index = TIER_LADDER.indexOf(preferred);
+  while (index > 0 && expectedLatency[TIER_LADDER[index]] > options.latencyBudgetMs) index--;
+  const tier = TIER_LADDER[index];
+
+  const reason = tier === preferred
+    ? `complexity ${score}`
+    : `complexity ${score} prefers ${preferred}, over ${options.latencyBudgetMs}ms budget`;
+  return record({ tier, score, reason, timestamp: Date.now() });
+};
+
+/**
+ * Records how a routed generation went. Only real model calls update the
+ * latency estimate, since cache hits say nothing about the tier's speed.
+ */
+export const completeRoutingDecision = (
+  decision: RoutingDecision,
+  outcome: { latencyMs: number; fromCache: boolean; passed: boolean }
+) => {
+  Object.assign(decision, outcome);
+  if (!outcome.fromCache) {
+    recordTierLatency(decision.tier, outcome.latencyMs);
+  }
+};
+
+/**
+ * Folds an observed generation latency into the tier's rolling estimate.
+ */
+export const recordTierLatency = (tier: ModelTier, latencyMs: number) => {
+  const previous = expectedLatency[tier];
+  if (previous === undefined) return;
+  expectedLatency[tier] = Math.round(previous + LATENCY_SMOOTHING * (latencyMs - previous));
+};
+
+/**
+ * Moves a failed decision up one tier, ignoring the latency budget.
+ * Returns null when the most capable tier has already been tried.
+ */
+export const escalateRoutingDecision = (decision: RoutingDecision): RoutingDecision | null => {
+  const next = TIER_LADDER[TIER_LADDER.indexOf(decision.tier) + 1];
+  if (!next) return null;
+  return record({
+    tier: next,
+    score: decision.score,
+    reason: `tests failed on ${decision.tier}`,
+    escalatedFrom: decision.tier,
+    timestamp: Date.now()
+  });
+};
+
+export const configureModelRouter = (overrides: Partial<RouterOptions>) => {
+  options = { ...options, ...overrides };
+};
+
+export const getRoutingDecisions = (): RoutingDecision[] => decisions.map(d => ({ ...d }));
+
+export const getExpectedLatency = (tier: ModelTier) => expectedLatency[tier];
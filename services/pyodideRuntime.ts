@@ -0,0 +1,397 @@
+import { TestCaseResult, RuntimeLoadState } from '../types';
+import { PYTEST_HARNESS } from './runtimePolyfills';
+import { createAbortError } from './abort';
+
+export interface PythonRunOutcome {
+  results: TestCaseResult[];
+  timing?: {
+    importMs: number;
+    executionMs: number;
+  };
+}
+
+export interface PythonRunOptions {
+  runTimeoutMs: number;
+  testTimeoutMs: number;
+}
+
+const PYODIDE_URL = 'https://cdn.jsdelivr.net/pyodide/v0.23.4/full/pyodide.js';
+const HARNESS_DIR = '/rora';
+const SIGINT = 2;
+// How long an interrupted run may take to unwind before the worker is killed
+const INTERRUPT_GRACE_MS = 1000;
+
+// Fallback delay when requestIdleCallback is unavailable (Safari)
+const IDLE_FALLBACK_MS = 200;
+
+const DEFAULT_RUN_OPTIONS: PythonRunOptions = {
+  runTimeoutMs: 15000,
+  testTimeoutMs: 5000
+};
+
+/**
+ * Worker hosting the Pyodide runtime. Slot 0 of the interrupt buffer is the
+ * signal Pyodide polls; slot 1 tells the runner the whole run was cancelled.
+ */
+const PYODIDE_WORKER_SCRIPT = `
+  let pyodide = null;
+  let runHarness = null;
+  let interruptView = null;
+  let activeRunId = null;
+  let micropipLoaded = false;
+
+  const progress = (stage) => self.postMessage({ type: 'progress', stage });
+
+  const boot = async (interruptBuffer) => {
+    progress('fetch');
+    try {
+      importScripts(${JSON.stringify(PYODIDE_URL)});
+    } catch (e) {
+      throw new Error("Pyodide script not loaded. Check internet connection.");
+    }
+    progress('compile');
+    pyodide = await loadPyodide();
+
+    if (interruptBuffer) {
+      interruptView = new Int32Array(interruptBuffer);
+      pyodide.setInterruptBuffer(interruptView);
+    }
+
+    // Install the harness as a real module so it is compiled once per worker
+    pyodide.FS.mkdirTree(${JSON.stringify(HARNESS_DIR)});
+    pyodide.FS.writeFile(${JSON.stringify(HARNESS_DIR + '/rora_harness.py')}, ${JSON.stringify(PYTEST_HARNESS)});
+    pyodide.runPython(${JSON.stringify(`import sys; sys.path.insert(0, '${HARNESS_DIR}')`)});
+    const harness = pyodide.pyimport("rora_harness");
+    harness.configure(
+      (name) => {
+        // A test deadline that fired just as its test finished must not interrupt what runs next
+        if (interruptView && Atomics.load(interruptView, 1) !== 1) Atomics.store(interruptView, 0, 0);
+        self.postMessage({ type: 'test', id: activeRunId, name: name ?? null });
+      },
+      (resultJson) => self.postMessage({ type: 'test-result', id: activeRunId, result: JSON.parse(resultJson) }),
+      () => !!interruptView && Atomics.load(interruptView, 1) === 1
+    );
+    runHarness = harness.run;
+    harness.destroy();
+  };
+
+  const run = async ({ id, source, test, runTimeoutMs, testTimeoutMs }) => {
+    activeRunId = id;
+    // Most third-party imports are mocked, so micropip is only fetched when referenced
+    if (!micropipLoaded && /\\bmicropip\\b/.test(source + "\\n" + test)) {
+      progress('packages');
+      try {
+        await pyodide.loadPackage("micropip");
+        micropipLoaded = true;
+      } finally {
+        progress('ready');
+      }
+    }
+
+    try {
+      // Strings cross the boundary by value, so no proxies need converting
+      const { results, timing } = JSON.parse(runHarness(source, test, testTimeoutMs, runTimeoutMs));
+      self.postMessage({ type: 'result', id, results, timing });
+    } catch (e) {
+      self.postMessage({ type: 'error', id, error: e.message, stack: e.stack || '' });
+    }
+  };
+
+  self.onmessage = (event) => {
+    const message = event.data;
+    if (message.type === 'init') {
+      boot(message.interruptBuffer).then(
+        () => self.postMessage({ type: 'ready' }),
+        (e) => self.postMessage({ type: 'boot-error', error: e.message })
+      );
+    } else if (message.type === 'run') {
+      run(message);
+    }
+  };
+`;
+
+interface ActiveRun {
+  id: number;
+  onMessage: (message: any) => void;
+  onCrash: (error: Error) => void;
+}
+
+const toTestCaseResults = (results: any[]): TestCaseResult[] => results.map((r: any) => ({
+  id: r.name,
+  name: r.name || "Unknown Python Test",
+  status: r.status,
+  duration: r.duration || 0,
+  phases: r.phases || undefined,
+  failureDetails: r.error ? {
+    message: r.error.message,
+    stack: r.error.stack,
+  } : undefined
+}));
+
+/**
+ * Owns the Pyodide worker. Runs are serialized; timeouts first raise
+ * KeyboardInterrupt through the interrupt buffer and, if that is ignored or
+ * the page is not cross-origin isolated, terminate and respawn the worker.
+ * A killed run still reports the tests that settled before the timeout.
+ */
+class PythonRuntime {
+  private worker: Worker | null = null;
+  private workerUrl: string | null = null;
+  private ready: Promise<void> | null = null;
+  private interruptView: Int32Array | null = null;
+  private active: ActiveRun | null = null;
+  private queue: Promise<unknown> = Promise.resolve();
+  private nextRunId = 0;
+  private options: PythonRunOptions = { ...DEFAULT_RUN_OPTIONS };
+  private loadState: RuntimeLoadState = { stage: 'idle' };
+  private loadListeners = new Set<() => void>();
+  private preloadScheduled = false;
+
+  getLoadState(): RuntimeLoadState {
+    return this.loadState;
+  }
+
+  subscribeLoadState(listener: () => void): () => void {
+    this.loadListeners.add(listener);
+    return () => {
+      this.loadListeners.delete(listener);
+    };
+  }
+
+  /**
+   * Boots the runtime in the background once the browser is idle.
+   * A run issued meanwhile awaits the same in-flight boot.
+   */
+  preload() {
+    if (this.ready || this.preloadScheduled) return;
+    this.preloadScheduled = true;
+    const start = () => {
+      this.preloadScheduled = false;
+      this.boot().catch(e => console.error("Pyodide preload failed", e));
+    };
+    if (typeof requestIdleCallback === 'function') {
+      requestIdleCallback(start, { timeout: 2000 });
+    } else {
+      setTimeout(start, IDLE_FALLBACK_MS);
+    }
+  }
+
+  private setLoadState(state: RuntimeLoadState) {
+    this.loadState = state;
+    this.loadListeners.forEach(listener => listener());
+  }
+
+  configure(options: Partial<PythonRunOptions>) {
+    this.options = { ...this.options, ...options };
+  }
+
+  boot(): Promise<void> {
+    if (this.ready) return this.ready;
+
+    const blob = new Blob([PYODIDE_WORKER_SCRIPT], { type: 'application/javascript' });
+    const workerUrl = URL.createObjectURL(blob);
+    const worker = new Worker(workerUrl);
+    // SharedArrayBuffer is only available when the page is cross-origin isolated
+    const interruptBuffer = typeof SharedArrayBuffer !== 'undefined' && self.crossOriginIsolated
+      ? new SharedArrayBuffer(2 * Int32Array.BYTES_PER_ELEMENT)
+      : null;
+
+    this.worker = worker;
+    this.workerUrl = workerUrl;
+    this.interruptView = interruptBuffer ? new Int32Array(interruptBuffer) : null;
+
+    const ready = new Promise<void>((resolve, reject) => {
+      worker.onmessage = (e) => {
+        const message = e.data;
+        if (message.type === 'progress') {
+          this.setLoadState({ stage: message.stage });
+        } else if (message.type === 'ready') {
+          this.setLoadState({ stage: 'ready' });
+          resolve();
+        } else if (message.type === 'boot-error') {
+          this.setLoadState({ stage: 'error', error: message.error });
+          reject(new Error(message.error));
+        } else if (this.active && message.id === this.active.id) {
+          this.active.onMessage(message);
+        }
+      };
+      worker.onerror = (e) => {
+        e.preventDefault();
+        const error = new Error(`Pyodide Worker Error: ${e.message}`);
+        if (this.loadState.stage !== 'ready') {
+          this.setLoadState({ stage: 'error', error: error.message });
+        }
+        reject(error);
+        this.active?.onCrash(error);
+      };
+    });
+    // A failed boot is retried on the next run
+    ready.catch(() => {
+      if (this.worker === worker) this.teardown();
+    });
+
+    this.ready = ready;
+    worker.postMessage({ type: 'init', interruptBuffer });
+    return ready;
+  }
+
+  run(sourceCode: string, testCode: string, signal?: AbortSignal): Promise<PythonRunOutcome> {
+    const job = this.queue.then(() => this.execute(sourceCode, testCode, signal));
+    this.queue = job.catch(() => undefined);
+    return job;
+  }
+
+  private teardown() {
+    this.worker?.terminate();
+    if (this.workerUrl) URL.revokeObjectURL(this.workerUrl);
+    this.worker = null;
+    this.workerUrl = null;
+    this.ready = null;
+    this.interruptView = null;
+    this.active = null;
+  }
+
+  private respawn() {
+    this.teardown();
+    this.boot().catch(e => console.error("Pyodide respawn failed", e));
+  }
+
+  private async execute(sourceCode: string, testCode: string, signal?: AbortSignal): Promise<PythonRunOutcome> {
+    // Runs superseded while still queued never reach the worker
+    if (signal?.aborted) throw createAbortError();
+    await this.boot();
+    if (signal?.aborted) throw createAbortError();
+
+    const worker = this.worker!;
+    const view = this.interruptView;
+    const { runTimeoutMs, testTimeoutMs } = this.options;
+    const id = ++this.nextRunId;
+
+    if (view) {
+      Atomics.store(view, 0, 0);
+      Atomics.store(view, 1, 0);
+    }
+
+    return new Promise<PythonRunOutcome>((resolve, reject) => {
+      let testTimer: ReturnType<typeof setTimeout> | undefined;
+      let killTimer: ReturnType<typeof setTimeout> | undefined;
+      let runCancelled = false;
+      let aborted = false;
+      // Tests that settled before a timeout, kept if the worker has to be killed
+      const settled: any[] = [];
+
+      const cleanup = () => {
+        clearTimeout(runTimer);
+        clearTimeout(testTimer);
+        clearTimeout(killTimer);
+        signal?.removeEventListener('abort', onAbort);
+        this.active = null;
+      };
+
+      const kill = (reason: string, testName?: string) => {
+        cleanup();
+        this.respawn();
+        if (aborted) {
+          reject(createAbortError());
+          return;
+        }
+        resolve({
+          results: toTestCaseResults([
+            ...settled,
+            { name: testName ?? 'Run Timeout', status: 'fail', duration: 0, error: { message: reason, stack: '' } }
+          ])
+        });
+      };
+
+      const interrupt = (reason: string, cancelRun: boolean, testName?: string) => {
+        if (!view) {
+          kill(reason, testName);
+          return;
+        }
+        if (cancelRun) {
+          runCancelled = true;
+          Atomics.store(view, 1, 1);
+        }
+        Atomics.store(view, 0, SIGINT);
+        clearTimeout(killTimer);
+        killTimer = setTimeout(() => kill(reason, testName), INTERRUPT_GRACE_MS);
+      };
+
+      const runTimer = setTimeout(
+        () => interrupt(`Execution timed out after ${runTimeoutMs}ms (Infinite loop?)`, true),
+        runTimeoutMs
+      );
+
+      const onAbort = () => {
+        aborted = true;
+        interrupt("Execution cancelled", true);
+      };
+      signal?.addEventListener('abort', onAbort, { once: true });
+
+      this.active = {
+        id,
+        onMessage: (message) => {
+          if (message.type === 'test-result') {
+            settled.push(message.result);
+          } else if (message.type === 'test') {
+            clearTimeout(testTimer);
+            if (!runCancelled) {
+              // The interrupted test unwound in time, so the worker can be kept, and a
+              // deadline that fired after the worker moved on must not hit the next test
+              clearTimeout(killTimer);
+              if (view) Atomics.store(view, 0, 0);
+            }
+            if (message.name) {
+              testTimer = setTimeout(
+                () => interrupt(`Test "${message.name}" timed out after ${testTimeoutMs}ms`, false, message.name),
+                testTimeoutMs
+              );
+            }
+          } else if (aborted && (message.type === 'result' || message.type === 'error')) {
+            // The cancelled run unwound in time; its partial results are stale
+            cleanup();
+            reject(createAbortError());
+          } else if (message.type === 'result') {
+            cleanup();
+            resolve({ results: toTestCaseResults(message.results), timing: message.timing });
+          } else if (message.type === 'error') {
+            cleanup();
+            console.error("Pyodide Error", message.error);
+            resolve({
+              results: [{
+                id: 'py_error',
+                name: 'Python Runtime Error',
+                status: 'fail',
+                duration: 0,
+                failureDetails: {
+                  message: message.error,
+                  stack: message.stack || ''
+                }
+              }]
+            });
+          }
+        },
+        onCrash: (error) => {
+          cleanup();
+          this.respawn();
+          reject(error);
+        }
+      };
+
+      worker.postMessage({ type: 'run', id, source: sourceCode, test: testCode, runTimeoutMs, testTimeoutMs });
+    });
+  }
+}
+
+const runtime = new PythonRuntime();
+
+export const configurePythonRuntime = (options: Partial<PythonRunOptions>) => runtime.configure(options);
+
+export const runPythonTests = (sourceCode: string, testCode: string, signal?: AbortSignal) =>
+  runtime.run(sourceCode, testCode, signal);
+
+export const preloadPython = () => runtime.preload();
+
+export const getPythonLoadState = () => runtime.getLoadState();
+
+export const subscribePythonLoadState = (listener: () => void) => runtime.subscribeLoadState(listener);
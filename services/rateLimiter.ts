@@ -0,0 +1,94 @@
+import { createAbortError } from './abort';
+
+export interface RateLimitOptions {
+  requestsPerMinute: number;
+  // Requests that may be sent back to back after an idle period
+  burst: number;
+}
+
+const DEFAULT_OPTIONS: RateLimitOptions = {
+  requestsPerMinute: 20,
+  burst: 4
+};
+
+/**
+ * Token bucket refilled continuously at `requestsPerMinute`. Waiters are
+ * served in arrival order so a burst of typing cannot starve an older request.
+ */
+class TokenBucket {
+  private options: RateLimitOptions;
+  private tokens: number;
+  private refilledAt = performance.now();
+  private waiters: (() => void)[] = [];
+  private timer: ReturnType<typeof setTimeout> | null = null;
+
+  constructor(options: RateLimitOptions) {
+    this.options = options;
+    this.tokens = options.burst;
+  }
+
+  configure(options: Partial<RateLimitOptions>) {
+    this.refill();
+    this.options = { ...this.options, ...options };
+    this.tokens = Math.min(this.tokens, this.options.burst);
+    this.schedule();
+  }
+
+  /**
+   * Resolves to true if the caller had to wait for a token.
+   */
+  acquire(signal?: AbortSignal): Promise<boolean> {
+    if (signal?.aborted) return Promise.reject(createAbortError());
+    this.refill();
+    if (this.waiters.length === 0 && this.tokens >= 1) {
+      this.tokens -= 1;
+      return Promise.resolve(false);
+    }
+
+    return new Promise<boolean>((resolve, reject) => {
+      const waiter = () => {
+        signal?.removeEventListener('abort', onAbort);
+        resolve(true);
+      };
+      const onAbort = () => {
+        this.waiters = this.waiters.filter(w => w !== waiter);
+        reject(createAbortError());
+      };
+      signal?.addEventListener('abort', onAbort, { once: true });
+      this.waiters.push(waiter);
+      this.schedule();
+    });
+  }
+
+  private refill() {
+    const now = performance.now();
+    const perMs = this.options.requestsPerMinute / 60000;
+    this.tokens = Math.min(this.options.burst, this.tokens + (now - this.refilledAt) * perMs);
+    this.refilledAt = now;
+  }
+
+  private schedule() {
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+    this.refill();
+    while (this.waiters.length > 0 && this.tokens >= 1) {
+      this.tokens -= 1;
+      this.waiters.shift()!();
+    }
+    if (this.waiters.length === 0) return;
+
+    const waitMs = Math.ceil((1 - this.tokens) / (this.options.requestsPerMinute / 60000));
+    this.timer = setTimeout(() => {
+      this.timer = null;
+      this.schedule();
+    }, waitMs);
+  }
+}
+
+const bucket = new TokenBucket({ ...DEFAULT_OPTIONS });
+
+export const configureRateLimit = (options: Partial<RateLimitOptions>) => bucket.configure(options);
+
+export const acquireRequestSlot = (signal?: AbortSignal) => bucket.acquire(signal);
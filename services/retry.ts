@@ -0,0 +1,80 @@
+import { createAbortError } from './abort';
+
+export interface RetryOptions {
+  maxRetries: number;
+  baseDelayMs: number;
+  maxDelayMs: number;
+}
+
+const DEFAULT_OPTIONS: RetryOptions = {
+  maxRetries: 4,
+  baseDelayMs: 500,
+  maxDelayMs: 8000
+};
+
+// Rate limiting and transient server failures; everything else is a real error
+const RETRYABLE_STATUS = new Set([429, 500, 502, 503, 504]);
+const RETRYABLE_MESSAGE = /\b(?:429|500|502|503|504|RESOURCE_EXHAUSTED|UNAVAILABLE|INTERNAL|DEADLINE_EXCEEDED)\b/;
+// google.rpc.RetryInfo, e.g. "retryDelay": "12s" or "1.5s"
+const RETRY_DELAY = /"retryDelay"\s*:\s*"(\d+(?:\.\d+)?)s"/;
+
+let options: RetryOptions = { ...DEFAULT_OPTIONS };
+
+export const configureRetry = (overrides: Partial<RetryOptions>) => {
+  options = { ...options, ...overrides };
+};
+
+export const isRetryableError = (error: unknown): boolean => {
+  const status = (error as { status?: unknown })?.status;
+  if (typeof status === 'number') return RETRYABLE_STATUS.has(status);
+  return error instanceof Error && RETRYABLE_MESSAGE.test(error.message);
+};
+
+/**
+ * Capped exponential backoff with full jitter. A server-provided retry delay
+ * is honoured as a lower bound, still subject to the cap.
+ */
+export const backoffDelay = (attempt: number, error?: unknown): number => {
+  const ceiling = Math.min(options.maxDelayMs, options.baseDelayMs * 2 ** attempt);
+  const jittered = Math.random() * ceiling;
+  const hint = error instanceof Error ? RETRY_DELAY.exec(error.message) : null;
+  const hintMs = hint ? parseFloat(hint[1]) * 1000 : 0;
+  return Math.round(Math.min(options.maxDelayMs, Math.max(hintMs, jittered)));
+};
+
+const sleep = (ms: number, signal?: AbortSignal) => new Promise<void>((resolve, reject) => {
+  if (signal?.aborted) {
+    reject(createAbortError());
+    return;
+  }
+  const onAbort = () => {
+    clearTimeout(timer);
+    reject(createAbortError());
+  };
+  const timer = setTimeout(() => {
+    signal?.removeEventListener('abort', onAbort);
+    resolve();
+  }, ms);
+  signal?.addEventListener('abort', onAbort, { once: true });
+});
+
+/**
+ * Calls `fn` until it succeeds, a non-retryable error is thrown, or the retry
+ * budget is spent. `onRetry` is told about each retry before its delay.
+ */
+export const withRetry = async <T>(
+  fn: (attempt: number) => Promise<T>,
+  signal?: AbortSignal,
+  onRetry?: (attempt: number, delayMs: number, error: unknown) => void
+): Promise<T> => {
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await fn(attempt);
+    } catch (error) {
+      if (signal?.aborted || attempt >= options.maxRetries || !isRetryableError(error)) throw error;
+      const delayMs = backoffDelay(attempt, error);
+      onRetry?.(attempt + 1, delayMs, error);
+      await sleep(delayMs, signal);
+    }
+  }
+};
@@ -2,87 +2,326 @@
 /**
  * This string is injected into the Web Worker to provide a Jest-like environment.
  * It mocks 'expect', 'describe', 'it', and 'jest' object functionality.
+ * Tests are collected into a describe tree and run sequentially by `self.__runTests__()`;
+ * `test.concurrent` bodies run in parallel up to `__options__.maxConcurrency` (default 5).
+ * The host may provide a `__reportTest__` function to receive each result as it settles,
+ * and `__options__.onSpy` to receive the restore function of every `jest.spyOn` spy.
  */
 export const JEST_POLYFILLS = `
-  self.__test_results__ = [];
-  
-  // Simple hook storage
-  let __beforeEach__ = null;
-  let __afterEach__ = null;
+  const __results__ = [];
+  self.__test_results__ = __results__;
+
+  // Record a finished test and stream it to the host immediately
+  const __report__ = (result) => {
+    result.id = 'test_' + __results__.length;
+    __results__.push(result);
+    if (typeof __reportTest__ === 'function') __reportTest__(result);
+  };
+
+  const __failure__ = (name, e, duration) => ({
+    name,
+    status: 'fail',
+    duration: duration || 0,
+    failureDetails: {
+      message: e && e.message !== undefined ? e.message : String(e),
+      stack: (e && e.stack) || '',
+      expected: e && e.expected,
+      received: e && e.received
+    }
+  });
+
+  // Maximum number of test.concurrent bodies in flight at once
+  const __maxConcurrency__ = (typeof __options__ === 'object' && __options__ && __options__.maxConcurrency) || 5;
+  // Spies outlive the suite on a reused realm, so the host gets a way to undo each one
+  const __onSpy__ = (typeof __options__ === 'object' && __options__ && __options__.onSpy) || null;
+
+  // Registrations are collected into a suite tree first and executed afterwards
+  const __newSuite__ = (name, parent) => ({
+    type: 'suite', name, parent, children: [],
+    beforeAll: [], afterAll: [], beforeEach: [], afterEach: []
+  });
+  const __root__ = __newSuite__('root', null);
+  let __currentSuite__ = __root__;
   
   // Global state for test execution
   const describe = (name, fn) => {
     const safeName = name || 'Unnamed Suite';
-    const previousBeforeEach = __beforeEach__;
-    const previousAfterEach = __afterEach__;
+    const suite = __newSuite__(safeName, __currentSuite__);
+    __currentSuite__.children.push(suite);
+    __currentSuite__ = suite;
     try {
       fn();
     } catch (e) {
       console.error("Error in describe block " + safeName, e);
-      self.__test_results__.push({
-        name: 'Describe Block: ' + safeName,
-        status: 'fail',
-        duration: 0,
-        failureDetails: {
-          message: e.message,
-          stack: e.stack
-        }
-      });
+      __report__(__failure__('Describe Block: ' + safeName, e));
     } finally {
-      // Restore hooks to support simple nesting
-      __beforeEach__ = previousBeforeEach;
-      __afterEach__ = previousAfterEach;
+      __currentSuite__ = suite.parent;
     }
   };
   
-  const beforeAll = (fn) => {
-    try { fn(); } catch(e) { console.error("beforeAll failed", e); }
-  };
+  const beforeAll = (fn) => { __currentSuite__.beforeAll.push(fn); };
   
-  const afterAll = (fn) => {
-    try { fn(); } catch(e) { console.error("afterAll failed", e); }
-  };
+  const afterAll = (fn) => { __currentSuite__.afterAll.push(fn); };
   
-  const beforeEach = (fn) => {
-    __beforeEach__ = fn;
-  };
+  const beforeEach = (fn) => { __currentSuite__.beforeEach.push(fn); };
   
-  const afterEach = (fn) => {
-    __afterEach__ = fn;
-  };
+  const afterEach = (fn) => { __currentSuite__.afterEach.push(fn); };
   
-  const it = async (name, fn) => {
-    const safeName = name || 'Unnamed Test';
+  const it = (name, fn) => {
+    __currentSuite__.children.push({ type: 'test', name: name || 'Unnamed Test', fn, concurrent: false });
+  };
+
+  it.concurrent = (name, fn) => {
+    __currentSuite__.children.push({ type: 'test', name: name || 'Unnamed Test', fn, concurrent: true });
+  };
+
+  const __runTest__ = async (node, beforeHooks, afterHooks) => {
     const start = performance.now();
     try {
-      if (__beforeEach__) await __beforeEach__();
-      await fn();
-      if (__afterEach__) await __afterEach__();
+      for (const hook of beforeHooks) await hook();
+      try {
+        await node.fn();
+      } finally {
+        for (const hook of afterHooks) await hook();
+      }
       
       const duration = Math.round(performance.now() - start);
-      self.__test_results__.push({ 
-        name: safeName, 
+      __report__({ 
+        name: node.name, 
         status: 'pass', 
         duration 
       });
     } catch (e) {
-      const duration = Math.round(performance.now() - start);
-      self.__test_results__.push({ 
-        name: safeName, 
-        status: 'fail', 
-        duration,
-        failureDetails: { 
-          message: e.message, 
-          stack: e.stack,
-          expected: e.expected,
-          received: e.received
-        } 
-      });
+      __report__(__failure__(node.name, e, Math.round(performance.now() - start)));
+    }
+  };
+
+  const __runConcurrent__ = async (nodes, beforeHooks, afterHooks) => {
+    let next = 0;
+    const lane = async () => {
+      while (next < nodes.length) {
+        await __runTest__(nodes[next++], beforeHooks, afterHooks);
+      }
+    };
+    const lanes = [];
+    for (let i = 0; i < Math.min(__maxConcurrency__, nodes.length); i++) lanes.push(lane());
+    await Promise.all(lanes);
+  };
+
+  const __runSuite__ = async (suite, inheritedBefore, inheritedAfter) => {
+    // Outer beforeEach hooks run first; inner afterEach hooks run first
+    const beforeHooks = [...inheritedBefore, ...suite.beforeEach];
+    const afterHooks = [...suite.afterEach, ...inheritedAfter];
+
+    try {
+      for (const hook of suite.beforeAll) await hook();
+    } catch (e) {
+      __report__(__failure__('beforeAll: ' + suite.name, e));
+      return;
+    }
+
+    let i = 0;
+    while (i < suite.children.length) {
+      const child = suite.children[i];
+      if (child.type === 'suite') {
+        await __runSuite__(child, beforeHooks, afterHooks);
+        i++;
+      } else if (child.concurrent) {
+        // Consecutive concurrent tests form one batch bounded by the concurrency limit
+        const batch = [];
+        while (i < suite.children.length && suite.children[i].type === 'test' && suite.children[i].concurrent) {
+          batch.push(suite.children[i++]);
+        }
+        await __runConcurrent__(batch, beforeHooks, afterHooks);
+      } else {
+        await __runTest__(child, beforeHooks, afterHooks);
+        i++;
+      }
+    }
+
+    for (const hook of suite.afterAll) {
+      try {
+        await hook();
+      } catch (e) {
+        __report__(__failure__('afterAll: ' + suite.name, e));
+      }
     }
   };
+
+  // Runs every registered test sequentially; resolves once the whole tree has finished
+  self.__runTests__ = () => __runSuite__(__root__, [], []);
   
   const test = it;
 
+  const __tag__ = (v) => Object.prototype.toString.call(v);
+  const __isAsymmetric__ = (v) => v !== null && typeof v === 'object' && typeof v.asymmetricMatch === 'function';
+
+  // Readable, cycle-safe rendering used only when an assertion fails
+  const __format__ = (value) => {
+    const seen = new WeakSet();
+    const fmt = (v, depth) => {
+      if (typeof v === 'string') return JSON.stringify(v);
+      if (typeof v === 'bigint') return v + 'n';
+      if (typeof v === 'symbol') return v.toString();
+      if (typeof v === 'function') return '[Function ' + (v.name || 'anonymous') + ']';
+      if (v === null || typeof v !== 'object') return String(v);
+      if (__isAsymmetric__(v)) return v.description;
+      if (seen.has(v)) return '[Circular]';
+      const tag = __tag__(v);
+      if (tag === '[object Date]') return 'Date(' + (isNaN(v.getTime()) ? 'Invalid' : v.toISOString()) + ')';
+      if (tag === '[object RegExp]') return String(v);
+      if (tag === '[object Error]') return v.name + ': ' + v.message;
+      if (depth > 4) return Array.isArray(v) ? '[Array]' : '[Object]';
+      seen.add(v);
+      try {
+        if (Array.isArray(v) || ArrayBuffer.isView(v)) {
+          const items = Array.prototype.slice.call(v, 0, 50).map((item) => fmt(item, depth + 1));
+          if (v.length > 50) items.push('... ' + (v.length - 50) + ' more');
+          return (Array.isArray(v) ? '' : v.constructor.name + ' ') + '[' + items.join(', ') + ']';
+        }
+        if (tag === '[object Map]') {
+          return 'Map {' + Array.from(v, ([k, val]) => fmt(k, depth + 1) + ' => ' + fmt(val, depth + 1)).join(', ') + '}';
+        }
+        if (tag === '[object Set]') {
+          return 'Set {' + Array.from(v, (item) => fmt(item, depth + 1)).join(', ') + '}';
+        }
+        const entries = Object.keys(v).map((k) => k + ': ' + fmt(v[k], depth + 1));
+        return '{' + (entries.length ? ' ' + entries.join(', ') + ' ' : '') + '}';
+      } finally {
+        seen.delete(v);
+      }
+    };
+    const out = fmt(value, 0);
+    return out.length > 2000 ? out.slice(0, 2000) + '...' : out;
+  };
+
+  // Path segments are only collected while unwinding from a mismatch
+  const __mismatch__ = (actual, expected, segment) => ({ segments: segment ? [segment] : [], actual, expected });
+  const __at__ = (m, segment) => {
+    if (m) m.segments.push(segment);
+    return m;
+  };
+
+  const __bytes__ = (v) => v instanceof ArrayBuffer
+    ? new Uint8Array(v)
+    : v instanceof DataView ? new Uint8Array(v.buffer, v.byteOffset, v.byteLength) : v;
+
+  // Structural equality with Jest toEqual semantics: undefined properties are
+  // ignored, cycles are tracked, and the first mismatch found is returned
+  // (null when equal) so no work is spent after the answer is known.
+  const __equals__ = (a, b, seenA, seenB) => {
+    if (__isAsymmetric__(b)) return b.asymmetricMatch(a) ? null : __mismatch__(a, b);
+    if (__isAsymmetric__(a)) return a.asymmetricMatch(b) ? null : __mismatch__(a, b);
+    if (Object.is(a, b)) return null;
+    if (typeof a !== 'object' || typeof b !== 'object' || a === null || b === null) return __mismatch__(a, b);
+
+    const tag = __tag__(a);
+    if (tag !== __tag__(b)) return __mismatch__(a, b);
+
+    switch (tag) {
+      case '[object Date]':
+        return Object.is(a.getTime(), b.getTime()) ? null : __mismatch__(a, b);
+      case '[object RegExp]':
+        return a.source === b.source && a.flags === b.flags ? null : __mismatch__(a, b);
+      case '[object Number]':
+      case '[object String]':
+      case '[object Boolean]':
+        return Object.is(a.valueOf(), b.valueOf()) ? null : __mismatch__(a, b);
+      case '[object Error]':
+        if (a.name !== b.name || a.message !== b.message) return __mismatch__(a, b);
+        break;
+    }
+
+    if (ArrayBuffer.isView(a) || a instanceof ArrayBuffer) {
+      const va = __bytes__(a);
+      const vb = __bytes__(b);
+      if (va.length !== vb.length) return __mismatch__(va.length, vb.length, '.length');
+      for (let i = 0; i < va.length; i++) {
+        if (!Object.is(va[i], vb[i])) return __mismatch__(va[i], vb[i], '[' + i + ']');
+      }
+      return null;
+    }
+
+    // A pair already on the stack is equal only if it closes the same cycle
+    let depth = seenA.length;
+    while (depth--) {
+      if (seenA[depth] === a) return seenB[depth] === b ? null : __mismatch__(a, b);
+    }
+    seenA.push(a);
+    seenB.push(b);
+
+    try {
+      if (Array.isArray(a)) {
+        if (a.length !== b.length) return __mismatch__(a.length, b.length, '.length');
+        for (let i = 0; i < a.length; i++) {
+          const m = __equals__(a[i], b[i], seenA, seenB);
+          if (m) return __at__(m, '[' + i + ']');
+        }
+        return null;
+      }
+
+      if (tag === '[object Map]') {
+        if (a.size !== b.size) return __mismatch__(a.size, b.size, '.size');
+        for (const [key, value] of a) {
+          if (!b.has(key)) return __mismatch__(value, undefined, '.get(' + __format__(key) + ')');
+          const m = __equals__(value, b.get(key), seenA, seenB);
+          if (m) return __at__(m, '.get(' + __format__(key) + ')');
+        }
+        return null;
+      }
+
+      if (tag === '[object Set]') {
+        if (a.size !== b.size) return __mismatch__(a.size, b.size, '.size');
+        for (const value of a) {
+          if (b.has(value)) continue;
+          let found = false;
+          for (const candidate of b) {
+            if (!__equals__(value, candidate, seenA, seenB)) {
+              found = true;
+              break;
+            }
+          }
+          if (!found) return __mismatch__(value, undefined, '.has(' + __format__(value) + ')');
+        }
+        return null;
+      }
+
+      let countA = 0;
+      for (const k in a) {
+        if (!Object.prototype.hasOwnProperty.call(a, k) || a[k] === undefined) continue;
+        countA++;
+        const m = __equals__(a[k], b[k], seenA, seenB);
+        if (m) return __at__(m, '.' + k);
+      }
+      let countB = 0;
+      for (const k in b) {
+        if (Object.prototype.hasOwnProperty.call(b, k) && b[k] !== undefined) countB++;
+      }
+      if (countA !== countB) {
+        for (const k in b) {
+          if (Object.prototype.hasOwnProperty.call(b, k) && b[k] !== undefined && a[k] === undefined) {
+            return __mismatch__(undefined, b[k], '.' + k);
+          }
+        }
+      }
+      return null;
+    } finally {
+      seenA.pop();
+      seenB.pop();
+    }
+  };
+
+  const __deepEqualError__ = (actual, expected) => {
+    const mismatch = __equals__(actual, expected, [], []);
+    if (!mismatch) return null;
+    const path = mismatch.segments.reverse().join('');
+    const where = path ? ' at ' + (path.charAt(0) === '.' ? path.slice(1) : path) : '';
+    const err = new Error('Expected deep equality failed' + where);
+    err.expected = __format__(mismatch.expected);
+    err.received = __format__(mismatch.actual);
+    return err;
+  };
+
   // Expect assertion library implementation
   const expect = (actual) => {
     return {
@@ -95,16 +334,8 @@ export const JEST_POLYFILLS = `
         }
       },
       toEqual: (expected) => {
-        // Simple deep equal
-        const stringify = (obj) => JSON.stringify(obj, (k,v) => v === undefined ? '__undefined__' : v);
-        const actualStr = stringify(actual);
-        const expectedStr = stringify(expected);
-        if (actualStr !== expectedStr) {
-           const err = new Error(\`Expected deep equality failed\`);
-           err.expected = JSON.stringify(expected, null, 2);
-           err.received = JSON.stringify(actual, null, 2);
-           throw err;
-        }
+        const err = __deepEqualError__(actual, expected);
+        if (err) throw err;
       },
       toBeDefined: () => {
         if (actual === undefined) throw new Error(\`Expected value to be defined\`);
@@ -160,8 +391,8 @@ export const JEST_POLYFILLS = `
            if (val !== expected) throw new Error(\`Expected \${expected} but received \${val}\`);
         },
         toEqual: async (expected) => {
-           const val = await actual;
-           if (JSON.stringify(val) !== JSON.stringify(expected)) throw new Error(\`Expected \${JSON.stringify(expected)} but received \${JSON.stringify(val)}\`);
+           const err = __deepEqualError__(await actual, expected);
+           if (err) throw err;
         }
       },
       rejects: {
@@ -186,7 +417,7 @@ export const JEST_POLYFILLS = `
             if (actual === expected) throw new Error(\`Expected value not to be \${expected}\`);
          },
          toEqual: (expected) => {
-            if (JSON.stringify(actual) === JSON.stringify(expected)) throw new Error(\`Expected value not to equal \${expected}\`);
+            if (!__equals__(actual, expected, [], [])) throw new Error('Expected value not to equal ' + __format__(expected));
          },
          toBeNull: () => {
             if (actual === null) throw new Error(\`Expected value not to be null\`);
@@ -195,6 +426,32 @@ export const JEST_POLYFILLS = `
     };
   };
 
+  // Asymmetric matchers usable anywhere inside a toEqual expectation
+  const __asymmetric__ = (description, match) => ({ description, asymmetricMatch: match });
+
+  expect.anything = () => __asymmetric__('Anything', (v) => v !== null && v !== undefined);
+  expect.any = (ctor) => __asymmetric__('Any<' + (ctor && ctor.name) + '>', (v) => {
+    if (ctor === Number) return typeof v === 'number' || v instanceof Number;
+    if (ctor === String) return typeof v === 'string' || v instanceof String;
+    if (ctor === Boolean) return typeof v === 'boolean' || v instanceof Boolean;
+    if (ctor === Function) return typeof v === 'function';
+    if (ctor === Object) return v !== null && typeof v === 'object';
+    return v instanceof ctor;
+  });
+  expect.objectContaining = (subset) => __asymmetric__('ObjectContaining ' + __format__(subset), (v) =>
+    v !== null && typeof v === 'object' &&
+    Object.keys(subset).every((k) => k in v && !__equals__(v[k], subset[k], [], []))
+  );
+  expect.arrayContaining = (items) => __asymmetric__('ArrayContaining ' + __format__(items), (v) =>
+    Array.isArray(v) && items.every((item) => v.some((candidate) => !__equals__(candidate, item, [], [])))
+  );
+  expect.stringContaining = (sub) => __asymmetric__('StringContaining ' + JSON.stringify(sub), (v) =>
+    typeof v === 'string' && v.includes(sub)
+  );
+  expect.stringMatching = (pattern) => __asymmetric__('StringMatching ' + String(pattern), (v) =>
+    typeof v === 'string' && (pattern instanceof RegExp ? pattern.test(v) : v.includes(pattern))
+  );
+
   // Jest mock functions
   const jest = {
     fn: (impl) => {
@@ -213,6 +470,16 @@ export const JEST_POLYFILLS = `
     spyOn: (obj, method) => {
       if (!obj) throw new Error("Cannot spyOn undefined object");
       const original = obj[method];
+      // Inherited methods are shadowed by the spy, so restoring removes it rather than copying the original down
+      const ownDescriptor = Object.getOwnPropertyDescriptor(obj, method);
+      let restored = false;
+      const restore = () => {
+        if (restored) return;
+        restored = true;
+        if (ownDescriptor) Object.defineProperty(obj, method, ownDescriptor);
+        else delete obj[method];
+      };
+      if (__onSpy__) __onSpy__(restore);
       const mockFn = jest.fn();
       
       let currentImpl = (...args) => {
@@ -231,7 +498,7 @@ export const JEST_POLYFILLS = `
       obj[method].mockResolvedValue = (val) => { mockFn.mock.impl = () => Promise.resolve(val); return obj[method]; };
       obj[method].mockRejectedValue = (val) => { mockFn.mock.impl = () => Promise.reject(val); return obj[method]; };
       obj[method].mockImplementation = (fn) => { mockFn.mock.impl = fn; return obj[method]; };
-      obj[method].mockRestore = () => { obj[method] = original; };
+      obj[method].mockRestore = restore;
       
       return obj[method];
     }
@@ -262,3 +529,192 @@ export const JEST_POLYFILLS = `
   self.afterEach = afterEach;
   self.require = require;
 `;
+
+/**
+ * Source of the `rora_harness` module written into the Pyodide filesystem
+ * when the worker boots. Importing it installs the library mocks and the pytest
+ * shim once; each run then calls `run()` and gets a JSON string back, which
+ * avoids proxy conversion and recompiling the runner on every keystroke.
+ */
+export const PYTEST_HARNESS = `
+import inspect
+import json
+import sys
+import traceback
+from time import perf_counter_ns
+from types import ModuleType
+from unittest.mock import MagicMock
+
+# 1. Mock External Libraries
+# This prevents 'ModuleNotFoundError' for common libs
+MOCKED_MODULES = {
+    'requests': MagicMock(),
+    'numpy': MagicMock(),
+    'pandas': MagicMock(),
+}
+sys.modules.update(MOCKED_MODULES)
+
+# 2. Simple Pytest Shim
+# This allows 'import pytest' to work and provides a basic 'raises' context manager
+# so that 'with pytest.raises(...):' doesn't crash immediately.
+class PytestShim:
+    def raises(self, exc):
+        class RaisesContext:
+            def __enter__(self): return None
+            def __exit__(self, exc_type, exc_val, exc_tb):
+                if exc_type and issubclass(exc_type, exc):
+                    return True # Suppress expected exception
+                return False # Propagate others
+        return RaisesContext()
+    
+    @property
+    def mark(self):
+        return MagicMock()
+    
+    def fixture(self, func):
+        return func
+
+sys.modules['pytest'] = PytestShim()
+
+BASELINE_MODULES = dict(sys.modules)
+
+# Callbacks supplied by the worker: progress notification, finished-test report and cancellation check
+_notify_test = lambda name: None
+_report_result = lambda result_json: None
+_run_cancelled = lambda: False
+
+def configure(notify_test, report_result, run_cancelled):
+    global _notify_test, _report_result, _run_cancelled
+    _notify_test = notify_test
+    _report_result = report_result
+    _run_cancelled = run_cancelled
+
+def _restore_baseline():
+    # Undo sys.modules patches from earlier runs; newly imported real modules stay cached
+    for name, module in list(sys.modules.items()):
+        if name in BASELINE_MODULES:
+            if module is not BASELINE_MODULES[name]:
+                sys.modules[name] = BASELINE_MODULES[name]
+        elif not isinstance(module, ModuleType):
+            del sys.modules[name]
+    for name, module in BASELINE_MODULES.items():
+        sys.modules.setdefault(name, module)
+    for mock in MOCKED_MODULES.values():
+        mock.reset_mock(return_value=True, side_effect=True)
+
+def _elapsed_ms(start_ns):
+    return round((perf_counter_ns() - start_ns) / 1e6, 3)
+
+def _timed(phases, phase, func, *args):
+    start = perf_counter_ns()
+    try:
+        return func(*args)
+    finally:
+        phases[phase] = _elapsed_ms(start)
+
+def _call_hook(hook, test_func):
+    # pytest passes the test function to setup_function/teardown_function when they accept it
+    try:
+        accepts_arg = len(inspect.signature(hook).parameters) > 0
+    except (TypeError, ValueError):
+        accepts_arg = False
+    return hook(test_func) if accepts_arg else hook()
+
+def _result(name, phases):
+    return {"name": name, "status": "pass", "duration": round(sum(phases.values()), 3), "phases": phases, "error": None}
+
+def _failure(name, message, phases=None, stack=""):
+    duration = round(sum(phases.values()), 3) if phases else 0
+    return {"name": name, "status": "fail", "duration": duration, "phases": phases, "error": {"message": message, "stack": stack}}
+
+def _run_test(namespace, test_name, setup_hook, teardown_hook, results, test_timeout_ms):
+    _notify_test(test_name)
+    reported = len(results)
+    test_func = namespace[test_name]
+    phases = {"setup": 0, "call": 0, "teardown": 0}
+    try:
+        if callable(setup_hook):
+            _timed(phases, "setup", _call_hook, setup_hook, test_func)
+        try:
+            _timed(phases, "call", test_func)
+        finally:
+            if callable(teardown_hook):
+                _timed(phases, "teardown", _call_hook, teardown_hook, test_func)
+        results.append(_result(test_name, phases))
+    except KeyboardInterrupt:
+        # Raised through the interrupt buffer when the per-test timeout expires
+        if _run_cancelled():
+            raise
+        results.append(_failure(test_name, f"Test timed out after {test_timeout_ms}ms", phases, traceback.format_exc()))
+    except AssertionError as ae:
+        results.append(_failure(test_name, str(ae) if str(ae) else "Assertion failed", phases, traceback.format_exc()))
+    except Exception as e:
+        results.append(_failure(test_name, f"{type(e).__name__}: {str(e)}", phases, traceback.format_exc()))
+    finally:
+        # Reported as soon as it settles, so it survives the worker being killed later
+        for result in results[reported:]:
+            _report_result(json.dumps(result))
+        _notify_test(None)
+
+def run(source, tests, test_timeout_ms, run_timeout_ms):
+    _restore_baseline()
+    results = []
+    timing = {"importMs": 0, "executionMs": 0}
+    # Each run executes in a fresh __main__ module so earlier test_* functions are never rediscovered,
+    # while mock.patch('__main__.fn'), sys.modules['__main__'] and pickling resolve to the user's code
+    module = ModuleType("__main__")
+    module.__builtins__ = __builtins__
+    namespace = module.__dict__
+    harness_main = sys.modules.get("__main__")
+    sys.modules["__main__"] = module
+    run_start = perf_counter_ns()
+
+    try:
+        # 3. Execute Source and Test Code
+        import_start = perf_counter_ns()
+        try:
+            exec(source, namespace)
+            exec(tests, namespace)
+        finally:
+            timing["importMs"] = _elapsed_ms(import_start)
+
+        # 4. Discover Test Functions
+        test_functions = [name for name, obj in namespace.items() if name.startswith('test_') and callable(obj)]
+        setup_hook = namespace.get('setup_function')
+        teardown_hook = namespace.get('teardown_function')
+        
+        if not test_functions:
+            results.append(_failure("Discovery", "No functions starting with 'test_' found."))
+
+        # 5. Run Tests
+        for test_name in test_functions:
+            while True:
+                reported = len(results)
+                try:
+                    _run_test(namespace, test_name, setup_hook, teardown_hook, results, test_timeout_ms)
+                    break
+                except KeyboardInterrupt:
+                    # A test deadline that fired just as its test settled lands between tests.
+                    # Only a cancelled run stops here; a test it kept from starting runs again
+                    if _run_cancelled():
+                        raise
+                    if len(results) > reported:
+                        break
+
+    except KeyboardInterrupt:
+        if _run_cancelled():
+            results.append(_failure("Run Timeout", f"Execution timed out after {run_timeout_ms}ms (Infinite loop?)", None, traceback.format_exc()))
+        else:
+            # Not the run deadline, so the code under test raised it itself
+            results.append(_failure("Runtime Error", "KeyboardInterrupt", None, traceback.format_exc()))
+    except Exception as e:
+        results.append(_failure("Runtime Error", str(e), None, traceback.format_exc()))
+    finally:
+        if harness_main is None:
+            sys.modules.pop("__main__", None)
+        else:
+            sys.modules["__main__"] = harness_main
+
+    timing["executionMs"] = max(0, round(_elapsed_ms(run_start) - timing["importMs"], 3))
+    return json.dumps({"results": results, "timing": timing})
+`;
\ No newline at end of file
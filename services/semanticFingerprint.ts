@@ -0,0 +1,168 @@
+import { SupportedLanguage } from '../types';
+import { hashString } from './contentHash';
+
+const isWordChar = (ch: string) => /[\w$]/.test(ch);
+
+/**
+ * Whether dropping the whitespace between two characters could merge two
+ * tokens into one (`a b` -> `ab`, `+ +` -> `++`).
+ */
+const needsSeparator = (prev: string, next: string) =>
+  (isWordChar(prev) && isWordChar(next)) || (prev === next && (prev === '+' || prev === '-'));
+
+// A line break after these keywords ends the statement (`return\nx` returns undefined)
+const RESTRICTED_KEYWORDS = new Set(['return', 'throw', 'break', 'continue', 'yield', 'async']);
+// A line starting with one of these may continue the previous line's expression instead of starting a new statement
+const CONTINUING_CHARS = new Set(['(', '[', '`', '+', '-', '/']);
+
+/**
+ * Copies a quoted literal starting at `start` verbatim and returns the index after it.
+ */
+const readString = (source: string, start: number, quote: string, out: string[]) => {
+  let i = start + quote.length;
+  while (i < source.length && !source.startsWith(quote, i)) {
+    // Unterminated single-quoted strings end at the line break
+    if (quote.length === 1 && quote !== '`' && source[i] === '\n') break;
+    i += source[i] === '\\' ? 2 : 1;
+  }
+  const end = Math.min(source.length, i + (source.startsWith(quote, i) ? quote.length : 0));
+  out.push(source.slice(start, end));
+  return end;
+};
+
+/**
+ * JavaScript/TypeScript: comments are dropped and whitespace is kept only
+ * where it separates tokens. A line break is kept where automatic semicolon
+ * insertion could depend on it: after `return`-like keywords, and before a
+ * line that starts with a token which could continue the previous expression.
+ */
+const normalizeJS = (source: string): string => {
+  const out: string[] = [];
+  let last = '';
+  // The identifier or keyword that ends the output so far
+  let word = '';
+  let spaced = false;
+  let lineBreak = false;
+
+  for (let i = 0; i < source.length;) {
+    const ch = source[i];
+    if (/\s/.test(ch)) {
+      spaced = true;
+      if (ch === '\n' || ch === '\r') lineBreak = true;
+      i++;
+    } else if (ch === '/' && source[i + 1] === '/') {
+      const end = source.indexOf('\n', i);
+      i = end === -1 ? source.length : end;
+      spaced = true;
+    } else if (ch === '/' && source[i + 1] === '*') {
+      const end = source.indexOf('*/', i + 2);
+      const stop = end === -1 ? source.length : end + 2;
+      // A block comment spanning lines counts as a line break for ASI
+      if (/[\n\r]/.test(source.slice(i, stop))) lineBreak = true;
+      i = stop;
+      spaced = true;
+    } else {
+      if (lineBreak && last && (RESTRICTED_KEYWORDS.has(word) || CONTINUING_CHARS.has(ch))) {
+        out.push('\n');
+      } else if (spaced && last && needsSeparator(last, ch)) {
+        out.push(' ');
+      }
+      const joined = !spaced && isWordChar(last);
+      spaced = false;
+      lineBreak = false;
+      if (ch === '"' || ch === "'" || ch === '`') {
+        i = readString(source, i, ch, out);
+        word = '';
+      } else {
+        // Keep escapes together so `\/\/` inside a regex literal is not read as a comment
+        const length = ch === '\\' ? 2 : 1;
+        out.push(source.slice(i, i + length));
+        i += length;
+        word = isWordChar(ch) ? (joined ? word + ch : ch) : '';
+      }
+      last = source[i - 1];
+    }
+  }
+  return out.join('');
+};
+
+/**
+ * Python: comments, blank lines and intra-line spacing are dropped, while
+ * indentation is reduced to its nesting level so re-indenting a file with a
+ * different width leaves the fingerprint unchanged.
+ */
+const normalizePython = (source: string): string => {
+  const out: string[] = [];
+  const indents = [0];
+  let depth = 0;
+  let lineStart = true;
+  let lineEmpty = true;
+  let last = '';
+  let spaced = false;
+
+  for (let i = 0; i < source.length;) {
+    if (lineStart && depth === 0) {
+      let width = 0;
+      while (source[i] === ' ' || source[i] === '\t') {
+        width = source[i] === '\t' ? width + 8 - (width % 8) : width + 1;
+        i++;
+      }
+      lineStart = false;
+      if (i < source.length && source[i] !== '\n' && source[i] !== '#' && source[i] !== '\r') {
+        while (width < indents[indents.length - 1]) indents.pop();
+        if (width > indents[indents.length - 1]) indents.push(width);
+        out.push('\t'.repeat(indents.length - 1));
+      }
+      continue;
+    }
+
+    const ch = source[i];
+    if (ch === '\n') {
+      if (depth === 0) {
+        if (!lineEmpty) out.push('\n');
+        lineStart = true;
+        lineEmpty = true;
+        last = '';
+      }
+      spaced = true;
+      i++;
+    } else if (ch === '\\' && (source[i + 1] === '\n' || source[i + 1] === '\r')) {
+      // Explicit line continuation
+      i += source[i + 1] === '\r' && source[i + 2] === '\n' ? 3 : 2;
+      spaced = true;
+    } else if (/\s/.test(ch)) {
+      spaced = true;
+      i++;
+    } else if (ch === '#') {
+      const end = source.indexOf('\n', i);
+      i = end === -1 ? source.length : end;
+    } else {
+      if (spaced && last && needsSeparator(last, ch)) out.push(' ');
+      spaced = false;
+      lineEmpty = false;
+      if (ch === '"' || ch === "'") {
+        i = readString(source, i, source.startsWith(ch.repeat(3), i) ? ch.repeat(3) : ch, out);
+      } else {
+        if (ch === '(' || ch === '[' || ch === '{') depth++;
+        else if (ch === ')' || ch === ']' || ch === '}') depth = Math.max(0, depth - 1);
+        out.push(ch);
+        i++;
+      }
+      last = source[i - 1];
+    }
+  }
+  return out.join('').replace(/\n+$/, '');
+};
+
+/**
+ * Reduces source to the parts that can change its behavior: comments,
+ * formatting and trailing whitespace are removed, string literals are kept.
+ */
+export const normalizeSemantics = (sourceCode: string, language: SupportedLanguage): string =>
+  language === SupportedLanguage.PYTHON ? normalizePython(sourceCode) : normalizeJS(sourceCode);
+
+/**
+ * Hash of the normalized source; equal fingerprints mean the edit cannot change the generated tests.
+ */
+export const semanticFingerprint = (sourceCode: string, language: SupportedLanguage): string =>
+  hashString(normalizeSemantics(sourceCode, language));
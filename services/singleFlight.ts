@@ -0,0 +1,118 @@
+interface Flight<T, R> {
+  chunks: T[];
+  done: boolean;
+  result?: R;
+  failed: boolean;
+  error?: unknown;
+  waiters: (() => void)[];
+  controller: AbortController;
+  subscribers: number;
+}
+
+/**
+ * Shares one in-flight async generator between concurrent callers with the
+ * same key. Late joiners replay the chunks produced so far, then follow live.
+ * The shared work is aborted only once every subscriber has gone away.
+ * Entries live only while the flight is running; this is not a result cache.
+ */
+export class StreamSingleFlight<T, R> {
+  private flights = new Map<string, Flight<T, R>>();
+  private cancelled: R;
+  private onCoalesced?: () => void;
+
+  /**
+   * `cancelled` is returned to a subscriber that aborts while the flight
+   * continues for others; `onCoalesced` fires for every call that joins an
+   * existing flight instead of starting one.
+   */
+  constructor(cancelled: R, onCoalesced?: () => void) {
+    this.cancelled = cancelled;
+    this.onCoalesced = onCoalesced;
+  }
+
+  async *join(
+    key: string,
+    start: (signal: AbortSignal) => AsyncGenerator<T, R>,
+    signal?: AbortSignal
+  ): AsyncGenerator<T, R> {
+    if (signal?.aborted) return this.cancelled;
+
+    let flight = this.flights.get(key);
+    if (flight) {
+      this.onCoalesced?.();
+    } else {
+      flight = this.launch(key, start);
+    }
+    flight.subscribers++;
+
+    let index = 0;
+    try {
+      while (true) {
+        if (index < flight.chunks.length) {
+          yield flight.chunks[index++];
+          continue;
+        }
+        if (flight.done) {
+          if (flight.failed) throw flight.error;
+          return flight.result!;
+        }
+        if (signal?.aborted) return this.cancelled;
+
+        await new Promise<void>(resolve => {
+          const wake = () => {
+            signal?.removeEventListener('abort', wake);
+            resolve();
+          };
+          flight!.waiters.push(wake);
+          signal?.addEventListener('abort', wake, { once: true });
+        });
+      }
+    } finally {
+      flight.subscribers--;
+      if (flight.subscribers === 0 && !flight.done) {
+        flight.controller.abort();
+        // A new caller must not join work that is being torn down
+        if (this.flights.get(key) === flight) this.flights.delete(key);
+      }
+    }
+  }
+
+  private launch(key: string, start: (signal: AbortSignal) => AsyncGenerator<T, R>): Flight<T, R> {
+    const flight: Flight<T, R> = {
+      chunks: [],
+      done: false,
+      failed: false,
+      waiters: [],
+      controller: new AbortController(),
+      subscribers: 0
+    };
+    this.flights.set(key, flight);
+
+    const notify = () => {
+      const waiters = flight.waiters;
+      flight.waiters = [];
+      waiters.forEach(wake => wake());
+    };
+
+    (async () => {
+      try {
+        const stream = start(flight.controller.signal);
+        let step = await stream.next();
+        while (!step.done) {
+          flight.chunks.push(step.value);
+          notify();
+          step = await stream.next();
+        }
+        flight.result = step.value;
+      } catch (error) {
+        flight.failed = true;
+        flight.error = error;
+      }
+      flight.done = true;
+      if (this.flights.get(key) === flight) this.flights.delete(key);
+      notify();
+    })();
+
+    return flight;
+  }
+}
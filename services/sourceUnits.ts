@@ -0,0 +1,246 @@
+import { SupportedLanguage } from '../types';
+import { semanticFingerprint } from './semanticFingerprint';
+
+export type SourceUnitKind = 'function' | 'class' | 'const';
+
+export interface SourceUnit {
+  // The identifier in the source; several units may share it
+  name: string;
+  // Unique within the outline: the name, plus `#2`, `#3`, ... for later units with the same name
+  id: string;
+  kind: SourceUnitKind;
+  text: string;
+  // Declaration line without its body, shown to the model as context for other units
+  signature: string;
+  // Semantic fingerprint, so formatting and comment edits keep the cached tests
+  fingerprint: string;
+}
+
+export interface SourceOutline {
+  // Imports and any other top-level code that is not a unit
+  context: string;
+  contextFingerprint: string;
+  units: SourceUnit[];
+}
+
+interface LineInfo {
+  topLevel: boolean;
+  inComment: boolean;
+}
+
+interface Statement {
+  lines: string[];
+  // Index into `lines` of the first non-trivia line
+  start: number;
+}
+
+const JS_UNIT_PATTERNS: [RegExp, SourceUnitKind][] = [
+  [/^(?:export\s+(?:default\s+)?)?(?:async\s+)?function\b\s*\*?\s*([\w$]*)/, 'function'],
+  [/^(?:export\s+(?:default\s+)?)?(?:abstract\s+)?class\b\s*([\w$]*)/, 'class'],
+  // Arrow functions need the `=>` after their parameter list; `const x = (a + b) * 2` is a plain statement
+  [/^(?:const|let|var)\s+([\w$]+)\s*(?::[^=]+)?=\s*(?:async\s+)?(?:function\b|(?:<[^>]*>\s*)?\((?:[^()]|\([^()]*\))*\)\s*(?::[^=]+)?=>|[\w$]+\s*=>)/, 'function'],
+  [/^export\s+(?:const|let|var)\s+([\w$]+)/, 'const']
+];
+
+const PYTHON_UNIT_PATTERNS: [RegExp, SourceUnitKind][] = [
+  [/^(?:async\s+)?def\s+(\w+)/, 'function'],
+  [/^class\s+(\w+)/, 'class']
+];
+
+const JS_TRIVIA = /^(?:\/\/|\/\*|@)/;
+// A `function` declaration ending in `;` instead of a body, i.e. a TypeScript overload signature
+const JS_FUNCTION_DECLARATION = /^(?:export\s+(?:default\s+)?)?(?:async\s+)?function\b/;
+const PYTHON_TRIVIA = /^[#@]/;
+
+/**
+ * Line endings and trailing whitespace never change the generated tests,
+ * so they are normalized away before hashing.
+ */
+export const normalizeSource = (sourceCode: string) =>
+  sourceCode.replace(/\r\n?/g, '\n').replace(/[ \t]+$/gm, '').trim();
+
+/**
+ * Lightweight lexer that only tracks what is needed to find top-level
+ * statements: bracket depth, strings and comments. Regex literals are not
+ * recognised; an unbalanced bracket inside one merges units but never splits one.
+ */
+const scanJSLines = (lines: string[]): LineInfo[] => {
+  const info: LineInfo[] = [];
+  let depth = 0;
+  let state: 'code' | 'block-comment' | 'string' | 'template' = 'code';
+  let quote = '';
+
+  for (const line of lines) {
+    info.push({ topLevel: state === 'code' && depth === 0, inComment: state === 'block-comment' });
+    for (let i = 0; i < line.length; i++) {
+      const ch = line[i];
+      if (state === 'block-comment') {
+        if (ch === '*' && line[i + 1] === '/') { state = 'code'; i++; }
+      } else if (state === 'string' || state === 'template') {
+        if (ch === '\\') i++;
+        else if (ch === quote) state = 'code';
+      } else if (ch === '/' && line[i + 1] === '/') {
+        break;
+      } else if (ch === '/' && line[i + 1] === '*') {
+        state = 'block-comment';
+        i++;
+      } else if (ch === '"' || ch === "'" || ch === '`') {
+        state = ch === '`' ? 'template' : 'string';
+        quote = ch;
+      } else if (ch === '{' || ch === '(' || ch === '[') {
+        depth++;
+      } else if (ch === '}' || ch === ')' || ch === ']') {
+        depth = Math.max(0, depth - 1);
+      }
+    }
+    // Plain strings cannot span lines
+    if (state === 'string') state = 'code';
+  }
+  return info;
+};
+
+const scanPythonLines = (lines: string[]): LineInfo[] => {
+  const info: LineInfo[] = [];
+  let depth = 0;
+  let quote = '';
+  let continued = false;
+
+  for (const line of lines) {
+    info.push({ topLevel: !quote && depth === 0 && !continued, inComment: false });
+    continued = false;
+    for (let i = 0; i < line.length; i++) {
+      const ch = line[i];
+      if (quote) {
+        if (ch === '\\') i++;
+        else if (line.startsWith(quote, i)) { i += quote.length - 1; quote = ''; }
+      } else if (ch === '#') {
+        break;
+      } else if (ch === '"' || ch === "'") {
+        quote = line.startsWith(ch.repeat(3), i) ? ch.repeat(3) : ch;
+        i += quote.length - 1;
+      } else if (ch === '(' || ch === '[' || ch === '{') {
+        depth++;
+      } else if (ch === ')' || ch === ']' || ch === '}') {
+        depth = Math.max(0, depth - 1);
+      } else if (ch === '\\' && i === line.length - 1) {
+        continued = true;
+      }
+    }
+    if (quote.length === 1) quote = '';
+  }
+  return info;
+};
+
+/**
+ * Groups lines into top-level statements. Comments and decorators directly
+ * above a statement belong to it, so editing a docstring only touches its unit.
+ */
+const splitStatements = (lines: string[], info: LineInfo[], trivia: RegExp): Statement[] => {
+  const statements: Statement[] = [];
+  let current: Statement | null = null;
+  let pending: string[] = [];
+
+  const attachPending = () => {
+    if (pending.length === 0) return;
+    if (current) {
+      current.lines.push(...pending);
+    } else {
+      current = { lines: [...pending], start: -1 };
+      statements.push(current);
+    }
+    pending = [];
+  };
+
+  lines.forEach((line, i) => {
+    const blank = line.trim() === '';
+    const startsStatement = info[i].topLevel && !blank && !/^\s/.test(line);
+
+    if (startsStatement && trivia.test(line)) {
+      pending.push(line);
+    } else if (startsStatement) {
+      current = { lines: [...pending, line], start: pending.length };
+      pending = [];
+      statements.push(current);
+    } else if (pending.length > 0 && info[i].inComment) {
+      pending.push(line);
+    } else {
+      attachPending();
+      if (current) {
+        current.lines.push(line);
+      } else {
+        current = { lines: [line], start: -1 };
+        statements.push(current);
+      }
+    }
+  });
+  attachPending();
+  return statements;
+};
+
+const isOverloadSignature = (code: string) => {
+  const text = code.replace(/\/\/.*$/gm, '').trim();
+  return JS_FUNCTION_DECLARATION.test(text) && text.endsWith(';') && !/}\s*;$/.test(text);
+};
+
+const classify = (line: string, patterns: [RegExp, SourceUnitKind][]) => {
+  for (const [pattern, kind] of patterns) {
+    const match = pattern.exec(line);
+    if (match) return { name: match[1] || 'default', kind };
+  }
+  return null;
+};
+
+/**
+ * Splits source into top-level units (functions, classes and exported consts
+ * for JS/TS; `def` and `class` for Python) plus the shared context around them.
+ * Each unit carries a fingerprint that only changes when its own code does.
+ */
+export const splitSourceUnits = (sourceCode: string, language: SupportedLanguage): SourceOutline => {
+  const isPython = language === SupportedLanguage.PYTHON;
+  const lines = sourceCode.replace(/\r\n?/g, '\n').split('\n');
+  const info = isPython ? scanPythonLines(lines) : scanJSLines(lines);
+  const statements = splitStatements(lines, info, isPython ? PYTHON_TRIVIA : JS_TRIVIA);
+
+  const context: string[] = [];
+  const units: Omit<SourceUnit, 'fingerprint'>[] = [];
+  // Overload signatures waiting for their implementation, which may follow after other declarations
+  const overloads = new Map<string, { text: string[]; signature: string }>();
+  for (const statement of statements) {
+    const text = statement.lines.join('\n');
+    const declaration = statement.start >= 0 ? statement.lines[statement.start] : '';
+    // Matched from the declaration on, since parameter lists may span lines
+    const code = statement.lines.slice(statement.start).join('\n');
+    const match = declaration && classify(code, isPython ? PYTHON_UNIT_PATTERNS : JS_UNIT_PATTERNS);
+    if (!match) {
+      context.push(text);
+      continue;
+    }
+    const signature = declaration.replace(/\s*[{:]?\s*$/, '');
+    if (!isPython && isOverloadSignature(code)) {
+      const pending = overloads.get(match.name);
+      if (pending) pending.text.push(text);
+      else overloads.set(match.name, { text: [text], signature });
+      continue;
+    }
+    // TypeScript overload signatures and their implementation form one unit
+    const pending = match.kind === 'function' ? overloads.get(match.name) : undefined;
+    if (pending) overloads.delete(match.name);
+    const ordinal = units.filter(u => u.name === match.name).length + 1;
+    units.push({
+      name: match.name,
+      id: ordinal > 1 ? `${match.name}#${ordinal}` : match.name,
+      kind: match.kind,
+      text: pending ? [...pending.text, text].join('\n') : text,
+      signature: pending ? pending.signature : signature
+    });
+  }
+  // Signatures without an implementation have nothing to test
+  overloads.forEach(pending => context.push(...pending.text));
+
+  const contextText = normalizeSource(context.join('\n'));
+  return {
+    context: contextText,
+    contextFingerprint: semanticFingerprint(contextText, language),
+    units: units.map(unit => ({ ...unit, fingerprint: semanticFingerprint(unit.text, language) }))
+  };
+};
@@ -0,0 +1,102 @@
+import { ModelTier, SupportedLanguage, TestCaseResult, TierRaceStats } from '../types';
+import { generateUnitTest, isPlaceholderTest } from './geminiService';
+import { runTests } from './executionService';
+import { isAbortError } from './abort';
+
+export interface RaceCandidate {
+  tier: ModelTier;
+  text: string;
+  results: TestCaseResult[] | null;
+  // Time from the start of the race until this candidate was validated
+  latencyMs: number;
+}
+
+export interface RaceOutcome {
+  winner: RaceCandidate;
+  // False when no candidate passed and the best-scoring one was picked instead
+  passed: boolean;
+}
+
+const raceStats = new Map<ModelTier, TierRaceStats>();
+
+const statsFor = (tier: ModelTier) => {
+  let stats = raceStats.get(tier);
+  if (!stats) {
+    stats = { races: 0, wins: 0, fallbacks: 0, validated: 0, meanLatencyMs: 0 };
+    raceStats.set(tier, stats);
+  }
+  return stats;
+};
+
+const passCount = (results: TestCaseResult[] | null) =>
+  results ? results.filter(r => r.status === 'pass').length : -1;
+
+/**
+ * Generates tests with several tiers at once and validates each candidate by
+ * running it as soon as it arrives. The first candidate whose tests all pass
+ * wins and every other request and test run is cancelled. If none passes, the
+ * candidate with the most passing tests is returned. Resolves to null when
+ * `signal` aborts the race. Cancelled candidates still have their reported
+ * token usage recorded, so session totals include the cost of racing.
+ */
+export const raceUnitTests = async (
+  sourceCode: string,
+  language: SupportedLanguage,
+  tiers: ModelTier[],
+  signal?: AbortSignal
+): Promise<RaceOutcome | null> => {
+  const startedAt = performance.now();
+  const controllers = tiers.map(() => new AbortController());
+  const abortAll = () => controllers.forEach(c => c.abort());
+  signal?.addEventListener('abort', abortAll, { once: true });
+  tiers.forEach(tier => statsFor(tier).races++);
+
+  // Assigned from the candidate callbacks, so the cast keeps TypeScript from narrowing it to null
+  let winner = null as RaceCandidate | null;
+  const candidates: RaceCandidate[] = [];
+
+  const runCandidate = async (tier: ModelTier, candidateSignal: AbortSignal) => {
+    const text = await generateUnitTest(sourceCode, language, tier, candidateSignal);
+    if (candidateSignal.aborted) return;
+
+    let results: TestCaseResult[] | null = null;
+    if (!isPlaceholderTest(text)) {
+      try {
+        results = await runTests(language, sourceCode, text, undefined, candidateSignal);
+      } catch (error) {
+        if (isAbortError(error) || candidateSignal.aborted) return;
+      }
+    }
+
+    const candidate: RaceCandidate = { tier, text, results, latencyMs: Math.round(performance.now() - startedAt) };
+    const stats = statsFor(tier);
+    stats.validated++;
+    stats.meanLatencyMs = Math.round(stats.meanLatencyMs + (candidate.latencyMs - stats.meanLatencyMs) / stats.validated);
+    candidates.push(candidate);
+
+    if (!winner && results && results.length > 0 && results.every(r => r.status === 'pass')) {
+      winner = candidate;
+      controllers.forEach(c => { if (c.signal !== candidateSignal) c.abort(); });
+    }
+  };
+
+  await Promise.all(tiers.map((tier, i) => runCandidate(tier, controllers[i].signal)));
+  signal?.removeEventListener('abort', abortAll);
+  if (signal?.aborted) return null;
+
+  const passed = winner !== null;
+  const best: RaceCandidate | undefined = winner ?? candidates.reduce<RaceCandidate | undefined>(
+    (best, c) => !best || passCount(c.results) > passCount(best.results) ? c : best,
+    undefined
+  );
+  if (!best) return null;
+  if (passed) {
+    statsFor(best.tier).wins++;
+  } else {
+    statsFor(best.tier).fallbacks++;
+  }
+  return { winner: best, passed };
+};
+
+export const getRaceStats = (): Partial<Record<ModelTier, TierRaceStats>> =>
+  Object.fromEntries([...raceStats].map(([tier, stats]) => [tier, { ...stats }]));
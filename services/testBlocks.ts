@@ -0,0 +1,67 @@
+import { SupportedLanguage } from '../types';
+
+export interface TestBlock {
+  name: string;
+  body: string;
+}
+
+const UNIT_MARKER = /^[ \t]*(?:\/\/|#)[ \t]*rora:unit[ \t]+(\S+)[ \t]*$/gm;
+
+export const formatUnitMarker = (name: string, language: SupportedLanguage) =>
+  `${language === SupportedLanguage.PYTHON ? '#' : '//'} rora:unit ${name}`;
+
+/**
+ * Splits model output into test bodies, one per marker line, in output order.
+ * Anything before the first marker (typically imports) is kept with the first
+ * section. Returns null when the output has no markers.
+ */
+export const parseTestBlocks = (text: string): TestBlock[] | null => {
+  const markers = [...text.matchAll(UNIT_MARKER)];
+  if (markers.length === 0) return null;
+
+  const preamble = text.slice(0, markers[0].index).trim();
+  return markers.map((marker, i) => {
+    const end = i + 1 < markers.length ? markers[i + 1].index : text.length;
+    const body = text.slice(marker.index! + marker[0].length, end).trim();
+    return { name: marker[1], body: i === 0 && preamble ? `${preamble}\n\n${body}` : body };
+  });
+};
+
+/**
+ * Attributes parsed sections to units by name. Markers carry the identifier
+ * from the source, so units sharing a name are matched in order; further
+ * sections with that name go to the last of them. Returns the bodies keyed by
+ * unit id, plus the sections that match no unit.
+ */
+export const assignTestBlocks = (
+  sections: TestBlock[],
+  units: { id: string; name: string }[]
+): { bodies: Map<string, string>; unmatched: TestBlock[] } => {
+  const bodies = new Map<string, string>();
+  const unmatched: TestBlock[] = [];
+  const seen = new Map<string, number>();
+  for (const section of sections) {
+    const candidates = units.filter(u => u.name === section.name);
+    if (candidates.length === 0) {
+      unmatched.push(section);
+      continue;
+    }
+    const count = seen.get(section.name) ?? 0;
+    seen.set(section.name, count + 1);
+    const unit = candidates[Math.min(count, candidates.length - 1)];
+    const existing = bodies.get(unit.id);
+    bodies.set(unit.id, existing ? `${existing}\n\n${section.body}` : section.body);
+  }
+  return { bodies, unmatched };
+};
+
+/**
+ * Joins per-unit test bodies into one test file. JavaScript bodies are wrapped
+ * in a block so helpers declared with the same name in two units do not clash.
+ */
+export const assembleTestFile = (blocks: TestBlock[], language: SupportedLanguage) =>
+  blocks
+    .map(({ name, body }) => language === SupportedLanguage.PYTHON
+      ? `${formatUnitMarker(name, language)}\n${body}`
+      : `${formatUnitMarker(name, language)}\n{\n${body}\n}`)
+    .join('\n\n');
@@ -0,0 +1,142 @@
+import { ModelTier, TokenUsage, SessionTokenStats } from '../types';
+
+export interface RequestUsage extends TokenUsage {
+  tier: ModelTier;
+  durationMs: number;
+  timestamp: number;
+}
+
+export interface TokenBudgetOptions {
+  // Pre-flight limit on the locally counted prompt size
+  maxPromptTokens: number;
+  // What to do with a prompt over the limit
+  oversized: 'truncate' | 'skip';
+}
+
+export interface PreflightResult {
+  text: string;
+  tokens: number;
+  truncated: boolean;
+  skipped: boolean;
+}
+
+// Subset of the SDK's GenerateContentResponseUsageMetadata that is accounted for
+interface UsageMetadata {
+  promptTokenCount?: number;
+  candidatesTokenCount?: number;
+  thoughtsTokenCount?: number;
+  cachedContentTokenCount?: number;
+  totalTokenCount?: number;
+}
+
+const DEFAULT_OPTIONS: TokenBudgetOptions = {
+  maxPromptTokens: 16000,
+  oversized: 'truncate'
+};
+
+const MAX_REQUESTS = 100;
+
+// Line break plus indentation, words with their leading space, short digit groups, whitespace, symbol runs
+const TOKEN_PATTERN = /\n[ \t]*| ?[A-Za-z]+|\d{1,3}|[ \t]+|[^\sA-Za-z\d]+/g;
+
+let options: TokenBudgetOptions = { ...DEFAULT_OPTIONS };
+const requests: RequestUsage[] = [];
+const session = {
+  requests: 0,
+  promptTokens: 0,
+  candidateTokens: 0,
+  thinkingTokens: 0,
+  cachedTokens: 0,
+  totalTokens: 0,
+  durationMs: 0,
+  passingTests: 0
+};
+
+/**
+ * Local approximation of the model tokenizer for pre-flight checks, where no
+ * API round trip is acceptable. Words cost one token per 6 letters and symbol
+ * runs one per 2 characters, about 3 characters per token on this codebase,
+ * which errs slightly high.
+ */
+export const countTokens = (text: string): number => {
+  let tokens = 0;
+  for (const [piece] of text.matchAll(TOKEN_PATTERN)) {
+    if (/[A-Za-z]/.test(piece)) {
+      tokens += Math.ceil(piece.trim().length / 6);
+    } else {
+      tokens += /\s/.test(piece[0]) ? 1 : Math.ceil(piece.length / 2);
+    }
+  }
+  return tokens;
+};
+
+/**
+ * Applies the prompt token budget. Oversized prompts are either skipped or
+ * cut at a line boundary so that the counted size fits.
+ */
+export const preflightPrompt = (text: string): PreflightResult => {
+  const tokens = countTokens(text);
+  if (tokens <= options.maxPromptTokens) {
+    return { text, tokens, truncated: false, skipped: false };
+  }
+  if (options.oversized === 'skip') {
+    return { text: '', tokens, truncated: false, skipped: true };
+  }
+
+  const kept: string[] = [];
+  let used = 0;
+  for (const line of text.split('\n')) {
+    const cost = countTokens(line) + 1;
+    if (used + cost > options.maxPromptTokens) break;
+    kept.push(line);
+    used += cost;
+  }
+  return { text: kept.join('\n'), tokens: used, truncated: true, skipped: false };
+};
+
+export const usageFromMetadata = (metadata: UsageMetadata | undefined): TokenUsage => {
+  const usage = {
+    promptTokens: metadata?.promptTokenCount ?? 0,
+    candidateTokens: metadata?.candidatesTokenCount ?? 0,
+    thinkingTokens: metadata?.thoughtsTokenCount ?? 0,
+    cachedTokens: metadata?.cachedContentTokenCount ?? 0,
+    totalTokens: 0
+  };
+  usage.totalTokens = metadata?.totalTokenCount ?? usage.promptTokens + usage.candidateTokens + usage.thinkingTokens;
+  return usage;
+};
+
+export const recordRequestUsage = (tier: ModelTier, usage: TokenUsage, durationMs: number) => {
+  requests.push({ ...usage, tier, durationMs, timestamp: Date.now() });
+  if (requests.length > MAX_REQUESTS) requests.shift();
+
+  session.requests++;
+  session.promptTokens += usage.promptTokens;
+  session.candidateTokens += usage.candidateTokens;
+  session.thinkingTokens += usage.thinkingTokens;
+  session.cachedTokens += usage.cachedTokens;
+  session.totalTokens += usage.totalTokens;
+  session.durationMs += durationMs;
+};
+
+/**
+ * Counts passing tests produced by generated suites, the denominator of tokens per passing test.
+ */
+export const recordPassingTests = (count: number) => {
+  session.passingTests += count;
+};
+
+export const getSessionTokenStats = (): SessionTokenStats => {
+  const outputTokens = session.candidateTokens + session.thinkingTokens;
+  return {
+    ...session,
+    tokensPerSecond: session.durationMs > 0 ? Math.round(outputTokens / (session.durationMs / 1000)) : 0,
+    tokensPerPassingTest: session.passingTests > 0 ? Math.round(session.totalTokens / session.passingTests) : 0
+  };
+};
+
+export const getRequestUsages = (): RequestUsage[] => requests.map(r => ({ ...r }));
+
+export const configureTokenBudget = (overrides: Partial<TokenBudgetOptions>) => {
+  options = { ...options, ...overrides };
+};
@@ -0,0 +1,371 @@
+import { TestCaseResult } from '../types';
+import { JEST_POLYFILLS } from './runtimePolyfills';
+import { createAbortError } from './abort';
+
+export interface WorkerPoolOptions {
+  size: number;
+  timeoutMs: number;
+  maxRunsPerWorker: number;
+  maxConcurrency: number;
+}
+
+export type TestResultListener = (result: TestCaseResult) => void;
+
+export type WorkerRunMessage =
+  | { type: 'result'; results: TestCaseResult[] }
+  | { type: 'error'; error: string };
+
+export interface WorkerRunOutcome {
+  message: WorkerRunMessage;
+  warm: boolean;
+  durationMs: number;
+}
+
+interface PendingRun {
+  source: string;
+  test: string;
+  onResult?: TestResultListener;
+  enqueuedAt: number;
+  resolve: (outcome: WorkerRunOutcome) => void;
+  reject: (error: Error) => void;
+}
+
+interface ActiveRun {
+  job: PendingRun;
+  id: number;
+  warm: boolean;
+  timeoutId: ReturnType<typeof setTimeout>;
+}
+
+interface PoolSlot {
+  worker: Worker;
+  ready: boolean;
+  runs: number;
+  active: ActiveRun | null;
+}
+
+const DEFAULT_OPTIONS: WorkerPoolOptions = {
+  size: 2,
+  timeoutMs: 5000,
+  maxRunsPerWorker: 50,
+  maxConcurrency: 5
+};
+
+/**
+ * Bootstrap evaluated once per worker. The polyfills are parsed here and
+ * re-installed per run. Before every run the global scope and the builtins
+ * tests commonly patch are restored to their boot-time snapshot, and every
+ * spy of the previous run is undone, so that tests cannot leak into each other.
+ */
+const WORKER_BOOTSTRAP = `
+  const __installJest = function (__reportTest__, __options__) {
+    ${JEST_POLYFILLS}
+  };
+
+  // Track timers so a previous run cannot fire callbacks into the next one
+  const __timers = new Set();
+  const __intervals = new Set();
+  const __setTimeout = self.setTimeout.bind(self);
+  const __clearTimeout = self.clearTimeout.bind(self);
+  const __setInterval = self.setInterval.bind(self);
+  const __clearInterval = self.clearInterval.bind(self);
+  self.setTimeout = (fn, ms, ...args) => {
+    const handle = __setTimeout((...a) => { __timers.delete(handle); if (typeof fn === 'function') fn(...a); }, ms, ...args);
+    __timers.add(handle);
+    return handle;
+  };
+  self.clearTimeout = (handle) => { __timers.delete(handle); __clearTimeout(handle); };
+  self.setInterval = (fn, ms, ...args) => {
+    const handle = __setInterval(fn, ms, ...args);
+    __intervals.add(handle);
+    return handle;
+  };
+  self.clearInterval = (handle) => { __intervals.delete(handle); __clearInterval(handle); };
+
+  const __runSuite = async (id, sourceText, testText) => {
+    var exports = {};
+    var module = { exports: exports };
+    self.exports = exports;
+
+    try {
+      try {
+          eval(sourceText);
+      } catch(e) {
+          throw new Error("Source Code execution failed: " + e.message);
+      }
+
+      for (var key in exports) {
+         if (exports.hasOwnProperty(key)) {
+            self[key] = exports[key];
+         }
+      }
+
+      const results = self.__test_results__;
+      const runTests = self.__runTests__;
+
+      try {
+          eval(testText);
+      } catch(e) {
+          throw new Error("Test Script execution failed: " + e.message);
+      }
+
+      await runTests();
+      self.postMessage({ type: 'result', id, results });
+
+    } catch (e) {
+      self.postMessage({ type: 'error', id, error: e.message + "\\n" + (e.stack || '') });
+    }
+  };
+
+  // Restore functions of the spies installed by the current run
+  const __spies = [];
+
+  self.onmessage = (event) => {
+    const { id, source, test, maxConcurrency } = event.data;
+    __resetRealm();
+    __installJest(
+      (result) => self.postMessage({ type: 'test-result', id, result }),
+      { maxConcurrency, onSpy: (restore) => __spies.push(restore) }
+    );
+    __runSuite(id, source, test);
+  };
+
+  // Objects whose own properties are snapshotted; tests patch these far more often than anything else
+  const __snapshotTargets = [
+    self, Math, JSON, console, Reflect,
+    Date, Date.prototype, Promise, Promise.prototype,
+    Object, Object.prototype, Array, Array.prototype, String.prototype, Number.prototype, Function.prototype
+  ];
+  const __snapshot = (target) => {
+    const descriptors = new Map();
+    for (const key of Reflect.ownKeys(target)) {
+      descriptors.set(key, Object.getOwnPropertyDescriptor(target, key));
+    }
+    return descriptors;
+  };
+  const __baselines = __snapshotTargets.map((target) => [target, __snapshot(target)]);
+
+  const __restore = (target, baseline) => {
+    for (const key of Reflect.ownKeys(target)) {
+      const original = baseline.get(key);
+      try {
+        if (!original) {
+          delete target[key];
+          continue;
+        }
+        const current = Object.getOwnPropertyDescriptor(target, key);
+        if (current.value !== original.value || current.get !== original.get || current.set !== original.set) {
+          Object.defineProperty(target, key, original);
+        }
+      } catch (e) {
+        // Non-configurable properties cannot be restored; leave them as-is
+      }
+    }
+    // Deleted builtins come back too
+    for (const [key, original] of baseline) {
+      if (Object.getOwnPropertyDescriptor(target, key)) continue;
+      try {
+        Object.defineProperty(target, key, original);
+      } catch (e) {
+        // The target was frozen or made non-extensible; leave it as-is
+      }
+    }
+  };
+
+  const __resetRealm = () => {
+    __timers.forEach(__clearTimeout);
+    __timers.clear();
+    __intervals.forEach(__clearInterval);
+    __intervals.clear();
+
+    // Newest first, so a method spied on twice ends up with its real original
+    while (__spies.length > 0) {
+      try {
+        __spies.pop()();
+      } catch (e) {
+        // The spied object was frozen after the spy was installed
+      }
+    }
+    __baselines.forEach(([target, baseline]) => __restore(target, baseline));
+  };
+
+  self.postMessage({ type: 'ready' });
+`;
+
+/**
+ * Fixed-size pool of pre-warmed execution workers. Workers are reused across
+ * runs and recycled after a timeout, a crash, or `maxRunsPerWorker` runs.
+ */
+class JSWorkerPool {
+  private options: WorkerPoolOptions;
+  private slots: PoolSlot[] = [];
+  private queue: PendingRun[] = [];
+  private scriptUrl: string | null = null;
+  private nextRunId = 0;
+
+  constructor(options: WorkerPoolOptions) {
+    this.options = options;
+  }
+
+  prewarm() {
+    while (this.slots.length < this.options.size) {
+      this.spawn();
+    }
+  }
+
+  run(source: string, test: string, onResult?: TestResultListener, signal?: AbortSignal): Promise<WorkerRunOutcome> {
+    if (signal?.aborted) return Promise.reject(createAbortError());
+    return new Promise((resolve, reject) => {
+      const job: PendingRun = { source, test, onResult, enqueuedAt: performance.now(), resolve, reject };
+      signal?.addEventListener('abort', () => this.cancel(job), { once: true });
+      this.queue.push(job);
+      this.pump();
+    });
+  }
+
+  /**
+   * Drops a queued run, or recycles the worker executing it so the stale suite stops immediately.
+   */
+  private cancel(job: PendingRun) {
+    if (this.queue.includes(job)) {
+      this.queue = this.queue.filter(j => j !== job);
+      job.reject(createAbortError());
+      return;
+    }
+    const slot = this.slots.find(s => s.active?.job === job);
+    if (!slot || !slot.active) return;
+    clearTimeout(slot.active.timeoutId);
+    slot.active = null;
+    job.reject(createAbortError());
+    this.recycle(slot);
+  }
+
+  dispose() {
+    [...this.slots].forEach(slot => {
+      if (slot.active) {
+        clearTimeout(slot.active.timeoutId);
+        slot.active.job.reject(new Error("Worker pool disposed"));
+      }
+      this.retire(slot);
+    });
+    this.queue.forEach(job => job.reject(new Error("Worker pool disposed")));
+    this.queue = [];
+    if (this.scriptUrl) {
+      URL.revokeObjectURL(this.scriptUrl);
+      this.scriptUrl = null;
+    }
+  }
+
+  private getScriptUrl(): string {
+    if (!this.scriptUrl) {
+      const blob = new Blob([WORKER_BOOTSTRAP], { type: 'application/javascript' });
+      this.scriptUrl = URL.createObjectURL(blob);
+    }
+    return this.scriptUrl;
+  }
+
+  private spawn(): PoolSlot {
+    const slot: PoolSlot = {
+      worker: new Worker(this.getScriptUrl()),
+      ready: false,
+      runs: 0,
+      active: null
+    };
+
+    slot.worker.onmessage = (e) => {
+      if (e.data.type === 'ready') {
+        slot.ready = true;
+        return;
+      }
+      const run = slot.active;
+      if (!run || e.data.id !== run.id) return;
+
+      if (e.data.type === 'test-result') {
+        run.job.onResult?.(e.data.result);
+        return;
+      }
+
+      clearTimeout(run.timeoutId);
+      slot.active = null;
+      slot.runs++;
+      run.job.resolve({
+        message: e.data.type === 'result'
+          ? { type: 'result', results: e.data.results }
+          : { type: 'error', error: e.data.error },
+        warm: run.warm,
+        durationMs: Math.round(performance.now() - run.job.enqueuedAt)
+      });
+
+      if (slot.runs >= this.options.maxRunsPerWorker) {
+        this.recycle(slot);
+      } else {
+        this.pump();
+      }
+    };
+
+    slot.worker.onerror = (e) => {
+      e.preventDefault();
+      const run = slot.active;
+      if (run) {
+        clearTimeout(run.timeoutId);
+        slot.active = null;
+        run.job.reject(new Error(`Worker Error: ${e.message}`));
+      }
+      this.recycle(slot);
+    };
+
+    this.slots.push(slot);
+    return slot;
+  }
+
+  private retire(slot: PoolSlot) {
+    slot.worker.terminate();
+    this.slots = this.slots.filter(s => s !== slot);
+  }
+
+  private recycle(slot: PoolSlot) {
+    this.retire(slot);
+    if (this.slots.length < this.options.size) {
+      this.spawn();
+    }
+    this.pump();
+  }
+
+  private pump() {
+    while (this.queue.length > 0) {
+      let slot = this.slots.find(s => !s.active && s.ready) || this.slots.find(s => !s.active);
+      if (!slot) {
+        if (this.slots.length >= this.options.size) return;
+        slot = this.spawn();
+      }
+      this.assign(slot, this.queue.shift()!);
+    }
+  }
+
+  private assign(slot: PoolSlot, job: PendingRun) {
+    const id = ++this.nextRunId;
+    const timeoutId = setTimeout(() => {
+      if (slot.active?.id !== id) return;
+      slot.active = null;
+      job.reject(new Error("Execution timed out (Infinite loop?)"));
+      this.recycle(slot);
+    }, this.options.timeoutMs);
+
+    slot.active = { job, id, warm: slot.ready, timeoutId };
+    slot.worker.postMessage({ id, source: job.source, test: job.test, maxConcurrency: this.options.maxConcurrency });
+  }
+}
+
+// WORKER_POOL_SIZE in .env.local sets how many warm workers are kept
+const configuredSize = Math.floor(Number(process.env.WORKER_POOL_SIZE));
+const pool = new JSWorkerPool({
+  ...DEFAULT_OPTIONS,
+  size: configuredSize > 0 ? configuredSize : DEFAULT_OPTIONS.size
+});
+
+export const prewarmWorkerPool = () => pool.prewarm();
+
+export const runInWorkerPool = (source: string, test: string, onResult?: TestResultListener, signal?: AbortSignal) =>
+  pool.run(source, test, onResult, signal);
+
+export const disposeWorkerPool = () => pool.dispose();
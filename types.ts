@@ -15,7 +15,9 @@ export enum SupportedLanguage {
 export enum ModelTier {
   LITE = 'gemini-flash-lite-latest',
   FLASH = 'gemini-2.5-flash',
-  PRO = 'gemini-3-pro-preview'
+  PRO = 'gemini-3-pro-preview',
+  // Resolved per source by the model router; never sent to the API
+  AUTO = 'auto'
 }
 
 export interface TestCaseResult {
@@ -23,6 +25,11 @@ export interface TestCaseResult {
   name: string;
   status: 'pass' | 'fail';
   duration: number;
+  phases?: {
+    setup: number;
+    call: number;
+    teardown: number;
+  };
   code?: string;
   failureDetails?: {
     message: string;
@@ -38,7 +45,77 @@ export interface TestSimulationResult {
   details?: TestCaseResult[];
 }
 
+export type RuntimeLoadStage = 'idle' | 'fetch' | 'compile' | 'packages' | 'ready' | 'error';
+
+export interface RuntimeLoadState {
+  stage: RuntimeLoadStage;
+  error?: string;
+}
+
+export interface TokenUsage {
+  promptTokens: number;
+  candidateTokens: number;
+  thinkingTokens: number;
+  cachedTokens: number;
+  totalTokens: number;
+}
+
+// How well the adaptive debounce avoided firing generations that were superseded
+export interface DebounceStats {
+  delayMs: number;
+  // Median gap between keystrokes, once typing has been observed
+  typingIntervalMs?: number;
+  emitted: number;
+  wasted: number;
+  // Emissions triggered early, e.g. by the editor losing focus
+  flushed: number;
+  wastedRate: number;
+}
+
+export interface SessionTokenStats extends TokenUsage {
+  requests: number;
+  durationMs: number;
+  passingTests: number;
+  // Output (candidate + thinking) tokens per second of request time
+  tokensPerSecond: number;
+  tokensPerPassingTest: number;
+}
+
+export interface TierRaceStats {
+  races: number;
+  // Races won with a fully passing candidate
+  wins: number;
+  // Races nobody passed, where this tier's candidate was picked as the best of the failing ones
+  fallbacks: number;
+  validated: number;
+  meanLatencyMs: number;
+}
+
 export interface GenerationMetrics {
   latencyMs: number;
+  timeToFirstTokenMs?: number;
   tokenEstimate: number;
+  coldRunMs?: number;
+  warmRunMs?: number;
+  sourceImportMs?: number;
+  testExecutionMs?: number;
+  cacheHits?: number;
+  cacheMisses?: number;
+  abortedRequests?: number;
+  regeneratedUnits?: number;
+  totalUnits?: number;
+  suppressedRegenerations?: number;
+  routedTier?: ModelTier;
+  escalations?: number;
+  raceStats?: Partial<Record<ModelTier, TierRaceStats>>;
+  // Reported by the API for the most recent generation; absent when served from cache
+  tokenUsage?: TokenUsage;
+  sessionTokens?: SessionTokenStats;
+  retries?: number;
+  throttled?: number;
+  // Generations that shared an identical request already in flight
+  coalescedRequests?: number;
+  // Prompts cut or skipped by the pre-flight token budget this session
+  truncatedPrompts?: number;
+  skippedPrompts?: number;
 }
\ No newline at end of file
@@ -4,15 +4,27 @@ import react from '@vitejs/plugin-react';
 
 export default defineConfig(({ mode }) => {
     const env = loadEnv(mode, '.', '');
+    // Cross-origin isolation enables SharedArrayBuffer, which the Pyodide interrupt buffer needs.
+    // `credentialless` keeps the CDN scripts, fonts and styles loading without CORP headers.
+    const isolationHeaders = {
+      'Cross-Origin-Opener-Policy': 'same-origin',
+      'Cross-Origin-Embedder-Policy': 'credentialless',
+    };
     return {
       server: {
         port: 3000,
         host: '0.0.0.0',
+        headers: isolationHeaders,
+      },
+      preview: {
+        headers: isolationHeaders,
       },
       plugins: [react()],
       define: {
         'process.env.API_KEY': JSON.stringify(env.GEMINI_API_KEY),
-        'process.env.GEMINI_API_KEY': JSON.stringify(env.GEMINI_API_KEY)
+        'process.env.GEMINI_API_KEY': JSON.stringify(env.GEMINI_API_KEY),
+        'process.env.GEMINI_BASE_URL': JSON.stringify(env.GEMINI_BASE_URL),
+        'process.env.WORKER_POOL_SIZE': JSON.stringify(env.WORKER_POOL_SIZE)
       },
       resolve: {
         alias: {